@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+
+###########################################################################
+#
+# GuideSolver solves Asymptote guides for their control points without the
+# interpreter. It follows flatguide.h and knot.cc step for step, so that the
+# result agrees with asy's up to floating point rounding.
+#
+# Pairs are complex numbers; the pair operations whose rounding matters
+# (division, length, expi) are written out as in pair.h.
+#
+###########################################################################
+
+import math
+import re
+
+PI = math.acos(-1.0)
+
+
+class UnsupportedGuide(ValueError):
+    """The guide uses syntax, or values, that only the interpreter can evaluate."""
+    pass
+
+
+def fdiv(a, b):
+    """Divide as C++ does, giving inf or nan rather than raising for b == 0."""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def pairDiv(z, w):
+    if w == 0:
+        raise UnsupportedGuide('division by pair (0,0)')
+    t = 1.0 / (w.real * w.real + w.imag * w.imag)
+    return complex(t * (z.real * w.real + z.imag * w.imag),
+                   t * (-z.real * w.imag + w.real * z.imag))
+
+
+def length(z):
+    return math.sqrt(z.real * z.real + z.imag * z.imag)
+
+
+def expi(theta):
+    if theta == 0.0:
+        return complex(1.0, 0.0)
+    return complex(math.cos(theta), math.sin(theta))
+
+
+def niceAngle(z):
+    if z.imag == 0:
+        return 0.0 if z.real >= 0 else PI
+    return math.atan2(z.imag, z.real)
+
+
+def reduceAngle(angle):
+    if angle > PI:
+        return angle - 2.0 * PI
+    if angle < -PI:
+        return angle + 2.0 * PI
+    return angle
+
+
+def velocity(theta, phi, t):
+    VELOCITY_BOUND = 4.0
+    a = math.sqrt(2.0)
+    b = 1.0 / 16.0
+    c = 1.5 * (math.sqrt(5.0) - 1.0)
+    d = 1.5 * (3.0 - math.sqrt(5.0))
+
+    st, ct = math.sin(theta), math.cos(theta)
+    sf, cf = math.sin(phi), math.cos(phi)
+
+    denom = t.val * (3.0 + c * ct + d * cf)
+    r = (2.0 + a * (st - b * sf) * (sf - b * st) * (ct - cf)) / denom if denom != 0.0 else VELOCITY_BOUND
+    if r > VELOCITY_BOUND:
+        r = VELOCITY_BOUND
+
+    # boundedness condition for tension atleast.
+    if t.atleast:
+        sine = math.sin(theta + phi)
+        if (st >= 0.0 and sf >= 0.0 and sine > 0.0) or (st <= 0.0 and sf <= 0.0 and sine < 0.0):
+            rmax = sf / sine
+            if r > rmax:
+                r = rmax
+    return r
+
+
+class Eqn:
+    """pre*theta[i-1] + piv*theta[i] + post*theta[i+1] = aug (+ w*theta[0] in the cyclic case)"""
+    __slots__ = ('pre', 'piv', 'post', 'aug', 'w')
+
+    def __init__(self, pre, piv, post, aug, w=0.0):
+        self.pre = pre
+        self.piv = piv
+        self.post = post
+        self.aug = aug
+        self.w = w
+
+    def scale(self):
+        return Eqn(0.0, 1.0, fdiv(self.post, self.piv), fdiv(self.aug, self.piv), fdiv(self.w, self.piv))
+
+
+class Tension:
+    __slots__ = ('val', 'atleast')
+
+    def __init__(self, val=1.0, atleast=False):
+        if val < 0.75:
+            raise UnsupportedGuide('tension cannot be less than 3/4')
+        self.val = val
+        self.atleast = atleast
+
+
+class Spec:
+    """The open specifier."""
+    def open(self):
+        return True
+
+    def controlled(self):
+        return False
+
+    def outPartner(self, z):
+        return self
+
+    def inPartner(self, z):
+        return self
+
+
+OPEN = Spec()
+
+
+class DirSpec(Spec):
+    def __init__(self, z):
+        self.given = niceAngle(z)
+
+    def open(self):
+        return False
+
+    def eqnOut(self, j, l, d, psi):
+        return Eqn(0.0, 1.0, 0.0, reduceAngle(self.given - niceAngle(l[j + 1].z - l[j].z)))
+
+    def eqnIn(self, j, l, d, psi):
+        return Eqn(0.0, 1.0, 0.0, reduceAngle(self.given - niceAngle(l[j].z - l[j - 1].z)))
+
+
+class CurlSpec(Spec):
+    def __init__(self, gamma=1.0):
+        if gamma < 0:
+            raise UnsupportedGuide('curl cannot be less than 0')
+        self.gamma = gamma
+
+    def open(self):
+        return False
+
+    def eqnOut(self, j, l, d, psi):
+        alpha = l[j].alpha()
+        beta = l[j + 1].beta()
+        chi = fdiv(alpha * alpha * self.gamma, beta * beta)
+        C = alpha * chi + 3 - beta
+        D = (3.0 - alpha) * chi + beta
+        return Eqn(0.0, C, D, -D * psi[j + 1])
+
+    def eqnIn(self, j, l, d, psi):
+        alpha = l[j - 1].alpha()
+        beta = l[j].beta()
+        chi = fdiv(beta * beta * self.gamma, alpha * alpha)
+        A = (3 - beta) * chi + alpha
+        B = beta * chi + 3 - alpha
+        return Eqn(A, B, 0.0, 0.0)
+
+
+CURL = CurlSpec()
+
+
+class ControlSpec(Spec):
+    def __init__(self, cz):
+        self.cz = cz
+
+    def open(self):
+        return False
+
+    def controlled(self):
+        return True
+
+    def outPartner(self, z):
+        return CURL if self.cz == z else DirSpec(z - self.cz)
+
+    def inPartner(self, z):
+        return CURL if self.cz == z else DirSpec(self.cz - z)
+
+
+class Knot:
+    __slots__ = ('z', 'inSpec', 'outSpec', 'tin', 'tout')
+
+    def __init__(self, z, inSpec, outSpec, tin, tout):
+        self.z = z
+        self.inSpec = inSpec
+        self.outSpec = outSpec
+        self.tin = tin
+        self.tout = tout
+
+    def alpha(self):
+        return 1.0 / self.tout.val
+
+    def beta(self):
+        return 1.0 / self.tin.val
+
+
+class KnotList:
+    """A list of knots indexed modulo its size, or a section [a, b] of one."""
+
+    def __init__(self, knots, cyclic, a=0, b=None):
+        self.knots = knots
+        self.cyclic = cyclic
+        self.a = a
+        self.length = (len(knots) if cyclic else len(knots) - 1) if b is None else b - a
+
+    def size(self):
+        return self.length if self.cyclic else self.length + 1
+
+    def __getitem__(self, j):
+        return self.knots[(self.a + j) % len(self.knots)]
+
+    def section(self, a, b):
+        return KnotList(self.knots, False, self.a + a, self.a + b)
+
+
+class CVector(list):
+    def __getitem__(self, j):
+        return list.__getitem__(self, j % len(self))
+
+
+def knotprop(l, mid, start=None, end=None, solo=None):
+    """Evaluate a property along a knotlist, as knotprop::compute."""
+    n = l.length
+    if l.cyclic:
+        return CVector(mid(j) for j in range(n))
+    if n == 0:
+        return CVector([(solo or mid)(0)])
+    v = [(start or mid)(0)]
+    v.extend(mid(j) for j in range(1, n))
+    v.append((end or mid)(n))
+    return CVector(v)
+
+
+def solveThetas(l, e):
+    if all(q.aug == 0 for q in e):
+        # solving Ax=0, so zero is a solution.
+        return CVector([0.0] * len(e))
+
+    n = len(e)
+    if l.cyclic:
+        we = [None] * n
+        last = Eqn(0.0, 1.0, 0.0, 0.0, 1.0)
+        we[0] = last
+        for j in list(range(1, n)) + [0]:
+            q = e[j]
+            last = Eqn(0.0, q.piv - q.pre * last.post, q.post, q.aug - q.pre * last.aug, -q.pre * last.w).scale()
+            we[j] = last
+
+        a, b, c = 0.0, 0.0, 1.0
+        for q in we:
+            a += c * q.aug
+            b += c * q.w
+            c = -c * q.post
+        theta0 = fdiv(a, 1.0 - (b + c))
+
+        thetas = [0.0] * n
+        lastTheta = theta0
+        for j in range(1, n + 1):
+            q = we[n - j]
+            lastTheta = -q.post * lastTheta + q.aug + q.w * theta0
+            thetas[n - j] = lastTheta
+        return CVector(thetas)
+
+    # reduced echelon form, then back substitution.
+    el = []
+    last = e[0].scale()
+    el.append(last)
+    for j in range(1, n):
+        q = e[j]
+        last = Eqn(0.0, q.piv - q.pre * last.post, q.post, q.aug - q.pre * last.aug).scale()
+        el.append(last)
+
+    thetas = [0.0] * n
+    lastTheta = el[n - 1].aug
+    thetas[n - 1] = lastTheta
+    for j in range(n - 2, -1, -1):
+        q = el[j]
+        lastTheta = -q.post * lastTheta + q.aug
+        thetas[j] = lastTheta
+    return CVector(thetas)
+
+
+class ProtoPath:
+    def __init__(self, n, cyclic):
+        self.n = n
+        self.cyclic = cyclic
+        self.pre = [0j] * n
+        self.point = [0j] * n
+        self.post = [0j] * n
+
+    def set(self, field, j, z):
+        getattr(self, field)[j % self.n] = z
+
+
+def encodeStraight(p, k, l):
+    a = l[0].z
+    at = l[0].tout.val
+    b = l[l.length].z
+    bt = l[l.length].tin.val
+    step = (b - a) / 3.0
+    p.set('post', k, a + step / at)
+    p.set('pre', k + 1, b - step / bt)
+    p.set('point', k + 1, b)
+
+
+def solveSection(p, k, l):
+    if l.length <= 0:
+        return
+
+    dz = knotprop(l, lambda j: l[j + 1].z - l[j].z, end=lambda j: 0j, solo=lambda j: 0j)
+    d = knotprop(l, lambda j: length(dz[j]))
+    psi = knotprop(l, lambda j: niceAngle(pairDiv(dz[j], dz[j - 1])),
+                   start=lambda j: 0.0, end=lambda j: 0.0, solo=lambda j: 0.0)
+
+    def endSpec(spec):
+        if not hasattr(spec, 'eqnOut'):
+            raise UnsupportedGuide('section does not end in a direction or curl')
+        return spec
+
+    def midEqn(j):
+        lastAlpha = l[j - 1].alpha()
+        thisAlpha = l[j].alpha()
+        thisBeta = l[j].beta()
+        nextBeta = l[j + 1].beta()
+
+        inFactor = fdiv(1.0, thisBeta * thisBeta * d[j - 1])
+        A = lastAlpha * inFactor
+        B = (3.0 - lastAlpha) * inFactor
+
+        outFactor = fdiv(1.0, thisAlpha * thisAlpha * d[j])
+        C = (3.0 - nextBeta) * outFactor
+        D = nextBeta * outFactor
+        return Eqn(A, B + C, D, -B * psi[j] - D * psi[j + 1])
+
+    e = knotprop(l, midEqn,
+                 start=lambda j: endSpec(l[j].outSpec).eqnOut(j, l, d, psi),
+                 end=lambda j: endSpec(l[j].inSpec).eqnIn(j, l, d, psi))
+
+    if len(e) == 2 and e[0].aug == 0 and e[1].aug == 0:
+        encodeStraight(p, k, l)
+        return
+
+    theta = solveThetas(l, e)
+
+    def phi(j):
+        return -psi[j] - theta[j]
+
+    post = knotprop(l, lambda j: l[j].z + velocity(theta[j], phi(j + 1), l[j].tout) * expi(theta[j]) * dz[j],
+                    end=lambda j: l[j].z)
+    pre = knotprop(l, lambda j: l[j].z - velocity(phi(j), theta[j - 1], l[j].tin) * expi(-phi(j)) * dz[j - 1],
+                   start=lambda j: l[j].z)
+
+    n = l.length
+    if l.cyclic:
+        for j in range(n):
+            p.set('pre', k + j, pre[j])
+            p.set('point', k + j, l[j].z)
+            p.set('post', k + j, post[j])
+    else:
+        p.set('post', k, post[0])
+        for j in range(1, n):
+            p.set('pre', k + j, pre[j])
+            p.set('point', k + j, l[j].z)
+            p.set('post', k + j, post[j])
+        p.set('pre', k + n, pre[n])
+        p.set('point', k + n, l[n].z)
+
+
+def solveSpecified(l):
+    p = ProtoPath(l.size(), l.cyclic)
+
+    first = next((j for j in range(l.size()) if not l[j].outSpec.open()), None)
+    if first is None:
+        solveSection(p, 0, l)
+        return p
+
+    p.set('point', first, l[first].z)
+    last = first + l.length if l.cyclic else l.length
+    a = first
+    while a != last:
+        if l[a].outSpec.controlled():
+            if not l[a + 1].inSpec.controlled():
+                raise UnsupportedGuide('unmatched control point')
+            p.set('post', a, l[a].outSpec.cz)
+            p.set('pre', a + 1, l[a + 1].inSpec.cz)
+            p.set('point', a + 1, l[a + 1].z)
+            a += 1
+        else:
+            b = a + 1
+            while l[b].inSpec.open():
+                b += 1
+            solveSection(p, a, l.section(a, b))
+            a = b
+
+    if not l.cyclic:
+        p.pre[0] = p.point[0]
+        p.post[-1] = p.point[-1]
+    return p
+
+
+def solveKnots(l):
+    if l.size() == 0:
+        return ProtoPath(0, l.cyclic)
+
+    # curlEnds
+    if not l.cyclic:
+        if l[0].inSpec.open():
+            l[0].inSpec = CURL
+        if l[l.length].outSpec.open():
+            l[l.length].outSpec = CURL
+
+    # controlDuplicates
+    for j in range(l.length):
+        k1, k2 = l[j], l[j + 1]
+        if not k1.outSpec.controlled() and k1.z == k2.z:
+            k1.outSpec = k2.inSpec = ControlSpec(k1.z)
+
+    # partnerUp
+    for j in range(l.size()):
+        k = l[j]
+        if k.inSpec.open() and not k.outSpec.open():
+            k.inSpec = k.outSpec.inPartner(k.z)
+        elif not k.inSpec.open() and k.outSpec.open():
+            k.outSpec = k.inSpec.outPartner(k.z)
+
+    return solveSpecified(l)
+
+
+class FlatGuide:
+    """Collects knots, specifiers and tensions in the order they appear in a guide."""
+
+    def __init__(self):
+        self.knots = []
+        self.pendingIn = OPEN
+        self.pendingTin = Tension()
+
+    def add(self, z):
+        self.knots.append(Knot(z, self.pendingIn, OPEN, self.pendingTin, Tension()))
+        self.pendingIn = OPEN
+        self.pendingTin = Tension()
+
+    def setSpec(self, spec, out):
+        if out:
+            if not self.knots:
+                return
+            ref = self.knots[-1].outSpec
+        else:
+            ref = self.pendingIn
+        # control specifiers trump direction specifiers.
+        if ref.controlled() and not spec.controlled():
+            return
+        if out:
+            self.knots[-1].outSpec = spec
+        else:
+            self.pendingIn = spec
+
+    def setTension(self, t, out):
+        if out:
+            if self.knots:
+                self.knots[-1].tout = t
+        else:
+            self.pendingTin = t
+
+    def join(self, join):
+        outSpec, tout, controls, tin, inSpec = join
+        if outSpec is not None:
+            self.setSpec(outSpec, True)
+        if tout is not None:
+            self.setTension(tout, True)
+            self.setTension(tin, False)
+        if controls is not None:
+            self.setSpec(ControlSpec(controls[0]), True)
+            self.setSpec(ControlSpec(controls[1]), False)
+        if inSpec is not None:
+            self.setSpec(inSpec, False)
+
+    def close(self):
+        if self.knots:
+            self.knots[0].inSpec = self.pendingIn
+            self.knots[0].tin = self.pendingTin
+
+
+_number = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_pair = r'\(({0}),({0})\)'.format(_number)
+_tensionValue = r'({0}|infinity|inf)'.format(_number)
+_linkRe = re.compile(r'^(?:\{([^{}]*)\})?'
+                     r'(---|--|::|\.\.(?:tension(atleast)?' + _tensionValue + r'(?:and' + _tensionValue + r')?\.\.'
+                     r'|controls' + _pair + r'(?:and' + _pair + r')?\.\.)?)'
+                     r'(?:\{([^{}]*)\})?$')
+_namedDirections = {'up': (0, 1), 'down': (0, -1), 'right': (1, 0), 'left': (-1, 0),
+                    'N': (0, 1), 'S': (0, -1), 'E': (1, 0), 'W': (-1, 0),
+                    'NE': (1, 1), 'NW': (-1, 1), 'SE': (1, -1), 'SW': (-1, -1)}
+
+
+def tensionValue(s):
+    return math.inf if s in ('infinity', 'inf') else float(s)
+
+
+def parseSpec(s):
+    if s.startswith('curl'):
+        try:
+            return CurlSpec(float(s[4:]))
+        except ValueError:
+            raise UnsupportedGuide(s)
+    m = re.match(r'^\(?({0}),({0})\)?$'.format(_number), s)
+    if m:
+        return DirSpec(complex(float(m.group(1)), float(m.group(2))))
+    m = re.match(r'^dir\(({0})\)$'.format(_number), s)
+    if m:
+        return DirSpec(expi(float(m.group(1)) * (PI / 180.0)))
+    if s in _namedDirections:
+        return DirSpec(complex(*_namedDirections[s]))
+    raise UnsupportedGuide(s)
+
+
+def parseLink(link):
+    """Parse a join such as '..', '--', '::', '---', '..tension atleast 1.5..',
+    '..controls (0,1) and (1,1)..', optionally with {dir} or {curl c} on either
+    side, into (outSpec, tout, controls, tin, inSpec)."""
+    m = _linkRe.match(re.sub(r'\s+', '', link))
+    if m is None:
+        raise UnsupportedGuide(link)
+    pre, op, atleast, t0, t1, cx0, cy0, cx1, cy1, post = m.groups()
+
+    outSpec = parseSpec(pre) if pre is not None else None
+    inSpec = parseSpec(post) if post is not None else None
+    tout = tin = controls = None
+    if op == '--':
+        # a--b is a{curl 1}..{curl 1}b; the curl overrides a direction given before the join.
+        outSpec = CURL
+        if inSpec is None:
+            inSpec = CURL
+    elif op == '---':
+        tout = tin = Tension(math.inf, True)
+    elif op == '::':
+        tout = tin = Tension(1.0, True)
+    elif t0 is not None:
+        tout = Tension(tensionValue(t0), atleast is not None)
+        tin = Tension(tensionValue(t1 if t1 is not None else t0), atleast is not None)
+    elif cx0 is not None:
+        c0 = complex(float(cx0), float(cy0))
+        controls = (c0, complex(float(cx1), float(cy1)) if cx1 is not None else c0)
+    return outSpec, tout, controls, tin, inSpec
+
+
+def solveGuide(nodes, joins):
+    """Solve a guide given as a list of points (complex), possibly ending in
+    'cycle', and the joins between consecutive nodes, each a link string or a
+    (control, control) pair. Returns (points, controls, cyclic), where
+    controls[i] holds the two control points between point i and the next."""
+    g = FlatGuide()
+    cyclic = False
+    for i, node in enumerate(nodes):
+        if i > 0:
+            join = joins[i - 1]
+            if isinstance(join, str):
+                g.join(parseLink(join))
+            else:
+                g.join((None, None, tuple(join), None, None))
+        if node == 'cycle':
+            if i != len(nodes) - 1:
+                raise UnsupportedGuide('cycle must end the guide')
+            cyclic = True
+            g.close()
+        else:
+            g.add(node)
+
+    p = solveKnots(KnotList(g.knots, cyclic))
+    segments = p.n if cyclic else p.n - 1
+    controls = [(p.post[j], p.pre[(j + 1) % p.n]) for j in range(segments)]
+    for z in p.point + [c for pair in controls for c in pair]:
+        if not (math.isfinite(z.real) and math.isfinite(z.imag)):
+            raise UnsupportedGuide('the solution is not finite')
+    return p.point, controls, cyclic
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import PyQt5.QtCore as Qc
+import math
+
+class DrawObjectIndex(Qc.QObject):
+    """A uniform grid over the canvas bounding boxes of a list of lists of DrawObjects,
+    answering which objects may lie under a point and which objects share a key.
+    Objects are addressed by their (major, minor) position, as in Window1.drawObjects.
+    An object is only re-indexed when its bounds change."""
+
+    # objects spanning more cells than this are checked on every query instead.
+    maxCellsPerObject = 64
+    # matches the fuzz DrawObject.collide adds to thin objects.
+    margin = 1
+
+    def __init__(self):
+        super().__init__()
+        self.drawObjects = None
+        self.layout = None
+        self.cellSize = 1
+        self.cells = {}
+        self.largeObjects = set()
+        self.objectCells = {}
+        self.positions = {}
+        self.keyMap = {}
+        self.movedObjects = set()
+
+    def getLayout(self, drawObjects):
+        return [(id(majorList), len(majorList)) for majorList in drawObjects]
+
+    def invalidate(self):
+        self.layout = None
+
+    def update(self, drawObjects):
+        """Bring the index up to date with drawObjects, rebuilding it only if items were added or removed."""
+        if drawObjects is not self.drawObjects or self.layout != self.getLayout(drawObjects):
+            self.rebuild(drawObjects)
+        elif self.movedObjects:
+            for obj in self.movedObjects:
+                self.removeCells(obj)
+                self.insertCells(obj)
+            self.movedObjects.clear()
+
+    def rebuild(self, drawObjects):
+        for obj in self.positions:
+            try:
+                obj.boundsChanged.disconnect(self.objectMoved)
+            except (TypeError, RuntimeError):
+                pass
+
+        self.drawObjects = drawObjects
+        self.layout = self.getLayout(drawObjects)
+        self.cells = {}
+        self.largeObjects = set()
+        self.objectCells = {}
+        self.positions = {}
+        self.keyMap = {}
+        self.movedObjects = set()
+
+        boxes = []
+        for maj in range(len(drawObjects)):
+            for minor in range(len(drawObjects[maj])):
+                obj = drawObjects[maj][minor]
+                if obj not in self.positions:
+                    obj.boundsChanged.connect(self.objectMoved)
+                self.positions[obj] = (maj, minor)
+                self.keyMap.setdefault(obj.key, []).append((maj, minor))
+                box = obj.boundingBox
+                boxes.append(max(box.width(), box.height()))
+
+        # size the cells after a typical object, so that most objects fall in a few cells.
+        boxes.sort()
+        self.cellSize = max(boxes[len(boxes) // 2], 1) if boxes else 1
+        for obj in self.positions:
+            self.insertCells(obj)
+
+    def getCellRange(self, box):
+        box = box.marginsAdded(Qc.QMarginsF(self.margin, self.margin, self.margin, self.margin))
+        return (math.floor(box.left() / self.cellSize), math.floor(box.right() / self.cellSize),
+                math.floor(box.top() / self.cellSize), math.floor(box.bottom() / self.cellSize))
+
+    def insertCells(self, obj):
+        left, right, top, bottom = self.getCellRange(obj.boundingBox)
+        if (right - left + 1) * (bottom - top + 1) > self.maxCellsPerObject:
+            self.largeObjects.add(obj)
+            self.objectCells[obj] = None
+            return
+
+        cellList = [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+        for cell in cellList:
+            self.cells.setdefault(cell, set()).add(obj)
+        self.objectCells[obj] = cellList
+
+    def removeCells(self, obj):
+        cellList = self.objectCells.pop(obj, None)
+        if cellList is None:
+            self.largeObjects.discard(obj)
+            return
+        for cell in cellList:
+            self.cells[cell].discard(obj)
+
+    def objectMoved(self):
+        obj = self.sender()
+        if obj in self.positions:
+            self.movedObjects.add(obj)
+
+    def candidatesAt(self, point):
+        """Return the positions of the objects whose bounding box may contain point, in drawing order."""
+        cell = (math.floor(point.x() / self.cellSize), math.floor(point.y() / self.cellSize))
+        candidates = self.largeObjects.union(self.cells.get(cell, ()))
+        return sorted(self.positions[obj] for obj in candidates)
+
+    def positionsWithKey(self, key):
+        return self.keyMap.get(key, [])
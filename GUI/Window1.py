@@ -26,8 +26,10 @@ import xasyOptions as xo
 import UndoRedoStack as Urs
 import xasyArgs as xa
 import xasyBezierInterface as xbi
+import xasyCache as xc
 from xasyTransform import xasyTransform as xT
 import xasyStrings as xs
+import xasySvg as xsvg
 
 import PrimitiveShape
 import InplaceAddObj
@@ -35,6 +37,7 @@ import InplaceAddObj
 import CustMatTransform
 import SetCustomAnchor
 import GuidesManager
+import SpatialIndex
 
 
 class ActionChanges:
@@ -125,7 +128,17 @@ class MainWindow1(Qw.QMainWindow):
             asyPath = self.settings['asyPath']
 
         self.asyPath = asyPath
-        self.asyEngine = x2a.AsymptoteEngine(self.asyPath)
+        fragmentCache = None
+        if self.settings['fragmentCacheSize'] > 0:
+            try:
+                fragmentCache = xc.FragmentCache(os.path.expanduser('~/.asy/xasycache'),
+                                                 self.settings['fragmentCacheSize'] * 1024 * 1024,
+                                                 version=xasyVersion.xasyVersion + xc.asyFingerprint(self.asyPath))
+            except OSError:
+                fragmentCache = None
+        self.asyEngine = x2a.AsymptoteEnginePool(self.asyPath, size=self.settings['asyEnginePoolSize'],
+                                                 useFrames=self.settings['useBinaryFrames'],
+                                                 fragmentCache=fragmentCache)
 
         try:
             self.asyEngine.start()
@@ -200,14 +213,34 @@ class MainWindow1(Qw.QMainWindow):
 
         self.finalPixmap = None
         self.postCanvasPixmap = None
+
+        # what was last painted on canvasPixmap, to repaint only the tiles that changed.
+        self.canvasState = None
+        self.canvasRecords = None
         self.previewCurve = None
         self.mouseDown = False
 
         self.globalObjectCounter = 0
+        self.loadedScript = None
+
+        # items still being deconstructed, mapped to whether they have yet to be forced.
+        self.pendingAsyfyItems = {}
+        self.asyfyTimer = Qc.QTimer(self)
+        self.asyfyTimer.setInterval(self.settings['progressiveRenderInterval'])
+        self.asyfyTimer.timeout.connect(self.receivePendingFragments)
+
+        # redraw once finer rasterizations arrive, batching those that arrive together.
+        xsvg.getRasterCache().setBudget(self.settings['rasterCacheSize'] * 1024 * 1024)
+        self.rasterTimer = Qc.QTimer(self)
+        self.rasterTimer.setSingleShot(True)
+        self.rasterTimer.setInterval(self.settings['progressiveRenderInterval'])
+        self.rasterTimer.timeout.connect(self.rasterImagesReady)
+        xsvg.getRasterCache().imageReady.connect(self.rasterTimer.start)
 
         self.fileItems = []
         self.drawObjects = []
         self.xasyDrawObj = {'drawDict': self.drawObjects}
+        self.drawObjectIndex = SpatialIndex.DrawObjectIndex()
 
         self.modeButtons = {
             self.ui.btnTranslate, self.ui.btnRotate, self.ui.btnScale, # self.ui.btnSelect,
@@ -364,6 +397,7 @@ class MainWindow1(Qw.QMainWindow):
         settingsFile = self.settings.settingsFileLocation()
         subprocess.run(args=self.getExternalEditor(asypath=settingsFile))
         self.settings.load()
+        self.invalidateCanvas()
         self.quickUpdate()
 
     def setMagPrompt(self):
@@ -954,7 +988,10 @@ class MainWindow1(Qw.QMainWindow):
             self.canvasPixmap = Qg.QPixmap(self.canvSize)
             self.canvasPixmap.setDevicePixelRatio(devicePixelRatio)
             self.postCanvasPixmap = Qg.QPixmap(self.canvSize)
-            self.canvasPixmap.setDevicePixelRatio(devicePixelRatio)
+            self.postCanvasPixmap.setDevicePixelRatio(devicePixelRatio)
+            self.finalPixmap = Qg.QPixmap(self.canvSize)
+            self.finalPixmap.setDevicePixelRatio(devicePixelRatio)
+            self.invalidateCanvas()
 
             self.quickUpdate()
 
@@ -1343,6 +1380,7 @@ class MainWindow1(Qw.QMainWindow):
         self.mainTransformation.translate(x, y)
 
         self.mainCanvas.setTransform(self.getScrsTransform(), True)
+        self.invalidateCanvas()
 
         self.ui.imgLabel.setPixmap(self.canvasPixmap)
 
@@ -1369,13 +1407,16 @@ class MainWindow1(Qw.QMainWindow):
         highestDrawPriority = -np.inf
         collidedObjKey = None
         rawObjNumList = []
-        for objKeyMaj in range(len(self.drawObjects)):
-            for objKeyMin in range(len(self.drawObjects[objKeyMaj])):
-                obj = self.drawObjects[objKeyMaj][objKeyMin]
-                if obj.collide(canvasCoords) and (obj.key, obj.keyIndex) not in self.hiddenKeys:
-                    rawObjNumList.append(((objKeyMaj, objKeyMin), obj.drawOrder))
-                    if obj.drawOrder > highestDrawPriority:
-                        collidedObjKey = (objKeyMaj, objKeyMin)
+        self.drawObjectIndex.update(self.drawObjects)
+        for objKeyMaj, objKeyMin in self.drawObjectIndex.candidatesAt(canvasCoords):
+            obj = self.drawObjects[objKeyMaj][objKeyMin]
+            if obj.originalObj in self.pendingAsyfyItems:
+                # its keys are only known once the deconstruction has finished.
+                continue
+            if obj.collide(canvasCoords) and (obj.key, obj.keyIndex) not in self.hiddenKeys:
+                rawObjNumList.append(((objKeyMaj, objKeyMin), obj.drawOrder))
+                if obj.drawOrder > highestDrawPriority:
+                    collidedObjKey = (objKeyMaj, objKeyMin)
         if collidedObjKey is not None:
             rawKey = self.drawObjects[collidedObjKey[0]][collidedObjKey[1]].key
 #            self.ui.statusbar.showMessage('Collide with {0}, Key is {1}'.format(str(collidedObjKey), rawKey), 2500)
@@ -1392,11 +1433,8 @@ class MainWindow1(Qw.QMainWindow):
         rawObj = self.drawObjects[objKey[0]][objKey[1]]
         rawKey = rawObj.key
         rawSet = {objKey}
-        for objKeyMaj in range(len(self.drawObjects)):
-            for objKeyMin in range(len(self.drawObjects[objKeyMaj])):
-                obj = self.drawObjects[objKeyMaj][objKeyMin]
-                if obj.key == rawKey:
-                    rawSet.add((objKeyMaj, objKeyMin))
+        self.drawObjectIndex.update(self.drawObjects)
+        rawSet.update(self.drawObjectIndex.positionsWithKey(rawKey))
         return rawKey, rawSet
 
     def getCanvasCoordinates(self):
@@ -1421,9 +1459,44 @@ class MainWindow1(Qw.QMainWindow):
         self.drawObjects = []
         self.populateCanvasWithItems(force)
         self.quickUpdate()
-        if self.currentModeStack[-1] == SelectionMode.translate:
+        if not self.pendingAsyfyItems and self.currentModeStack[-1] == SelectionMode.translate:
             self.ui.statusbar.showMessage(self.strings.asyfyComplete)
 
+    def receivePendingFragments(self):
+        received = False
+        for item, force in list(self.pendingAsyfyItems.items()):
+            if item.asyfyWorker is None and item.needsAsyfy(force):
+                if not item.prefetchDrawObjects(force):
+                    continue
+                self.pendingAsyfyItems[item] = False
+
+            if item.asyfyWorker is not None:
+                count = len(item.drawObjects)
+                finished = item.pollAsyfy()
+                received = received or len(item.drawObjects) != count
+            else:
+                # deconstructed synchronously in the meantime.
+                finished = True
+
+            if finished:
+                del self.pendingAsyfyItems[item]
+                self.itemAsyfied(item)
+                received = True
+
+        if not self.pendingAsyfyItems:
+            self.asyfyTimer.stop()
+            if self.currentModeStack[-1] == SelectionMode.translate:
+                self.ui.statusbar.showMessage(self.strings.asyfyComplete)
+        if received:
+            # fragments may have been replaced or rekeyed without changing the list lengths.
+            self.drawObjectIndex.invalidate()
+            self.quickUpdate()
+
+    def itemAsyfied(self, item):
+        if item is self.loadedScript:
+            self.asy2psmap = item.asy2psmap
+            self.globalObjectCounter = max(self.globalObjectCounter, item.getMaxKeyCounter())
+
     def updateMouseCoordLabel(self):
         *args, canvasPos = self.getAsyCoordinates()
         nx, ny = self.asy2psmap.inverted() * (canvasPos.x(), canvasPos.y())
@@ -1433,27 +1506,130 @@ class MainWindow1(Qw.QMainWindow):
         self.updateMouseCoordLabel()
         self.refreshCanvas()
 
-        self.preDraw(self.mainCanvas)
-        self.quickDraw()
+        dirtyRegion = self.getDirtyRegion()
+        if dirtyRegion is None:
+            self.preDraw(self.mainCanvas)
+            self.quickDraw()
+        elif not dirtyRegion.isEmpty():
+            # the clip region is given in pixmap coordinates.
+            self.mainCanvas.resetTransform()
+            self.mainCanvas.setClipRegion(dirtyRegion)
+            self.preDraw(self.mainCanvas, dirtyRegion)
+            self.quickDraw(dirtyRegion)
 
         self.mainCanvas.end()
         self.postDraw()
         self.updateScreen()
 
-    def quickDraw(self):
+    def rasterImagesReady(self):
+        if self.isReady():
+            self.invalidateCanvas()
+            self.quickUpdate()
+
+    def invalidateCanvas(self):
+        """Repaint the whole canvas on the next update."""
+        self.canvasRecords = None
+
+    def getCanvasState(self):
+        """Everything besides the objects themselves that affects what is painted on canvasPixmap."""
+        scrsTransf = self.getScrsTransform()
+        return (self.canvSize, (scrsTransf.m11(), scrsTransf.m12(), scrsTransf.m21(), scrsTransf.m22(),
+                                scrsTransf.dx(), scrsTransf.dy()),
+                self.magnification, self.drawAxes, self.drawGrid, self.drawGridMode, tuple(self.asy2psmap.t),
+                frozenset(self.hiddenKeys), self.currentlySelectedObj['key'],
+                self.currentlySelectedObj['selectedIndex'], self.selectAsGroup, self.useGlobalCoords,
+                tuple(self.pendingSelectedObjList), self.pendingSelectedObjIndex,
+                id(self.drawObjects), [(id(majorItem), len(majorItem)) for majorItem in self.drawObjects])
+
+    def isPreviewed(self, item):
+        isSelected = item.key == self.currentlySelectedObj['key']
+        if not self.selectAsGroup and isSelected and self.currentlySelectedObj['selectedIndex'] is not None:
+            maj, min_ = self.currentlySelectedObj['selectedIndex']
+            isSelected = isSelected and item is self.drawObjects[maj][min_]
+        return isSelected and self.settings['enableImmediatePreview']
+
+    def getCanvasRecord(self, item):
+        """Return (item, version, preview transform, pixmap rectangle) for an item as quickDraw would paint it."""
+        if (item.key, item.keyIndex) in self.hiddenKeys:
+            return (item, item.version, None, Qc.QRect())
+
+        previewTransf = None
+        if self.isPreviewed(item):
+            previewTransf = Qg.QTransform(self.newTransform) if self.newTransform is not None else Qg.QTransform()
+            rect = item.getDrawnBoundingBox(previewTransf, applyReverse=not self.useGlobalCoords)
+        else:
+            rect = item.boundingBox
+
+        # leave room for the pen and antialiasing.
+        margin = 2
+        if item.pen:
+            margin += int(np.ceil(item.pen.width * self.magnification))
+        rect = self.getScrsTransform().mapRect(rect).toAlignedRect()
+        return (item, item.version, previewTransf, rect.adjusted(-margin, -margin, margin, margin))
+
+    def getDirtyRegion(self):
+        """Return the region of canvasPixmap that has to be repainted, or None to repaint all of it."""
+        state = self.getCanvasState()
+        previousRecords = self.canvasRecords if state == self.canvasState and not self.currentGuides else None
+        self.canvasState = state
+
+        tileSize = 64
+        dirtyRegion = Qg.QRegion()
+        self.canvasRecords = []
+        for maj in range(len(self.drawObjects)):
+            records = []
+            for minor in range(len(self.drawObjects[maj])):
+                item = self.drawObjects[maj][minor]
+                oldRecord = previousRecords[maj][minor] if previousRecords is not None else None
+                if oldRecord is not None and oldRecord[0] is item and oldRecord[1] == item.version \
+                        and oldRecord[2] is None and not self.isPreviewed(item):
+                    records.append(oldRecord)
+                    continue
+
+                record = self.getCanvasRecord(item)
+                records.append(record)
+                if previousRecords is not None and (oldRecord[0] is not item or oldRecord[1:] != record[1:]):
+                    for rect in (oldRecord[3], record[3]):
+                        if not rect.isEmpty():
+                            # snap to tiles, so that the region stays a handful of rectangles.
+                            left, top = rect.left() // tileSize, rect.top() // tileSize
+                            right, bottom = rect.right() // tileSize + 1, rect.bottom() // tileSize + 1
+                            dirtyRegion += Qc.QRect(left * tileSize, top * tileSize,
+                                                    (right - left) * tileSize, (bottom - top) * tileSize)
+            self.canvasRecords.append(records)
+
+        if previousRecords is None:
+            return None
+        return dirtyRegion
+
+    def quickDraw(self, dirtyRegion=None):
         assert self.isReady()
         dpi = self.magnification * self.dpi
         activeItem = None
-        for majorItem in self.drawObjects:
-            for item in majorItem:
+        # rasterize everything that needs it in parallel, and resolve the pen
+        # colors in one go, before drawing in order.
+        pens = []
+        for maj in range(len(self.drawObjects)):
+            for minor in range(len(self.drawObjects[maj])):
+                item = self.drawObjects[maj][minor]
+                if (item.key, item.keyIndex) in self.hiddenKeys:
+                    continue
+                if dirtyRegion is None or dirtyRegion.intersects(self.canvasRecords[maj][minor][3]):
+                    item.prefetchRaster(dpi)
+                    pens.append(item.pen)
+        x2a.asyPen.resolveColors(pens)
+
+        for maj in range(len(self.drawObjects)):
+            for minor in range(len(self.drawObjects[maj])):
+                item = self.drawObjects[maj][minor]
                 # hidden objects - toggleable
                 if (item.key, item.keyIndex) in self.hiddenKeys:
                     continue
-                isSelected = item.key == self.currentlySelectedObj['key']
-                if not self.selectAsGroup and isSelected and self.currentlySelectedObj['selectedIndex'] is not None:
-                    maj, min_ = self.currentlySelectedObj['selectedIndex']
-                    isSelected = isSelected and item is self.drawObjects[maj][min_]
-                if isSelected and self.settings['enableImmediatePreview']:
+                if dirtyRegion is not None and not dirtyRegion.intersects(self.canvasRecords[maj][minor][3]):
+                    if self.isPreviewed(item):
+                        activeItem = item
+                    continue
+                if self.isPreviewed(item):
                     activeItem = item
                     if self.useGlobalCoords:
                         item.draw(self.newTransform, canvas=self.mainCanvas, dpi=dpi)
@@ -1475,8 +1651,8 @@ class MainWindow1(Qw.QMainWindow):
                 activeItem = None
 
     def updateScreen(self):
-        self.finalPixmap = Qg.QPixmap(self.canvSize)
-        self.finalPixmap.setDevicePixelRatio(devicePixelRatio)
+        # drop the label's reference to the last frame first, so painting reuses the buffer instead of copying it.
+        self.ui.imgLabel.clear()
         self.finalPixmap.fill(Qc.Qt.black)
         with Qg.QPainter(self.finalPixmap) as finalPainter:
             drawPoint = Qc.QPoint(0, 0)
@@ -1560,8 +1736,12 @@ class MainWindow1(Qw.QMainWindow):
 
             currAng = currAng + majorAxisAng
 
-    def preDraw(self, painter):
-        self.canvasPixmap.fill()
+    def preDraw(self, painter, dirtyRegion=None):
+        if dirtyRegion is None:
+            self.canvasPixmap.fill()
+        else:
+            for rect in dirtyRegion.rects():
+                painter.fillRect(rect, Qc.Qt.white)
         preCanvas = painter
 
         preCanvas.setTransform(self.getScrsTransform())
@@ -1797,7 +1977,8 @@ class MainWindow1(Qw.QMainWindow):
         item = drawObj.originalObj
         key = drawObj.key
         keyIndex = drawObj.keyIndex
-
+        if item in self.pendingAsyfyItems:
+            return
 
         item.transfKeymap[key][keyIndex].deleted = True
         # item.asyfied = False
@@ -1812,6 +1993,9 @@ class MainWindow1(Qw.QMainWindow):
         return item, key, keyIndex
 
     def transformObjKey(self, item, key, keyIndex, transform, applyFirst=False, drawObj=None):
+        if item in self.pendingAsyfyItems:
+            # fragments of an unfinished deconstruction are not interactive yet.
+            return
         if isinstance(transform, np.ndarray):
             obj_transform = x2a.asyTransform.fromNumpyMatrix(transform)
         elif isinstance(transform, Qg.QTransform):
@@ -1833,18 +2017,24 @@ class MainWindow1(Qw.QMainWindow):
                 drawObj.transform = drawObj.transform * scr_transform
 
         if self.selectAsGroup:
-            for (maj2, min2) in self.currentlySelectedObj['allSameKey']:
-                if (maj2, min2) == (maj, minor):
-                    continue
-                obj = self.drawObjects[maj2][min2]
-                newIndex = obj.keyIndex
+            # transform the rest of the group in one go.
+            objs = [self.drawObjects[maj2][min2] for (maj2, min2) in self.currentlySelectedObj['allSameKey']]
+            objs = [obj for obj in objs if obj is not drawObj]
+            if objs:
+                keyTransforms = x2a.asyTransformArray.fromTransforms(
+                    [item.transfKeymap[key][obj.keyIndex] for obj in objs])
+                objTransforms = x2a.asyTransformArray.fromTransforms([obj.transform for obj in objs])
                 if not applyFirst:
-                    item.transfKeymap[key][newIndex] = obj_transform * \
-                        item.transfKeymap[key][newIndex]
-                    obj.transform = scr_transform * obj.transform
+                    keyTransforms = obj_transform * keyTransforms
+                    objTransforms = scr_transform * objTransforms
                 else:
-                    item.transfKeymap[key][newIndex] = item.transfKeymap[key][newIndex] * obj_transform
-                    obj.transform = obj.transform * scr_transform
+                    keyTransforms = keyTransforms * obj_transform
+                    objTransforms = objTransforms * scr_transform
+
+                for obj, keyTransform, objTransform in zip(objs, keyTransforms.toTransforms(),
+                                                           objTransforms.toTransforms()):
+                    item.transfKeymap[key][obj.keyIndex] = keyTransform
+                    obj.transform = objTransform
 
         self.fileChanged = True
         self.quickUpdate()
@@ -1888,6 +2078,9 @@ class MainWindow1(Qw.QMainWindow):
             return
 
         self.ui.statusbar.showMessage('Load {0}'.format(filename))
+        # when reloading, unchanged statements reuse the fragments of the previous deconstruction.
+        previousScripts = [item for item in self.fileItems if isinstance(item, x2a.xasyScript)] \
+            if filename == self.filename else []
         self.filename = filename
         self.currDir = os.path.dirname(self.filename)
 
@@ -1901,18 +2094,31 @@ class MainWindow1(Qw.QMainWindow):
         else:
             rawText, transfDict, maxKey = xf.extractTransformsFromFile(rawFileStr)
             item = x2a.xasyScript(canvas=self.xasyDrawObj, engine=self.asyEngine, transfKeyMap=transfDict)
+            if previousScripts:
+                item.inheritFragments(previousScripts[0])
 
             item.setScript(rawText)
             self.fileItems.append(item)
+            self.loadedScript = item
+            self.globalObjectCounter = maxKey + 1
             self.asyfyCanvas(True)
 
-            maxKey2 = item.getMaxKeyCounter()
-            self.asy2psmap = item.asy2psmap
-            self.globalObjectCounter = max(maxKey + 1, maxKey2)
+            if item not in self.pendingAsyfyItems:
+                self.itemAsyfied(item)
         finally:
             f.close()
 
     def populateCanvasWithItems(self, forceUpdate=False):
         self.itemCount = 0
+        # start deconstructing on every idle engine first so items are processed in parallel.
         for item in self.fileItems:
-            self.drawObjects.append(item.generateDrawObjects(forceUpdate))
+            item.prefetchDrawObjects(forceUpdate)
+        for item in self.fileItems:
+            if self.settings['progressiveRendering'] and item.needsAsyfy(forceUpdate):
+                # fragments are drawn by receivePendingFragments as they arrive.
+                self.drawObjects.append(item.drawObjects)
+                if item not in self.pendingAsyfyItems:
+                    self.pendingAsyfyItems[item] = forceUpdate and item.asyfyWorker is None
+                self.asyfyTimer.start()
+            else:
+                self.drawObjects.append(item.generateDrawObjects(forceUpdate))
@@ -10,6 +10,7 @@ import xasy2asy as x2a
 import subprocess
 import xasyOptions as xo
 import xasyUtils as xu
+import xasyParser as xp
 import tempfile
 import uuid
 import os
@@ -95,8 +96,8 @@ class labelEditor(Qw.QDialog):
 
             bounds_1, bounds_2 = [val.strip() for val in raw_array]
 
-            min_bounds = xu.listize(bounds_1, (float, float))
-            max_bounds = xu.listize(bounds_2, (float, float))
+            min_bounds = xp.parsePair(bounds_1)
+            max_bounds = xp.parsePair(bounds_2)
 
             new_rect = self.processBounds(min_bounds, max_bounds)
             self.svgPreview.load(tmpFile)
@@ -9,5 +9,6 @@ setup(
     author="Supakorn Rassameemasmuang, Orest Shardt, and John C. Bowman",
     description="User interface for Asymptote, a vector graphics language", 
     url="http://asymptote.sourceforge.net",
-    download_url="https://sourceforge.net/projects/asymptote/"
+    download_url="https://sourceforge.net/projects/asymptote/",
+    python_requires=">=3.7"
 )
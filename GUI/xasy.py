@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 
 import sys,signal,os
+import logging
 import PyQt5.QtWidgets as Qw
 import PyQt5.QtCore as Qc
+
+# before Window1 is imported, so that its modules' start-up messages are shown.
+logging.basicConfig(format='xasy: %(message)s', level=logging.INFO)
+
 from Window1 import MainWindow1
 
 def main(args):
@@ -29,17 +29,37 @@ import copy
 import queue
 import io
 import atexit
+import contextlib
+import struct
+import hashlib
 import DebugFlags
 
 import xasyUtils as xu
 import xasyArgs as xa
 import xasyOptions as xo
 import xasySvg as xs
+import GuideSolver as gs
+import xasyParser as xp
+import xasyColors as xc
+
+class AsymptoteReplyStream:
+    """The engine's output pipe, read in binary so that -xasyframes payloads
+    arrive byte for byte. readline() decodes the text replies, normalizing
+    Windows line ends; frames are read from buffer, which shares the position."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def readline(self):
+        line = self.buffer.readline().decode()
+        if line.endswith('\r\n'):
+            line = line[:-2] + '\n'
+        return line
 
 class AsymptoteEngine:
     xasy=chr(4)+"\n"
 
-    def __init__(self, path=None, keepFiles=DebugFlags.keepFiles, keepDefaultArgs=True):
+    def __init__(self, path=None, keepFiles=DebugFlags.keepFiles, keepDefaultArgs=True, useFrames=False):
         if path is None:
             path = xa.getArgs().asypath
             if path is None:
@@ -58,27 +78,32 @@ class AsymptoteEngine:
             os.set_inheritable(ra, True)
             os.set_inheritable(wa, True)
             self.ostream = os.fdopen(wx, 'w')
-            self.istream = os.fdopen(ra, 'r')
+            self.istream = AsymptoteReplyStream(os.fdopen(ra, 'rb'))
             
         self.keepFiles = keepFiles
         if sys.platform[:3] == 'win':
-            self.tmpdir = tempfile.mkdtemp(prefix='xasyData_',dir='./')+'/'
+            # absolute, as workers read fragments while the GUI thread may chdir.
+            self.tmpdir = os.path.abspath(tempfile.mkdtemp(prefix='xasyData_',dir='./'))+'/'
         else:
             self.tmpdir = tempfile.mkdtemp(prefix='xasyData_')+os.sep
 
         self.args=['-xasy', '-noV', '-q', '-inpipe=' + str(rx), '-outpipe=' + str(wa), '-o', self.tmpdir]
+        self.useFrames = useFrames
+        if useFrames:
+            self.args.append('-xasyframes')
 
         self.asyPath = path
         self.asyProcess = None
+        self.leaseLock = threading.Lock()
+        self.fragmentCache = None
 
     def start(self):
         try:
             if sys.platform[:3] == 'win':
                 self.asyProcess = subprocess.Popen([self.asyPath] + self.args,
-                                                stdin=subprocess.PIPE, stderr=subprocess.PIPE,
-                                                universal_newlines=True)
-                self.ostream = self.asyProcess.stdin
-                self.istream = self.asyProcess.stderr
+                                                stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+                self.ostream = io.TextIOWrapper(self.asyProcess.stdin, write_through=True)
+                self.istream = AsymptoteReplyStream(self.asyProcess.stderr)
             else:
                 self.asyProcess = subprocess.Popen([self.asyPath] + self.args,close_fds=False)
         finally:
@@ -125,12 +150,99 @@ class AsymptoteEngine:
             if os.path.isdir(self.tempDirName + os.sep):
                 shutil.rmtree(self.tempDirName, ignore_errors=True)
 
-class asyTransform(Qc.QObject):
+    def acquire(self, block=True, timeout=None):
+        """Reserve this engine for one request. Returns None if it is busy and block is False."""
+        if self.leaseLock.acquire(block, -1 if timeout is None else timeout):
+            return self
+        return None
+
+    def release(self, engine):
+        assert engine is self
+        self.leaseLock.release()
+
+    @contextlib.contextmanager
+    def lease(self):
+        """Use the engine exclusively until the request, including its chr(4) terminator, is answered."""
+        engine = self.acquire()
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+class AsymptoteEnginePool:
+    """A set of pre-started AsymptoteEngines. Each request leases one idle
+    engine, so that requests from several threads run in parallel instead of
+    queueing behind a single pipe."""
+
+    def __init__(self, path=None, size=None, keepFiles=DebugFlags.keepFiles, useFrames=False, fragmentCache=None):
+        if size is None:
+            size = os.cpu_count() or 1
+        self.engines = [AsymptoteEngine(path, keepFiles=keepFiles, useFrames=useFrames)
+                        for _ in range(max(size, 1))]
+        self.idleEngines = queue.LifoQueue()
+        # an xasyCache.FragmentCache consulted before deconstructing, or None.
+        self.fragmentCache = fragmentCache
+
+    def start(self):
+        for engine in self.engines:
+            engine.start()
+            self.idleEngines.put(engine)
+
+    def wait(self):
+        for engine in self.engines:
+            if engine.asyProcess is not None:
+                engine.wait()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        self.wait()
+
+    @property
+    def size(self):
+        return len(self.engines)
+
+    @property
+    def active(self):
+        return all(engine.active for engine in self.engines)
+
+    def stop(self):
+        for engine in self.engines:
+            engine.stop()
+
+    def cleanup(self):
+        for engine in self.engines:
+            engine.cleanup()
+
+    def acquire(self, block=True, timeout=None):
+        """Lease an idle engine. Returns None if none is idle and block is False."""
+        try:
+            return self.idleEngines.get(block, timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, engine):
+        assert engine in self.engines
+        self.idleEngines.put(engine)
+
+    @contextlib.contextmanager
+    def lease(self):
+        engine = self.acquire()
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+class asyTransform:
     """A python implementation of an asy transform"""
 
+    __slots__ = ('t', 'x', 'y', 'xx', 'xy', 'yx', 'yy', '_deleted')
+
     def __init__(self, initTuple, delete=False):
         """Initialize the transform with a 6 entry tuple"""
-        super().__init__()
         if isinstance(initTuple, (tuple, list)) and len(initTuple) == 6:
             self.t = initTuple
             self.x, self.y, self.xx, self.xy, self.yx, self.yy = initTuple
@@ -174,7 +286,7 @@ class asyTransform(Qc.QObject):
     def getCode(self, asy2psmap=None):
         """Obtain the asy code that represents this transform"""
         if asy2psmap is None:
-            asy2psmap = asyTransform((0, 0, 1, 0, 0, 1))
+            asy2psmap = identity()
         if self.deleted:
             return 'zeroTransform'
         else:
@@ -191,10 +303,15 @@ class asyTransform(Qc.QObject):
         return self.getCode()
 
     def isIdentity(self):
-        return self == identity()
+        return tuple(self.t) == (0, 0, 1, 0, 0, 1)
 
     def inverted(self):
-        return asyTransform.fromQTransform(self.toQTransform().inverted()[0])
+        """The inverse, or the identity if the transform is singular, as QTransform.inverted gives."""
+        det = self.xx * self.yy - self.xy * self.yx
+        if abs(det) <= 1e-12:
+            return identity()
+        xx, xy, yx, yy = self.yy / det, -self.xy / det, -self.yx / det, self.xx / det
+        return asyTransform((-(xx * self.x + xy * self.y), -(yx * self.x + yy * self.y), xx, xy, yx, yy))
 
     def __eq__(self, other):
         return list(self.t) == list(other.t)
@@ -210,15 +327,14 @@ class asyTransform(Qc.QObject):
             else:
                 raise Exception("Illegal multiplier of {:s}".format(str(type(other))))
         elif isinstance(other, asyTransform):
-            result = asyTransform((0, 0, 0, 0, 0, 0))
-            result.x = self.x + self.xx * other.x + self.xy * other.y
-            result.y = self.y + self.yx * other.x + self.yy * other.y
-            result.xx = self.xx * other.xx + self.xy * other.yx
-            result.xy = self.xx * other.xy + self.xy * other.yy
-            result.yx = self.yx * other.xx + self.yy * other.yx
-            result.yy = self.yx * other.xy + self.yy * other.yy
-            result.t = (result.x, result.y, result.xx, result.xy, result.yx, result.yy)
-            return result
+            return asyTransform((self.x + self.xx * other.x + self.xy * other.y,
+                                 self.y + self.yx * other.x + self.yy * other.y,
+                                 self.xx * other.xx + self.xy * other.yx,
+                                 self.xx * other.xy + self.xy * other.yy,
+                                 self.yx * other.xx + self.yy * other.yx,
+                                 self.yx * other.xy + self.yy * other.yy))
+        elif isinstance(other, asyTransformArray):
+            return asyTransformArray(composeTransforms(np.array(self.t, dtype=float), other.t))
         elif isinstance(other, str):
             if other != 'cycle':
                 raise TypeError
@@ -228,6 +344,73 @@ class asyTransform(Qc.QObject):
             raise TypeError("Illegal multiplier of {:s}".format(str(type(other))))
 
 
+def composeTransforms(a, b):
+    """Compose arrays of transforms, whose last axis holds (x,y,xx,xy,yx,yy), elementwise."""
+    x, y, xx, xy, yx, yy = np.moveaxis(a, -1, 0)
+    bx, by, bxx, bxy, byx, byy = np.moveaxis(b, -1, 0)
+    return np.stack((x + xx * bx + xy * by,
+                     y + yx * bx + yy * by,
+                     xx * bxx + xy * byx,
+                     xx * bxy + xy * byy,
+                     yx * bxx + yy * byx,
+                     yx * bxy + yy * byy), axis=-1)
+
+
+class asyTransformArray:
+    """An n x 6 array of transforms, composed, inverted and applied all at once.
+    Transforms compose with arrays on either side, broadcasting."""
+
+    __slots__ = ('t',)
+
+    def __init__(self, t):
+        self.t = np.asarray(t, dtype=float).reshape(-1, 6)
+
+    @classmethod
+    def fromTransforms(cls, transforms):
+        return cls([transf.t for transf in transforms])
+
+    def toTransforms(self):
+        return [asyTransform(tuple(row)) for row in self.t.tolist()]
+
+    def __len__(self):
+        return len(self.t)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return asyTransform(tuple(self.t[index].tolist()))
+        return asyTransformArray(self.t[index])
+
+    def isIdentity(self):
+        """A boolean array telling which transforms are the identity."""
+        return np.all(self.t == (0, 0, 1, 0, 0, 1), axis=1)
+
+    def inverted(self):
+        x, y, xx, xy, yx, yy = self.t.T
+        det = xx * yy - xy * yx
+        singular = np.abs(det) <= 1e-12
+        det = np.where(singular, 1.0, det)
+        ixx, ixy, iyx, iyy = yy / det, -xy / det, -yx / det, xx / det
+        inverse = np.stack((-(ixx * x + ixy * y), -(iyx * x + iyy * y), ixx, ixy, iyx, iyy), axis=-1)
+        inverse[singular] = (0, 0, 1, 0, 0, 1)
+        return asyTransformArray(inverse)
+
+    def apply(self, points):
+        """Map an n x 2 array of points, each by its own transform, or all by
+        the one transform if the array holds a single transform."""
+        points = np.asarray(points, dtype=float)
+        x, y, xx, xy, yx, yy = self.t.T
+        return np.stack((x + xx * points[..., 0] + xy * points[..., 1],
+                         y + yx * points[..., 0] + yy * points[..., 1]), axis=-1)
+
+    def __mul__(self, other):
+        if isinstance(other, asyTransform):
+            return asyTransformArray(composeTransforms(self.t, np.array(other.t, dtype=float)))
+        elif isinstance(other, asyTransformArray):
+            return asyTransformArray(composeTransforms(self.t, other.t))
+        else:
+            raise TypeError("Illegal multiplier of {:s}".format(str(type(other))))
+
+
 def identity():
     return asyTransform((0, 0, 1, 0, 0, 1))
 
@@ -292,9 +475,13 @@ class asyPen(asyObj):
         """Generate the pen's code"""
         if self._deferAsyfy:
             self.computeColor()
-        self.asyCode = 'rgb({:g},{:g},{:g})+{:s}'.format(self.color[0], self.color[1], self.color[2], str(self.width))
+        self.asyCode = self.makeCode()
+
+    def makeCode(self):
+        code = 'rgb({:g},{:g},{:g})+{:s}'.format(self.color[0], self.color[1], self.color[2], str(self.width))
         if len(self.options) > 0:
-            self.asyCode = self.asyCode + '+' + self.options
+            code = code + '+' + self.options
+        return code
 
     def setWidth(self, newWidth):
         """Set the pen's width"""
@@ -314,42 +501,27 @@ class asyPen(asyObj):
 
     def computeColor(self):
         """Find out the color of an arbitrary asymptote pen."""
-        assert isinstance(self.asyEngine, AsymptoteEngine)
-        assert self.asyEngine.active
-
-        fout = self.asyEngine.ostream
-        fin = self.asyEngine.istream
-
-        fout.write("pen p=" + self.getCode() + ';\n')
-        fout.write("write(_outpipe,colorspace(p),newl);\n")
-        fout.write("write(_outpipe,colors(p));\n")
-        fout.write("flush(_outpipe);\n")
-        fout.write(self.asyEngine.xasy)
-        fout.flush()
-
-        colorspace = fin.readline()
-        if colorspace.find("cmyk") != -1:
-            lines = fin.readline() + fin.readline() + fin.readline() + fin.readline()
-            parts = lines.split()
-            c, m, y, k = eval(parts[0]), eval(parts[1]), eval(parts[2]), eval(parts[3])
-            k = 1 - k
-            r, g, b = ((1 - c) * k, (1 - m) * k, (1 - y) * k)
-        elif colorspace.find("rgb") != -1:
-            lines = fin.readline() + fin.readline() + fin.readline()
-            parts = lines.split()
-            r, g, b = eval(parts[0]), eval(parts[1]), eval(parts[2])
-        elif colorspace.find("gray") != -1:
-            lines = fin.readline()
-            parts = lines.split()
-            r = g = b = eval(parts[0])
-        else:
-            raise ChildProcessError('Asymptote error.')
-        self.color = (r, g, b)
+        self.color = xc.penResolver.resolve(self.makeCode(), self.asyEngine)
         self._deferAsyfy = False
 
+    @classmethod
+    def resolveColors(cls, pens):
+        """Compute the colors of the deferred pens among pens, with at most one
+        round-trip to each engine."""
+        deferred = {}
+        for pen in pens:
+            if pen is not None and pen._deferAsyfy:
+                deferred.setdefault(pen.asyEngine, []).append(pen)
+        for engine, enginePens in deferred.items():
+            colors = xc.penResolver.resolveAll([pen.makeCode() for pen in enginePens], engine)
+            for pen, color in zip(enginePens, colors):
+                pen.color = color
+                pen._deferAsyfy = False
+
     def tkColor(self):
         """Return the tk version of the pen's color"""
-        self.computeColor()
+        if self._deferAsyfy:
+            self.computeColor()
         return '#{}'.format("".join(["{:02x}".format(min(int(256 * a), 255)) for a in self.color]))
 
     def toQPen(self):
@@ -550,49 +722,74 @@ class asyPath(asyObj):
 
     def computeControls(self):
         """Evaluate the code of the path to obtain its control points"""
+        try:
+            self.computeControlsLocally()
+        except gs.UnsupportedGuide:
+            self.computeControlsByEngine()
+
+    def computeControlsLocally(self):
+        """Solve the path for its control points in Python, as asy would,
+        rounding the nodes the same way updateCode does."""
+        def rounded(value):
+            return float('{:.6g}'.format(value))
+
+        nodes = []
+        for node in self.nodeSet:
+            if node == 'cycle':
+                nodes.append(node)
+            else:
+                nodes.append(complex(rounded(node[0]), rounded(node[1])))
+
+        joins = []
+        for i in range(len(nodes) - 1):
+            if self.computed and i < len(self.controlSet):
+                joins.append([complex(rounded(c[0]), rounded(c[1])) for c in self.controlSet[i]])
+            else:
+                joins.append(self.linkSet[i])
+
+        points, controls, cyclic = gs.solveGuide(nodes, joins)
+        self.nodeSet = [(rounded(z.real), rounded(z.imag)) for z in points]
+        if cyclic:
+            self.nodeSet.append('cycle')
+        self.controlSet = [[(rounded(c.real), rounded(c.imag)) for c in pair] for pair in controls]
+        self.computed = True
+
+    def computeControlsByEngine(self):
+        """Evaluate the code of the path in the interpreter to obtain its control points"""
         # For now, if no asymptote process is given spawns a new one.
         # Only happens if asyengine is None.
         if self.asyengine is not None:
-            assert isinstance(self.asyengine, AsymptoteEngine)
+            assert isinstance(self.asyengine, (AsymptoteEngine, AsymptoteEnginePool))
             assert self.asyengine.active
-            asy = self.asyengine
+            engine = self.asyengine
             startUp = False
         else:
             startUp = True
-            asy = AsymptoteEngine()
-            asy.start()
-
-        fout = asy.ostream
-        fin = asy.istream
-
-        fout.write("path p=" + self.getCode() + ';\n')
-        fout.write("write(_outpipe,length(p),newl);\n")
-        fout.write("write(_outpipe,unstraighten(p),endl);\n")
-        fout.write(asy.xasy)
-        fout.flush()
-
-        lengthStr = fin.readline()
-        pathSegments = eval(lengthStr.split()[-1])
-        pathStrLines = []
-        for i in range(pathSegments + 1):
-            line = fin.readline()
-            line = line.replace("\n", "")
-            pathStrLines.append(line)
-        oneLiner = "".join(pathStrLines).replace(" ", "")
-        splitList = oneLiner.split("..")
-        nodes = [a for a in splitList if a.find("controls") == -1]
-        self.nodeSet = []
-        for a in nodes:
-            if a == 'cycle':
-                self.nodeSet.append(a)
-            else:
-                self.nodeSet.append(eval(a))
-        controls = [a.replace("controls", "").split("and") for a in splitList if a.find("controls") != -1]
-        self.controlSet = [[eval(a[0]), eval(a[1])] for a in controls]
+            engine = AsymptoteEngine()
+            engine.start()
+
+        code = self.getCode()
+        with engine.lease() as asy:
+            fout = asy.ostream
+            fin = asy.istream
+
+            fout.write("path p=" + code + ';\n')
+            fout.write("write(_outpipe,length(p),newl);\n")
+            fout.write("write(_outpipe,unstraighten(p),endl);\n")
+            fout.write(asy.xasy)
+            fout.flush()
+
+            pathSegments = xp.parseInt(fin.readline().split()[-1])
+            pathStrLines = [fin.readline() for i in range(pathSegments + 1)]
+        nodes, controls, cyclic = xp.parsePath("".join(pathStrLines))
+        self.nodeSet = [tuple(node) for node in nodes.tolist()]
+        if cyclic:
+            self.nodeSet.append('cycle')
+        self.controlSet = [[tuple(c[0]), tuple(c[1])] for c in controls.tolist()]
         self.computed = True
 
         if startUp:
-            asy.stop()
+            engine.stop()
 
 class asyLabel(asyObj):
     """A python wrapper for an asy label"""
@@ -673,7 +870,13 @@ class xasyItem(Qc.QObject):
         self.unsetKeys = set()
         self.userKeys = set()
         self.lineOffset = 0
+        self.deconstructedLines = []
+        self.deconstructedKeys = []
         self.imageHandleQueue = queue.Queue()
+        self.asyfyWorker = None
+        self.asyfyDir = None
+        self.cacheKey = None
+        self.cacheRecords = None
 
     def updateCode(self, ps2asymap=identity()):
         """Update the item's code: to be overriden"""
@@ -712,13 +915,15 @@ class xasyItem(Qc.QObject):
     def handleImageReception(self, file, fileformat, bbox, count, key=None, localCount=0, containsClip=False):
         """Receive an image from an asy deconstruction. It replaces the default n asyProcess."""
         # image = Image.open(file).transpose(Image.FLIP_TOP_BOTTOM)
+        # file is either a file name or, with binary frames, the image data itself.
+        inline = isinstance(file, bytes)
         if fileformat == 'png':
-            image = Qg.QImage(file)
+            image = Qg.QImage.fromData(file) if inline else Qg.QImage(file)
         elif fileformat == 'svg':
             if containsClip:
-                image = xs.SvgObject(file)
+                image = xs.SvgObject(data=file) if inline else xs.SvgObject(file)
             else:
-                image = Qs.QSvgRenderer(file)
+                image = Qs.QSvgRenderer(Qc.QByteArray(file)) if inline else Qs.QSvgRenderer(file)
                 assert image.isValid()
         else:
             raise Exception('Format not supported!')
@@ -732,18 +937,8 @@ class xasyItem(Qc.QObject):
             currImage.originalImage.bbox = list(bbox)
             currImage.performCanvasTransform = False
 
-            # handle this case if transform is not in the map yet.
-            # if deleted - set transform to 0, 0, 0, 0, 0
-            transfExists = key in self.transfKeymap.keys()
-            if transfExists:
-                transfExists = localCount <= len(self.transfKeymap[key]) - 1
-                if transfExists:
-                    validKey = not self.transfKeymap[key][localCount].deleted
-            else:
-                validKey = False
-
-            if (not transfExists) or validKey:
-                currImage.IDTag = str(file)
+            if self.fragmentVisible(key, localCount):
+                currImage.IDTag = '{0}_{1:d}'.format(key, localCount) if inline else str(file)
                 newDrawObj = DrawObject(currImage.iqt, self.onCanvas['canvas'], transform=identity(),
                                         btmRightanchor=Qc.QPointF(bbox[0], bbox[2]), drawOrder=-1, key=key,
                                         parentObj=self, keyIndex=localCount)
@@ -757,78 +952,226 @@ class xasyItem(Qc.QObject):
                 else:
                     self.drawObjectsMap[key].append(newDrawObj)
         return containsClip
-    def asyfy(self, force=False):
+
+    def fragmentVisible(self, key, localCount):
+        """Whether the fragment gets a DrawObject: its transform is not in the map yet, or is not deleted."""
+        # handle this case if transform is not in the map yet.
+        # if deleted - set transform to 0, 0, 0, 0, 0
+        transfExists = key in self.transfKeymap.keys()
+        if transfExists:
+            transfExists = localCount <= len(self.transfKeymap[key]) - 1
+            if transfExists:
+                validKey = not self.transfKeymap[key][localCount].deleted
+        else:
+            validKey = False
+        return (not transfExists) or validKey
+
+    def prefetchDrawObjects(self, force=False):
+        """Start deconstructing in the background if an engine is idle, ahead of generateDrawObjects."""
+        return self.beginAsyfy(force, block=False)
+
+    def needsAsyfy(self, force=False):
+        """Whether generateDrawObjects would have to deconstruct this item."""
+        return self.asyfyWorker is not None or (self.asyengine is not None and (force or not self.asyfied))
+
+    def beginAsyfy(self, force=False, block=True):
+        """Lease an engine and start the deconstruction worker.
+        Returns False if there is nothing to do, or no engine is idle and block is False."""
         if self.asyengine is None:
-            return 1
+            return False
+        if self.asyfyWorker is not None:
+            return True
         if self.asyfied and not force:
-            return
+            return False
 
-        self.drawObjects = []
+        cache = self.asyengine.fragmentCache
+        manifest = None
+        if cache is not None:
+            self.cacheKey = cache.deconstructionKey(self.getCode(), self.asySize, 'svg')
+            manifest = cache.load(self.cacheKey)
+
+        if manifest is not None:
+            engine = None
+            self.cacheRecords = None
+        else:
+            engine = self.asyengine.acquire(block)
+            if engine is None:
+                return False
+            self.cacheRecords = [] if cache is not None else None
+
+        # cleared in place, as the canvas may already hold this list while fragments stream in.
+        self.drawObjects.clear()
         self.drawObjectsMap.clear()
-        assert isinstance(self.asyengine, AsymptoteEngine)
         self.imageList = []
 
         self.unsetKeys.clear()
         self.userKeys.clear()
 
+        # the key bookkeeping stays on the GUI thread: the worker is only handed the lines
+        # to send, and receiveImages records the keys that come back.
+        self.lineOffset = len(self.getTransformCode().splitlines())
+        self.deconstructedLines = self.getCode().splitlines()
+        self.deconstructedKeys = []
+
         self.imageHandleQueue = queue.Queue()
-        worker = threading.Thread(target=self.asyfyThread, args=[])
-        worker.start()
-        item = self.imageHandleQueue.get()
-        cwd=os.getcwd();
-        os.chdir(self.asyengine.tempDirName)
-        while item != (None,) and item[0] != "ERROR":
-            if item[0] == "OUTPUT":
+        if engine is None:
+            self.asyfyDir = None
+            self.asyfyWorker = threading.Thread(target=self.replayThread, args=[cache, manifest])
+        else:
+            self.asyfyDir = engine.tempDirName
+            self.asyfyWorker = threading.Thread(target=self.asyfyThread,
+                                                args=[self.asyengine, engine, self.deconstructedLines, self.asySize])
+        self.asyfyWorker.start()
+        return True
+
+    def asyfy(self, force=False):
+        if self.asyengine is None:
+            return 1
+        if self.asyfyWorker is None and not self.beginAsyfy(force):
+            return
+
+        assert isinstance(self.asyengine, (AsymptoteEngine, AsymptoteEnginePool))
+        self.pollAsyfy(block=True)
+
+    def pollAsyfy(self, block=False):
+        """Receive the fragments deconstructed so far. Returns True once the deconstruction has finished."""
+        if self.asyfyWorker is None:
+            return True
+
+        try:
+            if self.asyfyDir is None:
+                finished = self.receiveImages(block)
+            else:
+                cwd=os.getcwd();
+                os.chdir(self.asyfyDir)
+                try:
+                    finished = self.receiveImages(block)
+                finally:
+                    os.chdir(cwd);
+        except BaseException:
+            self.endAsyfy()
+            raise
+
+        if finished:
+            self.endAsyfy()
+            self.asyfyFinished()
+        return finished
+
+    def receiveImages(self, block):
+        while True:
+            try:
+                item = self.imageHandleQueue.get(block)
+            except queue.Empty:
+                return False
+            if item[0] is None:
+                # the worker is done: (None, asy2psmap), or (None, None) if it failed.
+                if item[1] is not None:
+                    self.asy2psmap = asyTransform(item[1])
+                self.asyfied = True
+                self.storeCachedFragments()
+                return True
+            if item[0] == "ERROR":
+                self.cacheRecords = None
+            elif item[0] == "OUTPUT":
                 print(item[1])
             else:
-                keepFile = self.handleImageReception(*item)
-                if not DebugFlags.keepFiles and not keepFile:
-                    try:
-                        os.remove(item[0])
-                        pass
-                    except OSError:
-                        pass
-                    finally:
-                        pass
-            item = self.imageHandleQueue.get()
-        # self.imageHandleQueue.task_done()
-        os.chdir(cwd);
-
-        worker.join()
-
-    def asyfyThread(self):
-        """Convert the item to a list of images by deconstructing this item's code"""
-        assert self.asyengine.active
-
-        fout = self.asyengine.ostream
-        fin = self.asyengine.istream
+                *image, userKey = item
+                key = image[4]
+                if not userKey:
+                    self.unsetKeys.add(key)     # the line and column to replace.
+                else:
+                    self.userKeys.add(key)
+                self.deconstructedKeys.append(key)
 
-        self.lineOffset = len(self.getTransformCode().splitlines())
+                self.recordCachedFragment(*image)
+                self.handleImageReception(*image)
+
+    def endAsyfy(self):
+        # the worker has already handed its engine back.
+        self.asyfyWorker.join()
+        self.asyfyWorker = None
+        self.asyfyDir = None
+        self.cacheRecords = None
+
+    def recordCachedFragment(self, file, fileformat, bbox, count, key=None, localCount=0, containsClip=False):
+        if self.cacheRecords is None:
+            return
+        self.cacheRecords.append((file, fileformat, bbox, key, localCount, containsClip, key in self.userKeys))
+
+    def storeCachedFragments(self):
+        if self.cacheRecords is None:
+            return
+        # written and evicted on the cache's own thread.
+        self.asyengine.fragmentCache.store(self.cacheKey, self.cacheRecords, self.asy2psmap.t)
+        self.cacheRecords = None
+
+    def replayThread(self, cache, manifest):
+        """Replay a deconstruction stored in the fragment cache, in place of asyfyThread."""
+        for i in range(len(manifest['fragments'])):
+            fragment = manifest['fragments'][i]
+            data = cache.loadFragment(fragment)
+            if data is None:
+                self.imageHandleQueue.put(("ERROR", "Fragment cache entry is incomplete\n"))
+                break
+            self.imageHandleQueue.put((data, fragment['format'], tuple(fragment['bbox']), i,
+                                       fragment['key'], fragment['localCount'], fragment['clip'],
+                                       fragment['userKey']))
+
+        self.imageHandleQueue.put((None, tuple(manifest['asy2psmap'])))
+
+    def asyfyFinished(self):
+        """Called once all fragments of a deconstruction have been received."""
+        pass
+
+    def asyfyThread(self, pool, engine, lines, asySize):
+        """Run deconstruct on the leased engine and return it to the pool as soon as
+        the reply has been read, without waiting for the GUI thread to poll."""
+        try:
+            self.deconstruct(engine, lines, asySize)
+        except Exception as e:
+            self.imageHandleQueue.put(("ERROR", "{0}\n".format(e)))
+            self.imageHandleQueue.put((None, None))
+        finally:
+            pool.release(engine)
+
+    def deconstruct(self, engine, lines, asySize):
+        """Convert the item to a list of images by deconstructing this item's code.
+        Runs on the worker thread, so it only reads the engine and writes imageHandleQueue."""
+        assert engine.active
+
+        fout = engine.ostream
+        fin = engine.istream
 
         fout.write("reset\n")
         fout.flush();
-        for line in self.getCode().splitlines():
+        for line in lines:
             if DebugFlags.printDeconstTranscript:
                 print('fout:', line)
             fout.write(line+"\n")
-        fout.write(self.asySize)
+        fout.write(asySize)
         fout.write("deconstruct();\n")
         fout.write('write(_outpipe,yscale(-1)*currentpicture.calculateTransform(),endl);\n')
-        fout.write(self.asyengine.xasy)
+        fout.write(engine.xasy)
         fout.flush()
 
-        imageInfos = []                                 # of (box, key)
+        if engine.useFrames:
+            self.receiveFrames(fin.buffer)
+            return
+
         n = 0
 
         keyCounts = {}
 
-        def render():
-            for i in range(len(imageInfos)):
-                box, key, localCount, useClip = imageInfos[i]
-                l, b, r, t = [float(a) for a in box.split()]
-                name = "{:s}_{:d}.{:s}".format(self.asyengine.tempDirName, i, fileformat)
+        def render(i, box, key, localCount, useClip, userKey):
+            l, b, r, t = [float(a) for a in box.split()]
+            name = "{:s}_{:d}.{:s}".format(engine.tempDirName, i, fileformat)
 
-                self.imageHandleQueue.put((name, fileformat, (l, -t, r, -b), i, key, localCount, useClip))
+            # read now: the file is overwritten once the engine is released to the next item.
+            with open(name, 'rb') as f:
+                data = f.read()
+            if not DebugFlags.keepFiles:
+                os.remove(name)
+            self.imageHandleQueue.put((data, fileformat, (l, -t, r, -b), i, key, localCount, useClip, userKey))
 
         # key first, box second.
         # if key is "Done"
@@ -850,17 +1193,11 @@ class xasyItem(Qc.QObject):
             userkey = keydata[-2] == '1'
             keydata = keydata[:-3]
 
-            if not userkey:
-                self.unsetKeys.add(keydata)     # the line and column to replace. 
-            else:
-                self.userKeys.add(keydata)
-            
-#                print(line, col)
-
             if keydata not in keyCounts.keys():
                 keyCounts[keydata] = 0
 
-            imageInfos.append((text, keydata, keyCounts[keydata], clipflag))      # key-data pair
+            # the fragment's file is complete once its key is announced.
+            render(n, text, keydata, keyCounts[keydata], clipflag, userkey)
 
             # for the next item
             keyCounts[keydata] += 1
@@ -875,12 +1212,41 @@ class xasyItem(Qc.QObject):
 
         if text == "Error\n":
             self.imageHandleQueue.put(("ERROR", fin.readline()))
-        else:
-            render()
 
-        self.asy2psmap = asyTransform(xu.listize(fin.readline().rstrip(),float))
-        self.imageHandleQueue.put((None,))
-        self.asyfied = True
+        self.imageHandleQueue.put((None, xp.parseTransform(fin.readline())))
+
+    def receiveFrames(self, fin):
+        """Read the binary frames of a -xasyframes deconstruction (see runpicture.in),
+        which carry each fragment inline instead of in a temporary file."""
+        keyCounts = {}
+        n = 0
+
+        tag = fin.read(1)
+        while tag == b'K':
+            keyLength, = struct.unpack('<I', fin.read(4))
+            keydata = fin.read(keyLength).decode()
+            clipflag, l, b, r, t, payloadLength = struct.unpack('<B4dI', fin.read(37))
+            payload = fin.read(payloadLength)
+
+            userkey = keydata[-1] == '1'
+            keydata = keydata[:-2]
+
+            if keydata not in keyCounts.keys():
+                keyCounts[keydata] = 0
+
+            if DebugFlags.printDeconstTranscript:
+                print('KEY={0:s} {1:g} {2:g} {3:g} {4:g}'.format(keydata, l, b, r, t))
+
+            self.imageHandleQueue.put((payload, 'svg', (l, -t, r, -b), n,
+                                       keydata, keyCounts[keydata], clipflag == 1, userkey))
+            keyCounts[keydata] += 1
+            n += 1
+            tag = fin.read(1)
+
+        if tag == b'E':
+            self.imageHandleQueue.put(("ERROR", fin.readline().decode()))
+
+        self.imageHandleQueue.put((None, xp.parseTransform(fin.readline().decode())))
 
 class xasyDrawnItem(xasyItem):
     """A base class for GUI items was drawn by the user. It combines a path, a pen, and a transform."""
@@ -917,6 +1283,13 @@ class xasyDrawnItem(xasyItem):
     def generateDrawObjects(self, forceUpdate=False):
         raise NotImplementedError
 
+    def prefetchDrawObjects(self, force=False):
+        # drawn items are painted directly by Qt, not deconstructed.
+        return False
+
+    def needsAsyfy(self, force=False):
+        return False
+
     def appendPoint(self, point, link=None):
         """Append a point to the path. If the path is cyclic, add this point before the 'cycle' node."""
         if self.path.nodeSet[-1] == 'cycle':
@@ -965,7 +1338,7 @@ class xasyShape(xasyDrawnItem):
 
     def getTransformCode(self, asy2psmap=identity()):
         transf = self.transfKeymap[self.transfKey][0]
-        if transf == identity():
+        if transf.isIdentity():
             return ''
         else:
             return xasyItem.setKeyFormatStr.format(self.transfKey, transf.getCode(asy2psmap))+'\n'
@@ -1076,6 +1449,64 @@ class xasyScript(xasyItem):
         self.scriptAsyfied = False
         self.updatedPrefix = True
 
+        # (payload digest, format, bbox, clip, visible) -> [(asyImage, DrawObject)] of the last deconstruction;
+        # while a deconstruction runs, previousFragments holds those not reused yet.
+        self.reusableFragments = {}
+        self.previousFragments = {}
+        # ((script, lineOffset, keys), (code, inserted keys)) of the last getReplacedKeysCode
+        self.replacedKeysCache = None
+
+    def inheritFragments(self, oldItem):
+        """Reuse the fragments of oldItem, an earlier deconstruction of this script,
+        wherever the interpreter produces the same image data again."""
+        assert isinstance(oldItem, xasyScript)
+        self.reusableFragments = oldItem.reusableFragments
+
+    def getFragmentSignature(self, file, fileformat, bbox, key, localCount, containsClip):
+        # the payload already reflects the fragment's transform.
+        return (hashlib.sha256(file).digest(), fileformat, tuple(bbox), containsClip,
+                self.fragmentVisible(key, localCount))
+
+    def beginAsyfy(self, force=False, block=True):
+        idle = self.asyfyWorker is None
+        started = super().beginAsyfy(force, block)
+        if idle and started:
+            # fragments arrive on this thread, so none is received before the swap.
+            self.previousFragments, self.reusableFragments = self.reusableFragments, {}
+        return started
+
+    def handleImageReception(self, file, fileformat, bbox, count, key=None, localCount=0, containsClip=False):
+        signature = self.getFragmentSignature(file, fileformat, bbox, key, localCount, containsClip)
+
+        cached = self.previousFragments.get(signature)
+        if cached:
+            image, drawObj = cached.pop()
+            self.reuseFragment(image, drawObj, key, localCount)
+        else:
+            drawCount = len(self.drawObjects)
+            super().handleImageReception(file, fileformat, bbox, count, key, localCount, containsClip)
+            image = self.imageList[-1]
+            drawObj = self.drawObjects[-1] if len(self.drawObjects) > drawCount else None
+
+        self.reusableFragments.setdefault(signature, []).append((image, drawObj))
+        return containsClip
+
+    def reuseFragment(self, image, drawObj, key, localCount):
+        image.key = key
+        image.keyIndex = localCount
+        self.imageList.append(image)
+        if drawObj is not None:
+            drawObj.key = key
+            drawObj.keyIndex = localCount
+            drawObj.transform = identity()
+            drawObj.originalObj = self
+            drawObj.setParent(self)
+            self.drawObjects.append(drawObj)
+            if key not in self.drawObjectsMap.keys():
+                self.drawObjectsMap[key] = [drawObj]
+            else:
+                self.drawObjectsMap[key].append(drawObj)
+
     def clearTransform(self):
         """Reset the transforms for each of the deconstructed images"""
         # self.transform = [identity()] * len(self.imageList)
@@ -1107,11 +1538,11 @@ class xasyScript(xasyItem):
                     writeval = list(reversed(val))
                     # need to map all transforms in a list if there is any non-identity
                     # unfortunately, have to check all transformations in the list. 
-                    while not all(checktransf == identity() for checktransf in writeval) and writeval:
+                    while not all(checktransf.isIdentity() for checktransf in writeval) and writeval:
                         transf = writeval.pop()
                         if transf.deleted:
                             rawAsyCode.write(xasyItem.setKeyFormatStr.format(key, transf.getCode(asy2psmap)) + '\n//')
-                        if transf == identity() and not transf.deleted:
+                        if transf.isIdentity() and not transf.deleted:
                             rawAsyCode.write(xasyItem.setKeyAloneFormatStr.format(key))
                         else:
                             rawAsyCode.write(xasyItem.setKeyFormatStr.format(key, transf.getCode(asy2psmap)))
@@ -1120,7 +1551,7 @@ class xasyScript(xasyItem):
         return result
 
     def findNonIdKeys(self):
-        return {key for key in self.transfKeymap if not all(transf == identity() for transf in self.transfKeymap[key]) }
+        return {key for key in self.transfKeymap if not all(transf.isIdentity() for transf in self.transfKeymap[key]) }
 
     def getObjectCode(self, asy2psmap=identity()):
         numeric=r'([-+]?(?:(?:\d*\.\d+)|(?:\d+\.?)))'
@@ -1153,7 +1584,8 @@ class xasyScript(xasyItem):
         keylist = {}
         prefix = ''
         
-        key2replaceSet = self.unsetKeys if key2replace is None else \
+        # a copy either way, as the loop below discards from unsetKeys.
+        key2replaceSet = set(self.unsetKeys) if key2replace is None else \
                         self.unsetKeys & key2replace
 
         linenum2key = {}
@@ -1175,24 +1607,37 @@ class xasyScript(xasyItem):
             self.unsetKeys.discard(key)
 
 
+        cacheKey = (self.script, self.lineOffset, frozenset(linenum2key.items()))
+        if self.replacedKeysCache is None or self.replacedKeysCache[0] != cacheKey:
+            self.replacedKeysCache = (cacheKey, self.insertKeys(keylist, linenum2key))
+        code, insertedKeys = self.replacedKeysCache[1]
+        self.userKeys.update(insertedKeys)
+        return code
+
+    def insertKeys(self, keylist, linenum2key):
+        """Splice KEY="..." after the given columns of the script's lines,
+        returning the code and the keys that were inserted."""
         raw_code_lines = self.script.splitlines()
-        with io.StringIO() as raw_str:
-            for i_0 in range(len(raw_code_lines)):
-                i = i_0 + self.lineOffset
-                curr_str = raw_code_lines[i_0]
-                if i + 1 in keylist.keys():
-                    # this case, we have a key.
-                    with io.StringIO() as raw_line:
-                        for j in range(len(curr_str)):
-                            raw_line.write(curr_str[j])
-                            if j + 1 in keylist[i + 1]:
-                                # at this point, replace keys with xkey
-                                raw_line.write('KEY="{0:s}",'.format(linenum2key[(i + 1, j + 1)]))
-                                self.userKeys.add(linenum2key[(i + 1, j + 1)])
-                        curr_str = raw_line.getvalue()
-                # else, skip and just write the line.
-                raw_str.write(curr_str + '\n')
-            return raw_str.getvalue()
+        insertedKeys = []
+        for line in keylist:
+            i_0 = line - 1 - self.lineOffset
+            if not 0 <= i_0 < len(raw_code_lines):
+                continue
+            curr_str = raw_code_lines[i_0]
+            pieces = []
+            last = 0
+            for col in sorted(keylist[line]):
+                # keys go after the character at col, counting from 1.
+                if 1 <= col <= len(curr_str):
+                    pieces.append(curr_str[last:col])
+                    pieces.append('KEY="{0:s}",'.format(linenum2key[(line, col)]))
+                    insertedKeys.append(linenum2key[(line, col)])
+                    last = col
+            pieces.append(curr_str[last:])
+            raw_code_lines[i_0] = ''.join(pieces)
+
+        code = ''.join(line + '\n' for line in raw_code_lines)
+        return code, insertedKeys
 
     def getUnusedKey(self, oldkey) -> str:
         baseCounter = 0
@@ -1206,10 +1651,14 @@ class xasyScript(xasyItem):
         """Generate the list of images described by this object and adjust the length of the transform list."""
         super().asyfy()
 
+    def asyfyFinished(self):
         # Id --> Transf --> asy-fied --> Transf
         # Transf should keep the original, raw transformation
         # but for all new drawn objects - assign Id as transform.
 
+        # the fragments not reused by this deconstruction are gone from the script.
+        self.previousFragments = {}
+
         if self.scriptAsyfied:
             return
 
@@ -1255,11 +1704,14 @@ class xasyScript(xasyItem):
                 # while len(self.transfKeymap[key]) > keyCount[key]:
                     # self.transfKeymap[key].pop()
 
-        # change of basis 
-        for keylist in self.transfKeymap.values():
-            for i in range(len(keylist)):
-                if keylist[i] != identity():
-                    keylist[i] = self.asy2psmap * keylist[i] * self.asy2psmap.inverted()
+        # change of basis, of all the non-identity transforms at once
+        entries = [(keylist, i) for keylist in self.transfKeymap.values() for i in range(len(keylist))
+                   if not keylist[i].isIdentity()]
+        if entries:
+            transforms = asyTransformArray.fromTransforms([keylist[i] for keylist, i in entries])
+            changed = self.asy2psmap * transforms * self.asy2psmap.inverted()
+            for (keylist, i), transf in zip(entries, changed.toTransforms()):
+                keylist[i] = transf
 
         self.updateCode()
         self.scriptAsyfied = True
@@ -1278,6 +1730,10 @@ class xasyScript(xasyItem):
 
 
 class DrawObject(Qc.QObject):
+    transformChanged = Qc.pyqtSignal()
+    # emitted whenever the canvas bounding box may have changed, by a transform or otherwise.
+    boundsChanged = Qc.pyqtSignal()
+
     def __init__(self, drawObject, mainCanvas=None, transform=identity(), btmRightanchor=Qc.QPointF(0, 0),
                  drawOrder=(-1, -1), pen=None, key=None, parentObj=None, fill=False, keyIndex=0):
         super().__init__()
@@ -1291,13 +1747,61 @@ class DrawObject(Qc.QObject):
         self.explicitBoundingBox = None
         self.useCanvasTransformation = False
         self.key = key
-        self.cachedSvgImg = None
-        self.cachedDPI = None
-        self.maxDPI=0
         self.keyIndex = keyIndex
         self.pen = pen
         self.fill = fill
 
+        # bumped whenever anything affecting where the object lands on the canvas changes,
+        # so that the canvas can tell which objects have moved since it last looked.
+        self.version = 0
+        self.cachedVersion = None
+        self.cachedQTransform = None
+        self.cachedScrTransform = None
+        self.cachedBoundingBox = None
+        self.baseInverse = self.baseTransform.toQTransform().inverted()[0]
+
+    def invalidate(self):
+        """Mark the cached screen transform and bounding box as stale."""
+        self.version += 1
+        self.boundsChanged.emit()
+
+    def updateCache(self):
+        if self.cachedVersion == self.version:
+            return
+        self.cachedQTransform = self.pTransform.toQTransform()
+        scrTransf = self.baseInverse * self.cachedQTransform
+        self.cachedScrTransform = scrTransf
+
+        testBbox = self.getUntransformedBoundingBox()
+        pointList = [scrTransf.map(point) for point in [
+            testBbox.topLeft(), testBbox.topRight(), testBbox.bottomLeft(), testBbox.bottomRight()
+        ]]
+        self.cachedBoundingBox = Qg.QPolygonF(pointList).boundingRect()
+        self.cachedVersion = self.version
+
+    def getUntransformedBoundingBox(self):
+        if self.explicitBoundingBox is not None:
+            return self.explicitBoundingBox
+        if isinstance(self.drawObject, Qg.QImage):
+            testBbox = self.drawObject.rect()
+            testBbox.moveTo(self.btmRightAnchor.toPoint())
+            return testBbox
+        elif isinstance(self.drawObject, Qg.QPainterPath):
+            return self.baseTransform.toQTransform().mapRect(self.drawObject.boundingRect())
+        else:
+            raise TypeError('drawObject is not a valid type!')
+
+    def getDrawnBoundingBox(self, additionalTransformation=None, applyReverse=False):
+        """The canvas area covered by draw() with the same arguments, not counting the pen width."""
+        if additionalTransformation is None:
+            return self.boundingBox
+        self.updateCache()
+        if not applyReverse:
+            transf = self.baseInverse * self.cachedQTransform * additionalTransformation
+        else:
+            transf = self.baseInverse * additionalTransformation * self.cachedQTransform
+        return transf.mapRect(Qc.QRectF(self.getUntransformedBoundingBox()))
+
     def getInteriorScrTransform(self, transform):
         """Generates the transform with Interior transform applied beforehand."""
         if isinstance(transform, Qg.QTransform):
@@ -1311,28 +1815,19 @@ class DrawObject(Qc.QObject):
     @transform.setter
     def transform(self, value):
         self.pTransform = value
+        self.invalidate()
+        self.transformChanged.emit()
 
     def setBoundingBoxPs(self, bbox):
         l, b, r, t = bbox
         self.explicitBoundingBox = Qc.QRectF(Qc.QPointF(l, b), Qc.QPointF(r, t))
         # self.explicitBoundingBox = Qc.QRectF(0, 0, 100, 100)
+        self.invalidate()
 
     @property
     def boundingBox(self):
-        if self.explicitBoundingBox is not None:
-            testBbox = self.explicitBoundingBox
-        else:
-            if isinstance(self.drawObject, Qg.QImage):
-                testBbox = self.drawObject.rect()
-                testBbox.moveTo(self.btmRightAnchor.toPoint())
-            elif isinstance(self.drawObject, Qg.QPainterPath):
-                testBbox = self.baseTransform.toQTransform().mapRect(self.drawObject.boundingRect())
-            else:
-                raise TypeError('drawObject is not a valid type!')
-        pointList = [self.getScreenTransform().toQTransform().map(point) for point in [
-            testBbox.topLeft(), testBbox.topRight(), testBbox.bottomLeft(), testBbox.bottomRight()
-        ]]
-        return Qg.QPolygonF(pointList).boundingRect()
+        self.updateCache()
+        return Qc.QRectF(self.cachedBoundingBox)
 
     @property
     def localBoundingBox(self):
@@ -1341,8 +1836,13 @@ class DrawObject(Qc.QObject):
         return testBbox
 
     def getScreenTransform(self):
-        scrTransf = self.baseTransform.toQTransform().inverted()[0] * self.pTransform.toQTransform()
-        return asyTransform.fromQTransform(scrTransf)
+        self.updateCache()
+        return asyTransform.fromQTransform(self.cachedScrTransform)
+
+    def prefetchRaster(self, dpi=300):
+        """Start rasterizing an SvgObject in the background if drawing it at dpi needs a new image."""
+        if isinstance(self.drawObject, xs.SvgObject):
+            xs.getRasterCache().request(self.drawObject, dpi)
 
     def draw(self, additionalTransformation=None, applyReverse=False, canvas: Qg.QPainter=None, dpi=300):
         if canvas is None:
@@ -1359,27 +1859,20 @@ class DrawObject(Qc.QObject):
         else:
             oldPen = Qg.QPen()
 
+        self.updateCache()
         if not applyReverse:
             canvas.setTransform(additionalTransformation, True)
-            canvas.setTransform(self.transform.toQTransform(), True)
+            canvas.setTransform(self.cachedQTransform, True)
         else:
-            canvas.setTransform(self.transform.toQTransform(), True)
+            canvas.setTransform(self.cachedQTransform, True)
             canvas.setTransform(additionalTransformation, True)
 
-        canvas.setTransform(self.baseTransform.toQTransform().inverted()[0], True)
+        canvas.setTransform(self.baseInverse, True)
 
         if isinstance(self.drawObject, Qg.QImage):
             canvas.drawImage(self.explicitBoundingBox, self.drawObject)
         elif isinstance(self.drawObject, xs.SvgObject):
-            threshold = 1.44
-            
-            if self.cachedDPI is None or self.cachedSvgImg is None \
-               or dpi > self.maxDPI*threshold:
-                self.cachedDPI = dpi
-                self.maxDPI=max(self.maxDPI,dpi)
-                self.cachedSvgImg = self.drawObject.render(dpi)
-
-            canvas.drawImage(self.explicitBoundingBox, self.cachedSvgImg)
+            canvas.drawImage(self.explicitBoundingBox, xs.getRasterCache().wait(self.drawObject, dpi))
         elif isinstance(self.drawObject, Qs.QSvgRenderer):
             self.drawObject.render(canvas, self.explicitBoundingBox)
         elif isinstance(self.drawObject, Qg.QPainterPath):
@@ -1401,11 +1894,13 @@ class DrawObject(Qc.QObject):
         # modify these values to grow/shrink the fuzz. 
         fuzzTolerance = 1
         marginGrowth = 1
-        leftMargin = marginGrowth if self.boundingBox.width() < fuzzTolerance else 0
-        topMargin = marginGrowth if self.boundingBox.height() < fuzzTolerance else 0
+        self.updateCache()
+        boundingBox = self.cachedBoundingBox
+        leftMargin = marginGrowth if boundingBox.width() < fuzzTolerance else 0
+        topMargin = marginGrowth if boundingBox.height() < fuzzTolerance else 0
 
         newMargin = Qc.QMarginsF(leftMargin, topMargin, leftMargin, topMargin)
-        return self.boundingBox.marginsAdded(newMargin).contains(coords)
+        return boundingBox.marginsAdded(newMargin).contains(coords)
 
     def getID(self):
         return self.originalObj
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+###########################################################################
+#
+# xasyAsync drives Asymptote's xasy pipe interface from an asyncio event
+# loop, without a thread per engine. Needs Python 3.7 or later.
+#
+# Run as a script, it evaluates the given asy files concurrently and prints
+# what each wrote to the output pipe.
+#
+###########################################################################
+
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class AsyRequestError(Exception):
+    def __init__(self, messages):
+        super().__init__(''.join(messages))
+        self.messages = messages
+
+
+class AsyncAsymptoteEngine:
+    """An asy -xasy session on an asyncio subprocess transport.
+
+    Each request is sent as a chr(4)-terminated frame, followed by a frame that
+    writes a line starting with chr(4) to the output pipe once the request has
+    run, so that every reply is framed even when the request prints nothing or
+    fails. The output pipe shares the process's stdout and stderr, so error
+    messages arrive within the reply of the request that caused them.
+
+    Requests may be issued concurrently; they are sent and answered in order.
+    At most maxPending requests are in flight, later ones wait to be sent, and
+    writes wait for the pipe to drain. Cancelling a request that has not been
+    sent withdraws it; cancelling one that has been sent discards its reply."""
+
+    xasy = chr(4) + '\n'
+
+    def __init__(self, path='asy', args=(), maxPending=16, keepFiles=False):
+        self.asyPath = path
+        self.tmpdir = tempfile.mkdtemp(prefix='xasyData_') + os.sep
+        self.args = ['-xasy', '-noV', '-q', '-inpipe=0', '-outpipe=1', '-o', self.tmpdir] + list(args)
+        self.keepFiles = keepFiles
+        self.asyProcess = None
+        self.readerTask = None
+        self.replies = collections.deque()
+        self.sendLock = asyncio.Lock()
+        self.slots = asyncio.Semaphore(maxPending)
+
+    async def start(self):
+        self.asyProcess = await asyncio.create_subprocess_exec(
+            self.asyPath, *self.args, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            limit=2 ** 24)
+        self.readerTask = asyncio.ensure_future(self.readReplies())
+        await self.request('bool _xasyAsyncOk=false;')
+
+    @property
+    def active(self):
+        return self.asyProcess is not None and self.asyProcess.returncode is None
+
+    @property
+    def tempDirName(self):
+        return self.tmpdir
+
+    async def readReplies(self):
+        lines = []
+        reason = 'asy exited'
+        try:
+            while True:
+                raw = await self.asyProcess.stdout.readline()
+                if not raw:
+                    break
+                line = raw.decode('utf-8', 'replace')
+                if not line.startswith(chr(4)):
+                    lines.append(line)
+                    continue
+
+                ok = line[1:].strip() == 'true'
+                if not self.replies:
+                    # the request itself wrote the frame marker, and its own reply came early.
+                    logger.warning('discarding an asy reply without a request: %s', ''.join(lines).strip())
+                    lines = []
+                    continue
+                future = self.replies.popleft()
+                self.slots.release()
+                if not future.done():
+                    if ok:
+                        future.set_result(lines)
+                    else:
+                        future.set_exception(AsyRequestError(lines))
+                lines = []
+        except (OSError, ValueError) as e:
+            # e.g. a line longer than the stream limit; the replies can no longer be matched.
+            reason = 'reading from asy failed: {0}'.format(e)
+            logger.warning(reason)
+        finally:
+            while self.replies:
+                future = self.replies.popleft()
+                # each sent request holds a slot until its reply is accounted for.
+                self.slots.release()
+                if not future.done():
+                    future.set_exception(EOFError(reason + ':\n' + ''.join(lines)))
+
+    async def request(self, code):
+        """Run code and return the lines it wrote to the output pipe. Raises
+        AsyRequestError with the messages if it failed."""
+        if self.xasy in code + '\n':
+            raise ValueError('request contains the chr(4) frame terminator')
+        if not self.active:
+            raise EOFError('asy is not running')
+
+        await self.slots.acquire()
+        sent = False
+        try:
+            async with self.sendLock:
+                if self.readerTask.done():
+                    # asy exited while this request waited for a slot.
+                    raise EOFError('asy is not running')
+                future = asyncio.get_running_loop().create_future()
+                self.asyProcess.stdin.write(
+                    ('{0}\n_xasyAsyncOk=true;\n{1}'
+                     "flush(stdout); write(_outpipe,'\\004'+(_xasyAsyncOk ? 'true' : 'false'),endl); "
+                     'flush(_outpipe); _xasyAsyncOk=false;\n{1}').format(code, self.xasy).encode('utf-8'))
+                self.replies.append(future)
+                sent = True
+                await self.asyProcess.stdin.drain()
+        finally:
+            # once sent, the slot is released by the reader when the reply arrives.
+            if not sent:
+                self.slots.release()
+
+        # cancelling the caller cancels the future, and the reader then drops the reply.
+        return await future
+
+    async def stop(self):
+        if self.active:
+            self.asyProcess.kill()
+            await self.asyProcess.wait()
+        if self.readerTask is not None:
+            await self.readerTask
+        if not self.keepFiles:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+class AsyncAsymptoteEnginePool:
+    """A set of AsyncAsymptoteEngines, each request leasing an idle one, so
+    that one event loop keeps several interpreters busy."""
+
+    def __init__(self, size=None, **engineArgs):
+        if size is None:
+            size = os.cpu_count() or 1
+        self.engines = [AsyncAsymptoteEngine(**engineArgs) for _ in range(max(size, 1))]
+        self.idleEngines = asyncio.Queue()
+
+    async def start(self):
+        await asyncio.gather(*(engine.start() for engine in self.engines))
+        for engine in self.engines:
+            self.idleEngines.put_nowait(engine)
+
+    async def stop(self):
+        await asyncio.gather(*(engine.stop() for engine in self.engines))
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        engine = await self.idleEngines.get()
+        try:
+            yield engine
+        finally:
+            self.idleEngines.put_nowait(engine)
+
+    async def request(self, code):
+        async with self.lease() as engine:
+            return await engine.request(code)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+async def evaluateFiles(names, path='asy'):
+    async with AsyncAsymptoteEnginePool(path=path) as pool:
+        async def evaluate(name):
+            with open(name) as f:
+                code = f.read()
+            try:
+                return ''.join(await pool.request(code)), True
+            except AsyRequestError as e:
+                return str(e), False
+
+        return await asyncio.gather(*(evaluate(name) for name in names))
+
+
+def main(argv):
+    status = 0
+    for name, (output, ok) in zip(argv[1:], asyncio.run(evaluateFiles(argv[1:]))):
+        print('{0}:'.format(name))
+        print(output, end='')
+        if not ok:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
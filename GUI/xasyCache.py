@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+_importRe = re.compile(r'\b(?:import|include|access|from)\s+(?:"([^"]+)"|([A-Za-z_][\w.]*))')
+
+class FragmentCache:
+    """A persistent, content-addressed cache of deconstructed fragments.
+
+    A deconstruction is stored as a manifest, named after the hash of everything that
+    determines its output (the code, which already contains every transform, the picture
+    size, the asy version, the render settings and the local .asy files it imports),
+    listing the key, bounding box and image of each fragment. Images are stored once under
+    the hash of their contents. The least recently used files are evicted once the cache
+    grows beyond maxSize bytes. Stores and evictions run on a background thread."""
+
+    def __init__(self, directory, maxSize, version=''):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.version = version
+        self.manifestDir = os.path.join(directory, 'manifests')
+        self.blobDir = os.path.join(directory, 'fragments')
+
+        os.makedirs(self.manifestDir, exist_ok=True)
+        os.makedirs(self.blobDir, exist_ok=True)
+        self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def hashKey(self, *parts):
+        digest = hashlib.sha256(self.version.encode())
+        for part in parts:
+            data = part.encode() if isinstance(part, str) else bytes(part)
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def deconstructionKey(self, code, asySize, fileformat):
+        return self.hashKey(code, asySize, fileformat, dependencyStamp(code))
+
+    def manifestPath(self, key):
+        return os.path.join(self.manifestDir, key + '.json')
+
+    def blobPath(self, digest, fileformat):
+        return os.path.join(self.blobDir, '{0}.{1}'.format(digest, fileformat))
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def load(self, key):
+        """Return the manifest stored under key, or None if it is missing or incomplete."""
+        path = self.manifestPath(key)
+        try:
+            with open(path, 'rt') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        for fragment in manifest['fragments']:
+            if not self.touch(self.blobPath(fragment['blob'], fragment['format'])):
+                return None
+        self.touch(path)
+        return manifest
+
+    def loadFragment(self, fragment):
+        """Return the image data of a fragment from a manifest, or None if it has been evicted."""
+        try:
+            with open(self.blobPath(fragment['blob'], fragment['format']), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def writeAtomically(self, path, data):
+        fd, tempName = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tempName, path)
+        except OSError:
+            try:
+                os.remove(tempName)
+            except OSError:
+                pass
+
+    def store(self, key, fragments, asy2psmap):
+        """Store a deconstruction in the background. fragments is a list of
+        (data, fileformat, bbox, key, localCount, containsClip, userKey) tuples."""
+        return self.writer.submit(self.write, key, fragments, asy2psmap)
+
+    def write(self, key, fragments, asy2psmap):
+        manifest = {'fragments': [], 'asy2psmap': list(asy2psmap)}
+        for data, fileformat, bbox, fragmentKey, localCount, containsClip, userKey in fragments:
+            digest = hashlib.sha256(data).hexdigest()
+            path = self.blobPath(digest, fileformat)
+            if not self.touch(path):
+                self.writeAtomically(path, data)
+            manifest['fragments'].append({'blob': digest, 'format': fileformat, 'bbox': list(bbox),
+                                          'key': fragmentKey, 'localCount': localCount,
+                                          'clip': containsClip, 'userKey': userKey})
+
+        self.writeAtomically(self.manifestPath(key), json.dumps(manifest).encode())
+        self.evict()
+
+    def evict(self):
+        entries = []
+        totalSize = 0
+        for folder in (self.manifestDir, self.blobDir):
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    totalSize += stat.st_size
+
+        # manifests whose fragments were evicted are dropped by load.
+        entries.sort()
+        for mtime, size, path in entries:
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+                totalSize -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        # after any pending writes.
+        self.writer.submit(self.removeAll).result()
+
+    def removeAll(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.manifestDir, exist_ok=True)
+        os.makedirs(self.blobDir, exist_ok=True)
+
+def asySearchPath():
+    """The directories asy searches for local modules, before its system directory."""
+    path = [os.getcwd()]
+    path.extend(folder for folder in os.environ.get('ASYMPTOTE_DIR', '').split(os.pathsep) if folder)
+    path.append(os.path.expanduser('~/.asy'))
+    return path
+
+def findModule(name, searchPath):
+    if not name.endswith('.asy'):
+        name += '.asy'
+    for folder in searchPath:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            return os.path.realpath(path)
+    return None
+
+def dependencyStamp(code, searchPath=None):
+    """Identify the local files code imports or includes, directly or through other local
+    files, by their path, size and modification time. Modules only found in the system
+    directory are covered by asyFingerprint."""
+    if searchPath is None:
+        searchPath = asySearchPath()
+    stamps = {}
+    pending = [code]
+    while pending:
+        for quoted, bare in _importRe.findall(pending.pop()):
+            path = findModule(quoted or bare, searchPath)
+            if path is None or path in stamps:
+                continue
+            try:
+                stat = os.stat(path)
+                with open(path, 'rt', errors='replace') as f:
+                    pending.append(f.read())
+            except OSError:
+                continue
+            stamps[path] = '{0}:{1:d}:{2:d}'.format(path, stat.st_size, stat.st_mtime_ns)
+    return '\n'.join(sorted(stamps.values()))
+
+def asyFingerprint(path):
+    """Identify the asy binary at path, so that cached fragments are dropped when it changes."""
+    fullPath = shutil.which(path) or path
+    try:
+        stat = os.stat(fullPath)
+    except OSError:
+        return fullPath
+    return '{0}:{1:d}:{2:d}'.format(fullPath, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+###########################################################################
+#
+# xasyColors resolves the color of asy pen code. Sums of the colors named in
+# plain_pens.asy, rgb()/cmyk()/gray() literals and colorless pens are
+# evaluated locally, following pen::operator+ in pen.h; anything else is
+# sent to the interpreter. Results are memoized by the pen's code.
+#
+###########################################################################
+
+import re
+import threading
+import xasyParser as xp
+
+# colorspaces, in the order of ColorSpace in pen.h.
+DEFCOLOR, GRAYSCALE, RGB, CMYK = 0, 2, 3, 4
+
+namedPens = {
+    'black': (GRAYSCALE, (0,)), 'white': (GRAYSCALE, (1,)), 'gray': (GRAYSCALE, (0.5,)),
+    'red': (RGB, (1, 0, 0)), 'green': (RGB, (0, 1, 0)), 'blue': (RGB, (0, 0, 1)),
+    'Cyan': (CMYK, (1, 0, 0, 0)), 'Magenta': (CMYK, (0, 1, 0, 0)),
+    'Yellow': (CMYK, (0, 0, 1, 0)), 'Black': (CMYK, (0, 0, 0, 1)),
+    'cyan': (RGB, (0, 1, 1)), 'magenta': (RGB, (1, 0, 1)), 'yellow': (RGB, (1, 1, 0)),
+    'palered': (RGB, (1, 0.75, 0.75)), 'palegreen': (RGB, (0.75, 1, 0.75)),
+    'paleblue': (RGB, (0.75, 0.75, 1)), 'palecyan': (RGB, (0.75, 1, 1)),
+    'palemagenta': (RGB, (1, 0.75, 1)), 'paleyellow': (RGB, (1, 1, 0.75)),
+    'palegray': (GRAYSCALE, (0.95,)),
+    'lightred': (RGB, (1, 0.5, 0.5)), 'lightgreen': (RGB, (0.5, 1, 0.5)),
+    'lightblue': (RGB, (0.5, 0.5, 1)), 'lightcyan': (RGB, (0.5, 1, 1)),
+    'lightmagenta': (RGB, (1, 0.5, 1)), 'lightyellow': (RGB, (1, 1, 0.5)),
+    'lightgray': (GRAYSCALE, (0.9,)),
+    'mediumred': (RGB, (1, 0.25, 0.25)), 'mediumgreen': (RGB, (0.25, 1, 0.25)),
+    'mediumblue': (RGB, (0.25, 0.25, 1)), 'mediumcyan': (RGB, (0.25, 1, 1)),
+    'mediummagenta': (RGB, (1, 0.25, 1)), 'mediumyellow': (RGB, (1, 1, 0.25)),
+    'mediumgray': (GRAYSCALE, (0.75,)),
+    'heavyred': (RGB, (0.75, 0, 0)), 'heavygreen': (RGB, (0, 0.75, 0)),
+    'heavyblue': (RGB, (0, 0, 0.75)), 'heavycyan': (RGB, (0, 0.75, 0.75)),
+    'heavymagenta': (RGB, (0.75, 0, 0.75)), 'lightolive': (RGB, (0.75, 0.75, 0)),
+    'heavygray': (GRAYSCALE, (0.25,)),
+    'deepred': (RGB, (0.5, 0, 0)), 'deepgreen': (RGB, (0, 0.5, 0)),
+    'deepblue': (RGB, (0, 0, 0.5)), 'deepcyan': (RGB, (0, 0.5, 0.5)),
+    'deepmagenta': (RGB, (0.5, 0, 0.5)), 'deepyellow': (RGB, (0.5, 0.5, 0)),
+    'deepgray': (GRAYSCALE, (0.1,)),
+    'darkred': (RGB, (0.25, 0, 0)), 'darkgreen': (RGB, (0, 0.25, 0)),
+    'darkblue': (RGB, (0, 0, 0.25)), 'darkcyan': (RGB, (0, 0.25, 0.25)),
+    'darkmagenta': (RGB, (0.25, 0, 0.25)), 'darkolive': (RGB, (0.25, 0.25, 0)),
+    'darkgray': (GRAYSCALE, (0.05,)),
+    'orange': (RGB, (1, 0.5, 0)), 'fuchsia': (RGB, (1, 0, 0.5)),
+    'chartreuse': (RGB, (0.5, 1, 0)), 'springgreen': (RGB, (0, 1, 0.5)),
+    'purple': (RGB, (0.5, 0, 1)), 'royalblue': (RGB, (0, 0.5, 1)),
+}
+
+# aliases from plain_pens.asy.
+for alias, name in (('salmon', 'lightred'), ('brown', 'deepred'), ('olive', 'deepyellow'),
+                    ('darkbrown', 'darkred'), ('pink', 'palemagenta'), ('palegrey', 'palegray'),
+                    ('lightgrey', 'lightgray'), ('mediumgrey', 'mediumgray'), ('grey', 'gray'),
+                    ('heavygrey', 'heavygray'), ('deepgrey', 'deepgray'), ('darkgrey', 'darkgray')):
+    namedPens[alias] = namedPens[name]
+
+colorlessPens = {'solid', 'dotted', 'dashed', 'longdashed', 'dashdotted', 'longdashdotted',
+                 'squarecap', 'roundcap', 'extendcap', 'miterjoin', 'roundjoin', 'beveljoin',
+                 'zerowinding', 'evenodd', 'nobasealign', 'basealign'}
+
+colorlessFunctions = {'linewidth', 'fontsize', 'opacity', 'linecap', 'linejoin', 'miterlimit',
+                      'fillrule', 'basealign'}
+
+colorFunctions = {'gray': GRAYSCALE, 'rgb': RGB, 'cmyk': CMYK}
+
+_number = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_termRe = re.compile(r'({0})|([A-Za-z_]\w*)(?:\(({0}(?:,{0})*)\))?'.format(_number))
+
+
+def pos0(x):
+    return x if x >= 0 else 0.0
+
+
+def colorRange(space, components):
+    """Clamp the components, as the pen constructors and operator+ do."""
+    if space == GRAYSCALE:
+        return space, (min(components[0], 1.0),)
+    sat = max(components)
+    if sat > 1.0:
+        components = tuple(c / sat for c in components)
+    return space, tuple(components)
+
+
+def toCmyk(space, components):
+    if space == GRAYSCALE:
+        return (0.0, 0.0, 0.0, 1.0 - components[0])
+    if space == RGB:
+        sat = max(components)
+        if sat:
+            return tuple(1.0 - c / sat for c in components) + (1.0 - sat,)
+        return tuple(components) + (1.0 - sat,)
+    return components
+
+
+def addPens(p, q):
+    """The color of p+q."""
+    # colorless pens have zero components.
+    if q[0] == DEFCOLOR:
+        return p
+    if p[0] == DEFCOLOR:
+        return q
+    space = max(p[0], q[0])
+    if space == GRAYSCALE:
+        return colorRange(space, (p[1][0] + q[1][0],))
+    if space == RGB:
+        pc = p[1] * 3 if p[0] == GRAYSCALE else p[1]
+        qc = q[1] * 3 if q[0] == GRAYSCALE else q[1]
+    else:
+        pc = toCmyk(*p)
+        qc = toCmyk(*q)
+    return colorRange(space, tuple(a + b for a, b in zip(pc, qc)))
+
+
+def toRgb(space, components):
+    if space == GRAYSCALE:
+        return (components[0],) * 3
+    if space == CMYK:
+        c, m, y, k = components
+        k = 1 - k
+        return (1 - c) * k, (1 - m) * k, (1 - y) * k
+    return tuple(components)
+
+
+def evaluateTerm(match):
+    number, name, args = match.groups()
+    if number is not None:
+        # a real w added to a pen is linewidth(w).
+        return DEFCOLOR, ()
+    if args is None:
+        if name in namedPens:
+            return namedPens[name]
+        if name in colorlessPens:
+            return DEFCOLOR, ()
+        return None
+    if name in colorlessFunctions:
+        return DEFCOLOR, ()
+    space = colorFunctions.get(name)
+    values = tuple(pos0(float(a)) for a in args.split(','))
+    if space is None or len(values) != {GRAYSCALE: 1, RGB: 3, CMYK: 4}[space]:
+        return None
+    return colorRange(space, values)
+
+
+def evaluatePenColor(code):
+    """Return the rgb color of code if it can be evaluated locally, otherwise None."""
+    code = xp.compact(code)
+    pen = (DEFCOLOR, ())
+    pos = 0
+    while True:
+        match = _termRe.match(code, pos)
+        if match is None:
+            return None
+        term = evaluateTerm(match)
+        if term is None:
+            return None
+        pen = addPens(pen, term)
+        pos = match.end()
+        if pos == len(code):
+            break
+        if code[pos] != '+':
+            return None
+        pos += 1
+
+    if pen[0] == DEFCOLOR:
+        # the interpreter reports no components for a colorless pen.
+        return None
+    return toRgb(*pen)
+
+
+class PenColorResolver:
+    """Memoizes the rgb color of pen code, evaluating it locally when possible
+    and otherwise asking the interpreter, one round-trip per batch of pens."""
+
+    def __init__(self):
+        self.colors = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.colors.clear()
+
+    def resolve(self, code, engine=None):
+        return self.resolveAll([code], engine)[0]
+
+    def resolveAll(self, codes, engine=None):
+        with self.lock:
+            colors = [self.colors.get(code) for code in codes]
+        unknown = {}
+        for i, code in enumerate(codes):
+            if colors[i] is None:
+                colors[i] = evaluatePenColor(code)
+                if colors[i] is None:
+                    unknown[code] = None
+                else:
+                    with self.lock:
+                        self.colors[code] = colors[i]
+
+        if unknown:
+            # the lock is not held across the round-trip, which may wait for an engine.
+            queried = dict(zip(unknown, self.queryEngine(list(unknown), engine)))
+            with self.lock:
+                self.colors.update(queried)
+            colors = [queried.get(code, color) for code, color in zip(codes, colors)]
+        return colors
+
+    @staticmethod
+    def queryEngine(codes, engine):
+        componentCounts = {'cmyk': 4, 'rgb': 3, 'gray': 1}
+        assert engine is not None and engine.active
+
+        colors = []
+        with engine.lease() as asy:
+            fout = asy.ostream
+            fin = asy.istream
+
+            for code in codes:
+                fout.write("{ pen p=" + code + ';\n')
+                fout.write("write(_outpipe,colorspace(p),newl);\n")
+                fout.write("write(_outpipe,colors(p)); }\n")
+            fout.write("flush(_outpipe);\n")
+            fout.write(asy.xasy)
+            fout.flush()
+
+            for code in codes:
+                colorspace = fin.readline()
+                count = next((componentCounts[space] for space in componentCounts if space in colorspace), None)
+                if count is None:
+                    raise ChildProcessError('Asymptote error.')
+                lines = ''.join(fin.readline() for i in range(count))
+                colors.append(xp.parseColor(colorspace, lines))
+        return colors
+
+
+penResolver = PenColorResolver()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+###########################################################################
+#
+# xasyParser reads the values the interpreter writes back to xasy: reals,
+# pairs, transforms, paths and pen colors. Nothing is evaluated; each reply
+# is checked against the grammar of asy's output and its numbers are
+# converted in one pass into NumPy arrays.
+#
+###########################################################################
+
+import re
+import numpy as np
+
+
+class ReplyParseError(ValueError):
+    pass
+
+
+# the structure of a reply is checked with fields that exclude the delimiters;
+# the fields themselves are validated when they are converted to floats.
+_field = r'[-+.\w]+'
+_pair = r'\({0},{0}\)'.format(_field)
+
+_spaceRe = re.compile(r'\s+')
+_pairRe = re.compile(_pair)
+_transformRe = re.compile(r'\({0}(?:,{0}){{5}}\)'.format(_field))
+_pathRe = re.compile(r'{0}(?:\.\.controls{0}and{0}\.\.{0})*(?:\.\.controls{0}and{0}\.\.cycle)?'.format(_pair))
+_delimiters = str.maketrans('(),', '   ')
+
+
+def compact(text: str) -> str:
+    return _spaceRe.sub('', text)
+
+
+def realArray(fields) -> np.ndarray:
+    try:
+        values = np.array(fields, dtype=float)
+    except ValueError as e:
+        raise ReplyParseError(str(e)) from None
+    # float() accepts nan and inf, which no reply xasy can draw contains.
+    if not np.isfinite(values).all():
+        raise ReplyParseError('non-finite value in reply')
+    return values
+
+
+def pairFields(text: str) -> list:
+    return text.translate(_delimiters).split()
+
+
+def parseReal(text: str) -> float:
+    return realArray(text.strip()).item()
+
+
+def parseInt(text: str) -> int:
+    text = text.strip()
+    if re.fullmatch(r'[-+]?\d+', text) is None:
+        raise ReplyParseError('expected an integer: {0!r}'.format(text))
+    return int(text)
+
+
+def parseReals(text: str) -> np.ndarray:
+    """Parse reals separated by whitespace, as written by write(real[])."""
+    return realArray(text.split())
+
+
+def parsePair(text: str) -> tuple:
+    text = compact(text)
+    if _pairRe.fullmatch(text) is None:
+        raise ReplyParseError('expected a pair: {0!r}'.format(text))
+    x, y = realArray(pairFields(text)).tolist()
+    return x, y
+
+
+def parseTransform(text: str) -> tuple:
+    """Parse (x,y,xx,xy,yx,yy) into a tuple of six floats."""
+    text = compact(text)
+    if _transformRe.fullmatch(text) is None:
+        raise ReplyParseError('expected a transform: {0!r}'.format(text))
+    return tuple(realArray(pairFields(text)).tolist())
+
+
+def parsePath(text: str):
+    """Parse an unstraightened path, as written by write(path), into
+    (nodes, controls, cyclic): an n x 2 array of the nodes, an m x 2 x 2
+    array of the controls of each segment, and whether the path is cyclic.
+    For a cyclic path the first node is not repeated at the end."""
+    text = compact(text)
+    if _pathRe.fullmatch(text) is None:
+        raise ReplyParseError('expected a path: {0!r}'.format(text[:80]))
+
+    cyclic = text.endswith('cycle')
+    fields = text.replace('..controls', ' ').replace('and', ' ').replace('..', ' ').replace('cycle', ' ')
+    values = realArray(pairFields(fields))
+    if cyclic:
+        # pad the missing closing node so that every segment spans 6 values.
+        values = np.concatenate((values, values[:2]))
+    segments, extra = divmod(len(values) - 2, 6)
+    if extra:
+        raise ReplyParseError('malformed path: {0!r}'.format(text[:80]))
+
+    nodes = values[:2].reshape(1, 2)
+    if segments > 0:
+        steps = values[2:].reshape(segments, 3, 2)
+        controls = steps[:, :2, :]
+        ends = steps[:, 2, :]
+        nodes = np.concatenate((nodes, ends[:-1] if cyclic else ends))
+    else:
+        controls = np.empty((0, 2, 2))
+    return nodes, controls, cyclic
+
+
+def parseColor(colorspace: str, text: str) -> tuple:
+    """Convert the components written by colors(p) in the given colorspace to rgb."""
+    components = parseReals(text)
+    if 'cmyk' in colorspace:
+        c, m, y, k = components[:4].tolist()
+        k = 1 - k
+        return (1 - c) * k, (1 - m) * k, (1 - y) * k
+    elif 'rgb' in colorspace:
+        r, g, b = components[:3].tolist()
+        return r, g, b
+    elif 'gray' in colorspace:
+        gray = components[0].item()
+        return gray, gray, gray
+    raise ReplyParseError('unknown colorspace: {0!r}'.format(colorspace))
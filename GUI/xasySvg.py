@@ -2,21 +2,180 @@
 
 import PyQt5.QtGui as Qg
 import PyQt5.QtWidgets as Qw
+import PyQt5.QtCore as Qc
+import collections
+import concurrent.futures
 import io
+import logging
+import math
+import os
 import subprocess
 import sys
 
+# librsvg renders clipping paths, which QSvgRenderer does not support. When its
+# Python binding (PyGObject with the Rsvg 2.0 typelib, and pycairo; optional, see
+# requirements.txt) is available, it is used in-process. Otherwise each
+# rasterization runs rsvg-convert, which must then be in the path.
+logger = logging.getLogger(__name__)
+
+try:
+    import gi
+    gi.require_version('Rsvg', '2.0')
+    from gi.repository import Rsvg
+    import cairo
+except (ImportError, ValueError) as e:
+    Rsvg = None
+    logger.info('rasterizing SVG with rsvg-convert; librsvg binding unavailable: %s', e)
+else:
+    logger.info('rasterizing SVG in-process with librsvg %d.%d.%d',
+                Rsvg.MAJOR_VERSION, Rsvg.MINOR_VERSION, Rsvg.MICRO_VERSION)
+
+# rasterizations run here, so that several of them proceed in parallel.
+renderPool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+class RendererMissingError(Exception):
+    pass
+
 class SvgObject():
-    def __init__(self, file: str):
+    def __init__(self, file: str=None, data: bytes=None):
         self.file=file
+        self.data=data
 
-    def render(self, dpi:int) -> Qg.QImage:
+    def getData(self) -> bytes:
+        if self.data is None:
+            with open(self.file, 'rb') as f:
+                return f.read()
+        return self.data
+
+    def rasterizeInProcess(self, dpi:int) -> Qg.QImage:
+        handle = Rsvg.Handle.new_from_data(self.getData())
+        handle.set_dpi(dpi)
+        dimensions = handle.get_dimensions()
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(dimensions.width, 1), max(dimensions.height, 1))
+        handle.render_cairo(cairo.Context(surface))
+        surface.flush()
+
+        image = Qg.QImage(surface.get_data(), surface.get_width(), surface.get_height(),
+                          surface.get_stride(), Qg.QImage.Format_ARGB32_Premultiplied)
+        # the image does not own the surface's memory.
+        return image.copy()
+
+    def rasterizeExternally(self, dpi:int) -> Qg.QImage:
+        args = ['rsvg-convert', '--dpi-x', str(dpi), '--dpi-y', str(dpi)]
+        if self.data is None:
+            args.append(self.file)
         try:
-            rawDataProc = subprocess.Popen(['rsvg-convert', '--dpi-x', str(dpi),
-                                            '--dpi-y', str(dpi), self.file],
-                                           stdout=subprocess.PIPE)
-        except:
-            Qw.QMessageBox.about(None,'rsvg-convert missing','Please install rsvg-convert version >= 2.40 in your path.')
-            sys.exit(-1)
-
-        return Qg.QImage.fromData(rawDataProc.stdout.read(), 'PNG')
+            rawDataProc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as e:
+            raise RendererMissingError() from e
+
+        rawData, _ = rawDataProc.communicate(self.data)
+        return Qg.QImage.fromData(rawData, 'PNG')
+
+    def rasterize(self, dpi:int) -> Qg.QImage:
+        """Render the image at dpi. Safe to call from any thread."""
+        if Rsvg is not None:
+            return self.rasterizeInProcess(dpi)
+        return self.rasterizeExternally(dpi)
+
+    def renderAsync(self, dpi:int) -> concurrent.futures.Future:
+        return renderPool.submit(self.rasterize, dpi)
+
+    def render(self, dpi:int) -> Qg.QImage:
+        return waitForRender(self.renderAsync(dpi))
+
+def waitForRender(future: concurrent.futures.Future) -> Qg.QImage:
+    try:
+        return future.result()
+    except RendererMissingError:
+        Qw.QMessageBox.about(None,'rsvg-convert missing','Please install rsvg-convert version >= 2.40 in your path, '
+                          'or PyGObject with librsvg and pycairo.')
+        sys.exit(-1)
+
+class RasterCache(Qc.QObject):
+    """Rasterizations of SvgObjects at power-of-two DPIs, rendered in the background and
+    kept under a shared memory budget, evicting the least recently used first.
+    lookup returns the closest level already rendered, so that zooming never waits."""
+
+    imageReady = Qc.pyqtSignal()
+    renderFinished = Qc.pyqtSignal(object, int, object)
+
+    def __init__(self, budget=256 * 1024 * 1024):
+        super().__init__()
+        self.budget = budget
+        self.size = 0
+        self.images = collections.OrderedDict()     # (svg, level) -> QImage
+        self.levels = {}                            # svg -> set of levels in images
+        self.pending = {}                           # (svg, level) -> Future
+        # the futures complete on worker threads; their results are stored on this object's thread.
+        self.renderFinished.connect(self.storeImage, Qc.Qt.QueuedConnection)
+
+    @classmethod
+    def getLevel(cls, dpi):
+        return max(math.ceil(math.log2(max(dpi, 1))), 0)
+
+    def request(self, svg, dpi):
+        """Start rendering the level suited to dpi unless it is cached or already on its way."""
+        level = self.getLevel(dpi)
+        if (svg, level) in self.images or (svg, level) in self.pending:
+            return
+        future = svg.renderAsync(2 ** level)
+        self.pending[(svg, level)] = future
+        future.add_done_callback(lambda future: self.renderFinished.emit(svg, level, future))
+
+    def lookup(self, svg, dpi):
+        """Return the cached image closest to dpi, preferring finer ones, or None if there is none yet."""
+        level = self.getLevel(dpi)
+        self.request(svg, dpi)
+        levels = self.levels.get(svg)
+        if not levels:
+            return None
+        finer = [lvl for lvl in levels if lvl >= level]
+        best = min(finer) if finer else max(levels)
+        self.images.move_to_end((svg, best))
+        return self.images[(svg, best)]
+
+    def wait(self, svg, dpi):
+        """Return an image for dpi, rendering it synchronously if nothing is cached."""
+        image = self.lookup(svg, dpi)
+        if image is None:
+            level = self.getLevel(dpi)
+            image = waitForRender(self.pending.pop((svg, level)))
+            self.insert(svg, level, image)
+        return image
+
+    def storeImage(self, svg, level, future):
+        if self.pending.get((svg, level)) is not future:
+            # already stored by wait.
+            return
+        del self.pending[(svg, level)]
+        image = waitForRender(future)
+        self.insert(svg, level, image)
+        self.imageReady.emit()
+
+    def insert(self, svg, level, image):
+        self.images[(svg, level)] = image
+        self.levels.setdefault(svg, set()).add(level)
+        self.size += image.sizeInBytes()
+        self.evict()
+
+    def evict(self):
+        # always keep the most recent image, however large.
+        while self.size > self.budget and len(self.images) > 1:
+            (svg, level), image = self.images.popitem(last=False)
+            self.size -= image.sizeInBytes()
+            self.levels[svg].discard(level)
+            if not self.levels[svg]:
+                del self.levels[svg]
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.evict()
+
+_rasterCache = None
+
+def getRasterCache() -> RasterCache:
+    global _rasterCache
+    if _rasterCache is None:
+        _rasterCache = RasterCache()
+    return _rasterCache
@@ -17,7 +17,17 @@
 #
 #####
 
+import time
+importStarted = time.perf_counter()
+
 from ctypes import *
+import functools
+import sys
+import threading
+import weakref
+
+# Imported on first use, as it takes longer to import than aspy itself.
+numpy = None
 
 asyInt = c_longlong
 handle_typ = c_void_p
@@ -28,8 +38,8 @@ function_typ = CFUNCTYPE(None, state_typ, c_void_p)
 
 class string_typ(Structure):
     _fields_ = [
-            ("buf", c_char_p), # Should be NUL-terminated? Maybe replace with
-                               # POINTER(c_char).
+            # Not NUL-terminated, and may contain NULs.
+            ("buf", POINTER(c_char)),
             ("length", asyInt)
             ]
 
@@ -80,52 +90,203 @@ class Policy(Structure):
             ("getParam",           CFUNCTYPE(handle_typ, state_typ, asyInt)),
             ("setReturnValue",     CFUNCTYPE(None, state_typ, handle_typ)),
             ("setErrorCallback",   CFUNCTYPE(None, ErrorCallbackFUNC)),
+            # Version 102
+            ("handleFromDoubles",  CFUNCTYPE(handle_typ,
+                                             POINTER(c_double),
+                                             asyInt,
+                                             asyInt)),
+            ("arraySizeFromHandle", CFUNCTYPE(asyInt, handle_typ)),
+            ("doublesFromHandle",  CFUNCTYPE(None,
+                                             handle_typ,
+                                             POINTER(c_double),
+                                             asyInt,
+                                             asyInt)),
+            # Version 103
+            ("callBatch",          CFUNCTYPE(handle_typ,
+                                             handle_typ,
+                                             POINTER(handle_typ),
+                                             asyInt)),
+            # Version 104
+            ("liveHandles",        CFUNCTYPE(asyInt)),
             ]
 
-policy = None
+# Asymptote's runtime is global to the process and not safe to enter from
+# several threads at once, so every use of the policy holds this lock.  It is
+# reentrant because callbacks from asy run Python code that uses the policy.
+policyLock = threading.RLock()
+
+def synchronized(f):
+    @functools.wraps(f)
+    def locked(*args, **namedArgs):
+        with policyLock:
+            return f(*args, **namedArgs)
+    return locked
+
+# Seconds spent importing aspy, loading asymptote.so and loading plain.
+timings = {}
+
+class LazyPolicy(object):
+    """Stands in for the policy, loading asymptote.so when it is first used
+    rather than when aspy is imported."""
+    def __init__(self):
+        self.pointer = None
+
+    def loaded(self):
+        return self.pointer is not None
+
+    @property
+    def contents(self):
+        if self.pointer is None:
+            initPolicyAndBaseState()
+        return self.pointer.contents
+
+policy = LazyPolicy()
 baseState = None
+
+@synchronized
 def initPolicyAndBaseState():
-    global policy, baseState
+    global baseState
+    if policy.loaded():
+        return
+
+    started = time.perf_counter()
     lib = CDLL("asymptote.so")
 
     getPolicy = lib._asy_getPolicy
     getPolicy.restype = POINTER(Policy)
-    policy = getPolicy()
+    pointer = getPolicy()
+    pointer.contents.setErrorCallback(cErrorCallback)
 
     getState = lib._asy_getState
     getState.restype = state_typ
     baseState = getState()
 
-initPolicyAndBaseState()
+    policy.pointer = pointer
+    timings['init'] = time.perf_counter() - started
 
 def pyStringFromAsyString(st):
-    #TODO: Handle strings with null-terminators.
-    return str(st.buf)
+    return string_at(st.buf, st.length).decode('utf-8', 'replace')
 
+@synchronized
 def pyStringFromHandle(h):
-    #TODO: Handle strings with null-terminators.
     st = policy.contents.stringFromHandle(h)
     checkForErrors()
     return pyStringFromAsyString(st)
 
+@synchronized
+def bufferFromHandle(h, owner):
+    """Returns the contents of a string as a read-only memoryview of bytes,
+    without copying.  The view refers to memory held by the handle, so owner,
+    the Datum holding it, is kept alive as long as the view, and releasing
+    owner is deferred until the view is gone."""
+    st = policy.contents.stringFromHandle(h)
+    checkForErrors()
+
+    if st.length == 0:
+        return memoryview(b'')
+    a = (c_char * st.length).from_address(addressof(st.buf.contents))
+    a.owner = owner
+    owner._addView(a)
+    return memoryview(a).cast('B').toreadonly()
+
+@synchronized
 def handleFromPyString(s):
-    st = string_typ(s, len(s))
-    h = policy.contents.handleFromString(st)
+    """Makes an asy string from a str, which is encoded as UTF-8, or from
+    bytes, a bytearray or another buffer, which are passed without copying.
+    The library makes the only copy."""
+    if type(s) is str:
+        s = s.encode('utf-8')
+
+    if type(s) is bytes:
+        buf = cast(s, POINTER(c_char))
+        n = len(s)
+    else:
+        view = memoryview(s).cast('B')
+        if view.readonly:
+            s = view.tobytes()
+            buf = cast(s, POINTER(c_char))
+        else:
+            buf = cast((c_char * len(view)).from_buffer(view), POINTER(c_char))
+        n = len(view)
+
+    h = policy.contents.handleFromString(string_typ(buf, n))
+    checkForErrors()
+    return h
+
+def requireNumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("array conversion requires numpy")
+
+def isNumpyArray(val):
+    # If numpy has not been imported, val cannot be one of its arrays.
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(val, np.ndarray)
+
+@synchronized
+def handleFromArray(a):
+    """Converts a NumPy array to a real[], pair[] or triple[] handle in one
+    call.  float64 arrays of shape (n,) become real[], complex arrays of shape
+    (n,) or float64 arrays of shape (n,2) become pair[], and float64 arrays of
+    shape (n,3) become triple[]."""
+    requireNumpy()
+    a = numpy.asarray(a)
+    if numpy.iscomplexobj(a):
+        a = numpy.ascontiguousarray(a, dtype=numpy.complex128)
+        a = a.view(numpy.float64).reshape(a.shape + (2,))
+    a = numpy.ascontiguousarray(a, dtype=numpy.float64)
+
+    if a.ndim == 1:
+        dim = 1
+    elif a.ndim == 2 and a.shape[1] in (2, 3):
+        dim = a.shape[1]
+    else:
+        raise ValueError("cannot convert array of shape %s" % (a.shape,))
+
+    h = policy.contents.handleFromDoubles(a.ctypes.data_as(POINTER(c_double)),
+            a.shape[0], dim)
     checkForErrors()
     return h
 
+@synchronized
+def arrayFromHandle(h, dim=1):
+    """Copies a real[] (dim 1), pair[] (dim 2) or triple[] (dim 3) into a
+    NumPy float64 array of shape (n,) or (n,dim) in one call."""
+    requireNumpy()
+    n = policy.contents.arraySizeFromHandle(h)
+    checkForErrors()
+
+    a = numpy.empty((n, dim) if dim > 1 else n, dtype=numpy.float64)
+    policy.contents.doublesFromHandle(h, a.ctypes.data_as(POINTER(c_double)),
+            n, dim)
+    checkForErrors()
+    return a
+
+def cString(s):
+    return s.encode() if type(s) is str else s
+
 def ensureDatum(val):
     return val if type(val) is Datum else Datum(val)
 
+# State kept separately for each thread: the errors reported by calls made
+# from the thread and its active arenas.
+class ThreadSlots(threading.local):
+    def __init__(self):
+        self.errors = []
+        self.arenas = []
+
+threadSlots = ThreadSlots()
+
 # The error detection scheme.
-# policyError is set to a string when an error occurs.
-policyError = []
+# Errors are appended to the slot of the thread making the call, which is the
+# thread the callback runs on.
 def pyErrorCallback(s):
-    global policyError
-    policyError.append(pyStringFromAsyString(s))
+    threadSlots.errors.append(pyStringFromAsyString(s))
 
 cErrorCallback = ErrorCallbackFUNC(pyErrorCallback)
-policy.contents.setErrorCallback(cErrorCallback)
 
 class AsyException(Exception):
     def __init__(self, msg):
@@ -135,19 +296,131 @@ class AsyException(Exception):
 
 def checkForErrors():
     """Raises an exception if an error occured."""
-    global policyError
-    if policyError != []:
-        s = policyError[0]
-        if len(policyError) > 1:
+    errors = threadSlots.errors
+    if errors != []:
+        s = errors[0]
+        if len(errors) > 1:
             s += ' (and other errors)'
-        policyError = []
+        threadSlots.errors = []
         raise AsyException(s)
 
+# Leak accounting.  liveDatums counts the Datums holding a handle and
+# liveCallbacks the Python functions that asy may still call.
+liveDatums = 0
+liveCallbacks = 0
+
+@synchronized
+def counters():
+    """Returns the number of handles held by the library and of live Datums
+    and callbacks, for watching for leaks."""
+    return { 'handles': int(policy.contents.liveHandles()),
+             'datums': liveDatums,
+             'callbacks': liveCallbacks }
+
+class Arena(object):
+    """A scope for bulk release: every Datum created while the arena is active
+    has its handle released when the arena exits, except for those passed to
+    keep.
+
+        with aspy.Arena() as arena:
+            ys = [f(x) for x in xs]
+            result = arena.keep(g(*ys))
+    """
+    def __init__(self):
+        self.datums = []
+
+    def __enter__(self):
+        threadSlots.arenas.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        threadSlots.arenas.remove(self)
+        self.release()
+        return False
+
+    def add(self, d):
+        self.datums.append(d)
+
+    def keep(self, d):
+        """Exempts d from release by this arena, leaving it to be released
+        when it is finalized (or by an enclosing arena)."""
+        self.datums = [x for x in self.datums if x is not d]
+        arenas = threadSlots.arenas
+        if self in arenas:
+            i = arenas.index(self)
+            if i > 0:
+                arenas[i-1].add(d)
+        return d
+
+    def release(self):
+        datums, self.datums = self.datums, []
+        for d in datums:
+            d.release()
+
+class untracked(object):
+    """Suspends the active arenas, so that Datums created within are not
+    released with them.  Used for lookups that State keeps."""
+    def __enter__(self):
+        self.arenas = threadSlots.arenas
+        threadSlots.arenas = []
+        return self
+
+    def __exit__(self, *exc):
+        threadSlots.arenas = self.arenas
+        return False
+
 class Datum(object):
+    # The State whose globals this datum is, if any.
+    _state = None
+    # The ctypes wrapper of the Python function this datum calls, if any.
+    _callback = None
+    # The number of live views returned by buffer, and whether release was
+    # called while there were some.
+    _views = 0
+    _releasePending = False
 
     def _setHandle(self, handle):
+        global liveDatums
         object.__setattr__(self, 'handle', handle)
-
+        if handle:
+            liveDatums += 1
+            if len(threadSlots.arenas) > 0:
+                threadSlots.arenas[-1].add(self)
+
+    @synchronized
+    def _addView(self, exporter):
+        object.__setattr__(self, '_views', self._views + 1)
+        weakref.finalize(exporter, self._dropView)
+
+    @synchronized
+    def _dropView(self):
+        object.__setattr__(self, '_views', self._views - 1)
+        if self._views == 0 and self._releasePending:
+            object.__setattr__(self, '_releasePending', False)
+            self.release()
+
+    @synchronized
+    def release(self):
+        """Releases the handle now rather than on finalization.  While views
+        returned by buffer are alive, the release is deferred until the last
+        of them is gone, as they point into the handle's memory."""
+        global liveDatums
+        if self._views:
+            object.__setattr__(self, '_releasePending', True)
+            return
+        handle = self.__dict__.get('handle')
+        if handle:
+            object.__setattr__(self, 'handle', 0)
+            object.__setattr__(self, '_callback', None)
+            liveDatums -= 1
+            policy.contents.releaseHandle(handle)
+
+    def __del__(self):
+        # The policy is gone if the module is being torn down.
+        if policy is not None and policy.loaded():
+            self.release()
+
+    @synchronized
     def __init__(self, val):
         self._setHandle(0)
 
@@ -162,17 +435,20 @@ class Datum(object):
             checkForErrors()
         elif type(val) is float:
             self._setHandle(policy.contents.handleFromDouble(val))
-        elif type(val) is str:
+        elif type(val) in (str, bytes, bytearray, memoryview):
             self._setHandle(handleFromPyString(val))
             checkForErrors()
         elif type(val) is tuple:
             # Could do this more efficiently, and avoid a copyHandle
-            ret = state.globals()["operator tuple"](*val)
+            ret = state.getOperator("tuple")(*val)
             self._setHandle(policy.contents.copyHandle(ret.handle))
             checkForErrors()
         elif type(val) is Datum:
             self._setHandle(policy.contents.copyHandle(val.handle))
             checkForErrors()
+            object.__setattr__(self, '_callback', val._callback)
+        elif isNumpyArray(val):
+            self._setHandle(handleFromArray(val))
         else:
             # TODO: check if val has a toDatum field
             raise TypeError("cannot initialize Datum from '%s'" %
@@ -182,11 +458,13 @@ class Datum(object):
         # TODO: Add type-checking to policy.
         return '<Datum with handle %s>' % hex(self.handle)
 
+    @synchronized
     def __int__(self):
         l = policy.contents.IntFromHandle(self.handle)
         checkForErrors()
         return int(l)
 
+    @synchronized
     def __nonzero__(self):
         # This will throw an exception for anything but an underlying bool
         # type.  Perhaps we should be more pythonic.
@@ -195,6 +473,7 @@ class Datum(object):
         assert l in [0,1]
         return l == 1
 
+    @synchronized
     def __float__(self):
         x = policy.contents.doubleFromHandle(self.handle)
         checkForErrors()
@@ -203,8 +482,27 @@ class Datum(object):
     def __str__(self):
         return pyStringFromHandle(self.handle)
 
+    def __bytes__(self):
+        return self.buffer().tobytes()
+
+    def buffer(self):
+        """Returns the contents of a string as a memoryview of bytes, valid
+        for as long as the view is alive, even if the Datum is released
+        meanwhile, directly or by an Arena."""
+        return bufferFromHandle(self.handle, self)
+
+    def toArray(self, dim=1):
+        """Returns a real[] (dim 1), pair[] (dim 2) or triple[] (dim 3) as a
+        NumPy array."""
+        return arrayFromHandle(self.handle, dim)
+
+    def toComplexArray(self):
+        """Returns a pair[] as a NumPy complex128 array."""
+        return arrayFromHandle(self.handle, 2).view(numpy.complex128).reshape(-1)
+
+    @synchronized
     def __getattr__(self, name):
-        field = policy.contents.getField(self.handle, name)
+        field = policy.contents.getField(self.handle, cString(name))
         checkForErrors()
         return DatumFromHandle(field)
 
@@ -214,20 +512,26 @@ class Datum(object):
         #TODO: raise an IndexError when appropriate.
         #TODO: implement array indices
 
+    @synchronized
     def __setattr__(self, name, val):
         # TODO: Resolve setting versus declaring.
         # One idea: d.x = f or d["x"] = f sets and d["int x()"] = f declares
         # anew.
         policy.contents.addField(self.handle,
-                name, ensureDatum(val).handle)
+                cString(name), ensureDatum(val).handle)
         checkForErrors()
 
+        if self._state is not None:
+            # Redefining a global invalidates what was looked up under its name.
+            self._state.forget(name)
+
     def __setitem__(self, name, val):
         assert type(name) == str
         self.__setattr__(name, val)
         #TODO: raise an IndexError when appropriate.
         #TODO: implement array indices
 
+    @synchronized
     def __call__(self, *args, **namedArgs):
         alist = policy.contents.newArguments()
         checkForErrors()
@@ -235,12 +539,13 @@ class Datum(object):
 
         for arg in args:
             d = ensureDatum(arg)
-            policy.contents.addArgument(alist, "", d.handle, NORMAL_ARG)
+            policy.contents.addArgument(alist, b"", d.handle, NORMAL_ARG)
             checkForErrors()
 
         for name,arg in namedArgs.items():
             d = ensureDatum(arg)
-            policy.contents.addArgument(alist, name, d.handle, NORMAL_ARG)
+            policy.contents.addArgument(alist, cString(name), d.handle,
+                    NORMAL_ARG)
             checkForErrors()
 
         ret = policy.contents.call(self.handle, alist)
@@ -252,39 +557,71 @@ class Datum(object):
         if ret != None:
             return DatumFromHandle(ret)
 
+    @synchronized
+    def callBatch(self, *columns):
+        """Calls the function once per row in a single policy call, passing
+        the j-th entry of each column as the arguments of the j-th call.
+        Columns are Datums holding arrays of equal length, or anything
+        handleFromArray accepts.  Returns the results as an array Datum, or
+        None for a void function."""
+        keep = [c if type(c) is Datum else DatumFromHandle(handleFromArray(c))
+                for c in columns]
+        handles = (handle_typ * len(keep))(*[c.handle for c in keep])
+
+        ret = policy.contents.callBatch(self.handle, handles, len(keep))
+        checkForErrors()
+
+        if ret != None:
+            return DatumFromHandle(ret)
+
+    def map(self, rows):
+        """Calls the function on each tuple of numbers in rows, given as a
+        sequence of tuples or a NumPy array of shape (n,) or (n,k), and
+        returns the results as an array Datum.  Complex entries are passed as
+        pairs."""
+        requireNumpy()
+        rows = numpy.asarray(rows)
+        if rows.ndim == 1:
+            return self.callBatch(rows)
+        elif rows.ndim == 2:
+            return self.callBatch(*[rows[:,k] for k in range(rows.shape[1])])
+        else:
+            raise ValueError("cannot call with rows of shape %s" %
+                    (rows.shape,))
+
     def __add__(self, other):
-        return state.globals()["operator +"](self, other)
+        return state.binaryOperator("+", self, other)
     def __sub__(self, other):
-        return state.globals()["operator -"](self, other)
+        return state.binaryOperator("-", self, other)
     def __mul__(self, other):
-        return state.globals()["operator *"](self, other)
+        return state.binaryOperator("*", self, other)
     def __div__(self, other):
-        return state.globals()["operator /"](self, other)
+        return state.binaryOperator("/", self, other)
     def __truediv__(self, other):
-        return state.globals()["operator /"](self, other)
+        return state.binaryOperator("/", self, other)
     def __mod__(self, other):
-        return state.globals()["operator %"](self, other)
+        return state.binaryOperator("%", self, other)
     def __pow__(self, other):
-        return state.globals()["operator ^"](self, other)
+        return state.binaryOperator("^", self, other)
     def __and__(self, other):
-        return state.globals()["operator &"](self, other)
+        return state.binaryOperator("&", self, other)
     def __or__(self, other):
-        return state.globals()["operator |"](self, other)
-    def __neg__(self, other):
-        return state.globals()["operator -"](self)
+        return state.binaryOperator("|", self, other)
+    def __neg__(self):
+        return state.getOperator("-")(self)
 
     def __lt__(self, other):
-        return state.globals()["operator <"](self, other)
+        return state.binaryOperator("<", self, other)
     def __le__(self, other):
-        return state.globals()["operator <="](self, other)
+        return state.binaryOperator("<=", self, other)
     def __eq__(self, other):
-        return state.globals()["operator =="](self, other)
+        return state.binaryOperator("==", self, other)
     def __ne__(self, other):
-        return state.globals()["operator !="](self, other)
+        return state.binaryOperator("!=", self, other)
     def __gt__(self, other):
-        return state.globals()["operator >"](self, other)
+        return state.binaryOperator(">", self, other)
     def __ge__(self, other):
-        return state.globals()["operator >="](self, other)
+        return state.binaryOperator(">=", self, other)
 
 def DatumFromHandle(handle):
     """Initializes a Datum from a given low-level handle.  Does not invoke
@@ -294,14 +631,79 @@ def DatumFromHandle(handle):
     return d
 
 class State(object):
-    def __init__(self, base):
-        self.base = base
-
+    def __init__(self, base=None):
+        # None stands for the base state, which exists once the library is
+        # loaded.
+        self._base = base
+        self.globalsDatum = None
+        # Resolved globals and operators, by name.
+        self.symbols = {}
+
+    @property
+    def base(self):
+        if self._base is None:
+            with policyLock:
+                initPolicyAndBaseState()
+                return baseState
+        return self._base
+
+    @synchronized
     def globals(self):
-        handle = policy.contents.globals(self.base)
+        if self.globalsDatum is None:
+            handle = policy.contents.globals(self.base)
+            checkForErrors()
+            with untracked():
+                d = DatumFromHandle(handle)
+            object.__setattr__(d, '_state', self)
+            self.globalsDatum = d
+        return self.globalsDatum
+
+    @synchronized
+    def getGlobal(self, name):
+        """Looks up a global once and remembers it until it is redefined
+        through addField."""
+        try:
+            return self.symbols[name]
+        except KeyError:
+            with untracked():
+                d = getattr(self.globals(), name)
+            self.symbols[name] = d
+            return d
+
+    def getOperator(self, op):
+        return self.getGlobal("operator " + op)
+
+    def forget(self, name=None):
+        """Drops the remembered lookup of name, or of every global."""
+        if name is None:
+            self.symbols.clear()
+        else:
+            self.symbols.pop(name, None)
+
+    @synchronized
+    def binaryOperator(self, op, a, b):
+        """Calls a binary operator, checking for errors once for building
+        the arguments and once for the call rather than after each step."""
+        f = self.getOperator(op)
+        a = ensureDatum(a)
+        b = ensureDatum(b)
+        p = policy.contents
+
+        alist = p.newArguments()
+        p.addArgument(alist, b"", a.handle, NORMAL_ARG)
+        p.addArgument(alist, b"", b.handle, NORMAL_ARG)
+        try:
+            # Otherwise the call would run, and fail, with missing arguments.
+            checkForErrors()
+            ret = p.call(f.handle, alist)
+        finally:
+            p.releaseArguments(alist)
         checkForErrors()
-        return DatumFromHandle(handle)
 
+        if ret != None:
+            return DatumFromHandle(ret)
+
+    @synchronized
     def params(self):
         p = []
 
@@ -316,15 +718,21 @@ class State(object):
         assert len(p) == numParams
         return p
 
+    @synchronized
     def setReturnValue(self, val):
         policy.contents.setReturnValue(self.base, ensureDatum(val).handle)
         checkForErrors()
 
-# Keep a link to all of the callbacks created, so they aren't garbage
-# collected.  TODO: See if this is neccessary.
-storedCallbacks = []
+@synchronized
+def callbackReleased():
+    global liveCallbacks
+    liveCallbacks -= 1
 
+@synchronized
 def DatumFromCallable(f):
+    """Wraps a Python function as a Datum.  The function stays callable from
+    asy as long as the Datum, or a copy of it, is alive."""
+    global liveCallbacks
     def wrapped(s, d):
         state = State(s)
         params = state.params()
@@ -333,16 +741,47 @@ def DatumFromCallable(f):
             state.setReturnValue(r)
 
     cf = function_typ(wrapped)
-    storedCallbacks.append(cf)
+    liveCallbacks += 1
+    weakref.finalize(cf, callbackReleased)
 
-    h = policy.contents.handleFromFunction(f.__name__, cf, None)
+    h = policy.contents.handleFromFunction(cString(f.__name__), cf, None)
     checkForErrors()
 
-    return DatumFromHandle(h)
-
-print ("version", policy.contents.version)
+    d = DatumFromHandle(h)
+    object.__setattr__(d, '_callback', cf)
+    return d
 
-state = State(baseState)
+def workerPool(workers=None):
+    """Returns a pool of worker processes, each embedding its own asymptote
+    runtime, so that several figures can be processed concurrently.  The
+    runtime of a process is global, so threads within one process are
+    serialized by policyLock.  Tasks must be picklable functions that use
+    aspy within the worker."""
+    import concurrent.futures
+    import multiprocessing
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=loadPlain)
+
+state = State()
+
+def loadPlain():
+    """Loads asymptote.so and plain now rather than on first use."""
+    started = time.perf_counter()
+    getattr(state.globals(), "currentpicture").release()
+    timings['plain'] = time.perf_counter() - started
+
+preloadThread = None
+def preload():
+    """Loads asymptote.so and plain in a background thread, so that they are
+    ready by the time aspy is first used.  Calls made in the meantime wait
+    for it to finish."""
+    global preloadThread
+    if preloadThread is None:
+        preloadThread = threading.Thread(target=loadPlain, name="aspy preload")
+        preloadThread.daemon = True
+        preloadThread.start()
+    return preloadThread
 
 # An example
 def runExample():
@@ -354,3 +793,4 @@ def runExample():
 
     g.draw(g.circle(100), g.red)
 
+timings['import'] = time.perf_counter() - importStarted
@@ -2,6 +2,17 @@
 
 # Python module to feed Asymptote with commands
 # (modified from gnuplot.py)
+import collections
+import concurrent.futures
+import glob
+import itertools
+import json
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
 from subprocess import *
 class asy:
 	def __init__(self):
@@ -33,7 +44,181 @@ class asy:
 		self.session.stdin.close();
 		self.session.wait()
 
-if __name__=="__main__":
+class asyResult:
+	"""The outcome of a job: whether it ran without error, everything the
+	interpreter printed while running it, and the files it shipped out."""
+	def __init__(self, id, ok, messages, outputs):
+		self.id=id
+		self.ok=ok
+		self.messages=messages
+		self.outputs=outputs
+	def toDict(self):
+		return {'id':self.id, 'ok':self.ok, 'messages':self.messages,
+			'outputs':self.outputs}
+	def __repr__(self):
+		return 'asyResult(%r, ok=%r, outputs=%r)' % (self.id, self.ok, self.outputs)
+
+class asyDaemon:
+	"""A persistent interpreter that runs jobs and reports when each one is
+	done.  Jobs are sent in xasy mode, each framed by chr(4), and run in a
+	block of their own on an erased picture between save() and restore(),
+	so that neither their declarations nor their changes to the graphics
+	state leak into later jobs.  After each job a second frame writes a
+	completion line to the output pipe, which shares the interpreter's
+	stdout and stderr so that messages arrive in order.  Jobs may be
+	pipelined: submit queues one, and receive waits for the oldest, while
+	a reader thread drains the replies so that neither pipe fills up."""
+	eot=chr(4)+'\n'
+	marker='@@asyDaemon'
+	def __init__(self, path='asy', args=[], outdir=None):
+		self.outdir=outdir if outdir is not None else tempfile.mkdtemp(prefix='asyDaemon_')
+		# -globalwrite, as each job's output goes to its own directory under outdir.
+		self.session=Popen([path,'-xasy','-noV','-quiet','-globalwrite','-inpipe=0','-outpipe=1',
+			'-o',os.path.join(self.outdir,'')]+list(args),
+			stdin=PIPE,stdout=PIPE,stderr=STDOUT,universal_newlines=True,
+			encoding='utf-8',errors='replace')
+		self.ids=itertools.count(1)
+		self.pending=collections.deque()
+		self.replies=queue.Queue()
+		self.reader=threading.Thread(target=self.readReplies,daemon=True)
+		self.reader.start()
+		self.sendFrame('bool _asyDaemonOk=false;')
+		# Wait for plain to be loaded, so that the first job does not pay for it.
+		self.run('')
+	@property
+	def alive(self):
+		return self.session.poll() is None
+	def sendFrame(self, code):
+		self.session.stdin.write(code+'\n'+self.eot)
+		self.session.stdin.flush()
+	def readReplies(self):
+		# Each reply is (ok, messages); (None, messages) once asy has exited.
+		messages=[]
+		for line in self.session.stdout:
+			if line.startswith(self.marker+' '):
+				self.replies.put((line.rsplit(' ',1)[-1].strip() == 'true',''.join(messages)))
+				messages=[]
+			else:
+				messages.append(line)
+		self.replies.put((None,''.join(messages)))
+	@staticmethod
+	def quote(s):
+		return '"'+s.replace('\\','\\\\').replace('"','\\"')+'"'
+	def submit(self, code, output=None, format=None, id=None):
+		"""Queue a job and return its id.  If output is given, the picture is
+		shipped out under that name (without extension) in format, in a
+		directory of its own named after the job id."""
+		if self.eot in code+'\n':
+			raise ValueError('job contains the chr(4) frame terminator')
+		if id is None:
+			id=next(self.ids)
+		if output is not None:
+			jobdir=tempfile.mkdtemp(prefix='job%s_' % re.sub(r'[^\w.-]','_',str(id)),
+				dir=self.outdir)
+			output=os.path.join(jobdir,output)
+			# shipout does nothing in xasy mode, which the framing needs, so the
+			# fitted picture is handed to the primitive it would have called.
+			ship='_shipout(%s,currentpicture.fit(),currentpatterns,%s,false,false,identity());' % (
+				self.quote(output),self.quote(format or ''))
+		else:
+			ship=''
+		self.sendFrame('erase(); save(); savedefaults();\n{\n'+code+'\n}\n'+ship+
+			'\n_asyDaemonOk=true;')
+		# Restored in the completion frame, which runs even if the job failed.
+		self.sendFrame('restoredefaults(); restore(); '
+			'flush(stdout); write(_outpipe,%s+(_asyDaemonOk ? "true" : "false"),endl); '
+			'flush(_outpipe); _asyDaemonOk=false;' % self.quote('%s %s ' % (self.marker,id)))
+		self.pending.append((id,output))
+		return id
+	def receive(self):
+		"""Wait for the oldest submitted job to finish and return its asyResult."""
+		id,output=self.pending.popleft()
+		ok,messages=self.replies.get()
+		if ok is None:
+			self.replies.put((None,''))
+			raise EOFError('asy exited while running job %s:\n%s' % (id,messages))
+		outputs=sorted(glob.glob(glob.escape(output)+'.*')) if output is not None else []
+		return asyResult(id,ok,messages,outputs)
+	def run(self, code, output=None, format=None, id=None):
+		self.submit(code,output,format,id)
+		return self.receive()
+	def close(self):
+		if self.alive:
+			try:
+				self.sendFrame('quit;')
+				self.session.stdin.close()
+			except OSError:
+				pass
+			self.session.wait()
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.close()
+
+class asyPool:
+	"""A pool of warm interpreters; run may be called from several threads,
+	each job taking whichever interpreter is idle."""
+	def __init__(self, size=None, path='asy', args=[], outdir=None):
+		self.path=path
+		self.args=args
+		self.outdir=outdir if outdir is not None else tempfile.mkdtemp(prefix='asyPool_')
+		self.size=size or os.cpu_count() or 1
+		self.idle=queue.Queue()
+		self.executor=concurrent.futures.ThreadPoolExecutor(self.size)
+		for d in self.executor.map(lambda i: self.newDaemon(),range(self.size)):
+			self.idle.put(d)
+	def newDaemon(self):
+		return asyDaemon(self.path,self.args,self.outdir)
+	def run(self, code, output=None, format=None, id=None):
+		d=self.idle.get()
+		try:
+			return d.run(code,output,format,id)
+		finally:
+			if not d.alive:
+				# Replace an interpreter that died, e.g. on a quit in the job.
+				d.close()
+				d=self.newDaemon()
+			self.idle.put(d)
+	def submit(self, code, output=None, format=None, id=None):
+		"""Run a job on the pool's threads, returning a Future of its asyResult."""
+		return self.executor.submit(self.run,code,output,format,id)
+	def close(self):
+		self.executor.shutdown()
+		while not self.idle.empty():
+			self.idle.get().close()
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.close()
+
+def serve(size=None, instream=sys.stdin, outstream=sys.stdout, path='asy', args=[]):
+	"""Daemon mode: read one JSON job per line, with fields id, code, and
+	optionally output and format, and write one JSON asyResult per line as
+	each job finishes, not necessarily in order."""
+	lock=threading.Lock()
+	def answer(future):
+		try:
+			reply=future.result().toDict()
+		except Exception as e:
+			reply={'id':future.jobId, 'ok':False, 'messages':str(e), 'outputs':[]}
+		with lock:
+			outstream.write(json.dumps(reply)+'\n')
+			outstream.flush()
+	with asyPool(size,path,args) as pool:
+		futures=[]
+		for line in instream:
+			if not line.strip():
+				continue
+			job=json.loads(line)
+			future=pool.submit(job['code'],job.get('output'),job.get('format'),job.get('id'))
+			future.jobId=job.get('id')
+			future.add_done_callback(answer)
+			futures.append(future)
+		concurrent.futures.wait(futures)
+
+if __name__=="__main__" and sys.argv[1:2] == ['-daemon']:
+	serve(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+elif __name__=="__main__":
 	g=asy()
 	g.size(200)
 	g.draw('unitcircle')
@@ -51,7 +51,9 @@ extern FILE *pipeout;
 inline void openpipeout() 
 {
   int fd=intcast(settings::getSetting<Int>("outpipe"));
-  if(!pipeout && fd >= 0) pipeout=fdopen(fd,"w");
+  // Binary, so that the -xasyframes payloads are not newline-translated
+  // on Windows, where the outpipe is stderr.
+  if(!pipeout && fd >= 0) pipeout=fdopen(fd,"wb");
   if(!pipeout) {
     ostringstream buf;
     buf << "Cannot open outpipe " << fd;
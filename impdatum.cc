@@ -1,10 +1,14 @@
 #include <cstring>
+#include <sstream>
 
 #include "stack.h"
 #include "env.h"
 #include "exp.h"
 #include "stm.h"
 #include "refaccess.h"
+#include "array.h"
+#include "pair.h"
+#include "triple.h"
 
 using std::strlen;
 
@@ -16,9 +20,12 @@ using vm::get;
 
 
 #include "policy.h"
+#include "process.h"
 
 coenv &coenvInOngoingProcess();
 void runInOngoingProcess(absyntax::runnable *r);
+size_t runRepeatedlyInOngoingProcess(absyntax::runnable *r, size_t n,
+                                     repetition &rep);
 
 void runExp(absyntax::exp *e)
 {
@@ -102,16 +109,35 @@ public:
     datumError("cannot set field of datatype");
   }
 
+  virtual int_typ arraySize() {
+    datumError("cannot convert to array");
+    return -1;
+  }
+
+  virtual void toDoubles(double *buf, int_typ n, int_typ dim) {
+    datumError("cannot convert to array of reals, pairs, or triples");
+  }
+
+  // Returns the runtime array and sets celltype, or returns 0 if the datum
+  // is not an array.
+  virtual vm::array *toArray(types::ty *&celltype) {
+    datumError("cannot convert to array");
+    return 0;
+  }
+
 };
 
-// An ever-growing list of handles, used to avoid garbage collecting the data.
-// TODO: Implement effective releaseHandle.
-mem::vector<handle_typ> handles;
+// The handles held by the client, with the number of references to each.
+// Holding them here keeps the data from being garbage collected until the
+// last reference is released.
+typedef mem::unordered_map<handle_typ, size_t> handlemap;
+handlemap handles;
 
 handle_typ wrap(ImpDatum *d)
 {
   handle_typ h = (handle_typ)(d);
-  handles.push_back(h);
+  if (h)
+    ++handles[h];
   return h;
 }
 
@@ -143,15 +169,27 @@ ImpDatum *datumError(const char *msg)
 
 handle_typ imp_copyHandle(handle_typ handle)
 {
-  //cout << "+";
-  // For now, don't do anything.
+  if (handle)
+    ++handles[handle];
   return handle;
 }
 
-void imp_releaseHandle()
+void imp_releaseHandle(handle_typ handle)
+{
+  handlemap::iterator p = handles.find(handle);
+  if (p == handles.end()) {
+    if (handle)
+      datumError("releasing a handle that is not held");
+    return;
+  }
+
+  if (--p->second == 0)
+    handles.erase(p);
+}
+
+int_typ imp_liveHandles()
 {
-  //cout << "-";
-  // Do nothing, for now.
+  return static_cast<int_typ>(handles.size());
 }
 
 // A datum representing a value in Asymptote.  Both the runtime representation
@@ -168,6 +206,14 @@ public:
     assert(t->isNotError());
   }
 
+  // A datum holding an already computed value, such as an array built in
+  // bulk.
+  ItemDatum(types::ty *t, item i) : i(i), t(t) {
+    assert(t);
+    assert(t->isNotOverloaded());
+    assert(t->isNotError());
+  }
+
   // An expression that can be used to get and set the datum.
   // The value should only be set once, when the datum is created, and not
   // changed.
@@ -178,6 +224,11 @@ public:
     return new varEntryExp(nullPos, t, new itemRefAccess(&i));
   }
 
+  // Direct access to the value, used by batched calls which reuse one datum
+  // per argument for every row instead of creating new ones.
+  item getItem() { return i; }
+  void setItem(item x) { i = x; }
+
   int_typ toInt() {
     // TODO: Decide if we want to use casting.
     if (t->kind == types::ty_Int)
@@ -202,7 +253,7 @@ public:
 
   string_typ toString() {
     if (t->kind == types::ty_string) {
-      // TODO: Fix for strings containing NUL.
+      // The string may contain NULs; clients must use the length.
       string *s = get<string *>(i);
       string_typ st = { s->c_str(), s->length() };
       return st;
@@ -210,6 +261,57 @@ public:
     else
       return ImpDatum::toString();
   }
+
+  int_typ arraySize() {
+    if (t->kind == types::ty_array)
+      return static_cast<int_typ>(get<vm::array *>(i)->size());
+    else
+      return ImpDatum::arraySize();
+  }
+
+  void toDoubles(double *buf, int_typ n, int_typ dim) {
+    if (t->kind != types::ty_array) {
+      ImpDatum::toDoubles(buf, n, dim);
+      return;
+    }
+
+    types::ty *celltype = static_cast<types::array *>(t)->celltype;
+    vm::array *a = get<vm::array *>(i);
+    if (n != static_cast<int_typ>(a->size())) {
+      datumError("array size mismatch");
+      return;
+    }
+
+    if (dim == 1 && celltype->kind == types::ty_real) {
+      for (size_t j = 0; j < (size_t) n; ++j)
+        buf[j] = vm::read<double>(a, j);
+    }
+    else if (dim == 2 && celltype->kind == types::ty_pair) {
+      for (size_t j = 0; j < (size_t) n; ++j) {
+        camp::pair z = vm::read<camp::pair>(a, j);
+        buf[2*j] = z.getx();
+        buf[2*j+1] = z.gety();
+      }
+    }
+    else if (dim == 3 && celltype->kind == types::ty_triple) {
+      for (size_t j = 0; j < (size_t) n; ++j) {
+        camp::triple v = vm::read<camp::triple>(a, j);
+        buf[3*j] = v.getx();
+        buf[3*j+1] = v.gety();
+        buf[3*j+2] = v.getz();
+      }
+    }
+    else
+      ImpDatum::toDoubles(buf, n, dim);
+  }
+
+  vm::array *toArray(types::ty *&celltype) {
+    if (t->kind != types::ty_array)
+      return ImpDatum::toArray(celltype);
+
+    celltype = static_cast<types::array *>(t)->celltype;
+    return get<vm::array *>(i);
+  }
 };
 
 ItemDatum *ItemDatumFromExp(types::ty *t, absyntax::exp *e)
@@ -239,11 +341,12 @@ ItemDatum *ItemDatumFromDouble(double x)
   return ItemDatumFromExp(types::primReal(), &re);
 }
 
+// The string is copied once, straight into the value, rather than into an
+// expression that is then translated and run.
 ItemDatum *ItemDatumFromString(string_typ x)
 {
-  mem::string s(x.buf, (size_t)x.length);
-  stringExp se(nullPos, s);
-  return ItemDatumFromExp(types::primString(), &se);
+  string *s = new(UseGC) string(x.buf, (size_t)x.length);
+  return new ItemDatum(types::primString(), item(s));
 }
 
 
@@ -325,6 +428,49 @@ double imp_doubleFromHandle(handle_typ handle)
 }
 
 
+// Builds a real[] (dim 1), pair[] (dim 2) or triple[] (dim 3) from n*dim
+// doubles in a single call.
+handle_typ imp_handleFromDoubles(const double *buf, int_typ n, int_typ dim)
+{
+  if (n < 0)
+    return wrap(datumError("invalid array size"));
+
+  vm::array *a = new vm::array((size_t) n);
+  types::ty *t;
+  switch (dim) {
+    case 1:
+      for (size_t j = 0; j < (size_t) n; ++j)
+        (*a)[j] = buf[j];
+      t = types::realArray();
+      break;
+    case 2:
+      for (size_t j = 0; j < (size_t) n; ++j)
+        (*a)[j] = camp::pair(buf[2*j], buf[2*j+1]);
+      t = types::pairArray();
+      break;
+    case 3:
+      for (size_t j = 0; j < (size_t) n; ++j)
+        (*a)[j] = camp::triple(buf[3*j], buf[3*j+1], buf[3*j+2]);
+      t = types::tripleArray();
+      break;
+    default:
+      return wrap(datumError("array dimension must be 1, 2, or 3"));
+  }
+
+  return wrap(new ItemDatum(t, a));
+}
+
+int_typ imp_arraySizeFromHandle(handle_typ handle)
+{
+  return unwrap(handle)->arraySize();
+}
+
+void imp_doublesFromHandle(handle_typ handle, double *buf, int_typ n,
+                           int_typ dim)
+{
+  unwrap(handle)->toDoubles(buf, n, dim);
+}
+
 handle_typ imp_handleFromString(string_typ x)
 {
   return wrap(ItemDatumFromString(x));
@@ -383,7 +529,7 @@ arguments_typ imp_newArguments()
 
 void imp_releaseArguments(arguments_typ args)
 {
-  // For now, do nothing.
+  delete unwrapArgs(args);
 }
 
 void imp_addArgument(arguments_typ args, const char *name, handle_typ handle,
@@ -421,6 +567,113 @@ handle_typ imp_call(handle_typ callee, arguments_typ args)
   return wrap(callDatum(unwrap(callee), unwrapArgs(args)));
 }
 
+// Loads the j-th row of the columns into the argument datums before the j-th
+// run, and stores the result, if any, afterwards.
+class batchRows : public repetition {
+  mem::vector<vm::array *> &columns;
+  mem::vector<ItemDatum *> &slots;
+  ItemDatum *result;
+  vm::array *results;
+public:
+  batchRows(mem::vector<vm::array *> &columns, mem::vector<ItemDatum *> &slots,
+            ItemDatum *result=0, vm::array *results=0)
+    : columns(columns), slots(slots), result(result), results(results) {}
+
+  void before(size_t j) {
+    for (size_t k = 0; k < slots.size(); ++k)
+      slots[k]->setItem((*columns[k])[j]);
+  }
+
+  void after(size_t j) {
+    if (results)
+      (*results)[j] = result->getItem();
+  }
+};
+
+// Reports that row j, counting from 0, of a batch call failed.
+ImpDatum *batchFailed(size_t j)
+{
+  std::ostringstream buf;
+  buf << "batch call failed at row " << j;
+  return datumError(buf.str().c_str());
+}
+
+// Calls callee once for each row of the arrays, passing the j-th cell of
+// each array as the arguments of the j-th call, and returns the results as an
+// array, or 0 if the function returns void.  The call is translated once, and
+// each row only updates the argument datums, so that sampling a function at
+// many points crosses the interface once.  Stops at the first failing row.
+ImpDatum *callBatchDatum(ImpDatum *callee, ImpDatum **arrays, int_typ numArrays)
+{
+  coenv &e = coenvInOngoingProcess();
+
+  mem::vector<vm::array *> columns;
+  mem::vector<ItemDatum *> slots;
+  ImpArguments args;
+  size_t n = 0;
+  for (int_typ k = 0; k < numArrays; ++k) {
+    types::ty *celltype = 0;
+    vm::array *a = arrays[k]->toArray(celltype);
+    if (a == 0)
+      return datumError("batch arguments must be arrays");
+    if (k == 0)
+      n = a->size();
+    else if (a->size() != n)
+      return datumError("batch arguments must have the same length");
+
+    ItemDatum *slot = new ItemDatum(celltype);
+    columns.push_back(a);
+    slots.push_back(slot);
+    args.add("", slot, NORMAL_ARG);
+  }
+
+  callExp callex(nullPos, callee->getExp(), args.getArgs());
+
+  types::ty *t = callex.getType(e);
+  if (t->isError()) {
+    // Run for errors.
+    runExp(&callex); em.sync();
+    return datumError("invalid call");
+  }
+
+  assert(t->isNotOverloaded()); // Calls are never overloaded.
+
+  if (t->kind == types::ty_void) {
+    batchRows rows(columns, slots);
+    expStm s(nullPos, &callex);
+    size_t done = runRepeatedlyInOngoingProcess(&s, n, rows);
+    if (done != n)
+      return batchFailed(done);
+    return 0;
+  }
+
+  ItemDatum *result = new ItemDatum(t);
+  assignExp ae(nullPos, result->getExp(), &callex);
+
+  vm::array *results = new vm::array(n);
+  batchRows rows(columns, slots, result, results);
+  expStm s(nullPos, &ae);
+  size_t done = runRepeatedlyInOngoingProcess(&s, n, rows);
+  if (done != n)
+    return batchFailed(done);
+
+  return new ItemDatum(new types::array(t), results);
+}
+
+handle_typ imp_callBatch(handle_typ callee, handle_typ *arrays,
+                         int_typ numArrays)
+{
+  if (numArrays < 0)
+    return wrap(datumError("invalid number of arrays"));
+
+  mem::vector<ImpDatum *> datums;
+  for (int_typ k = 0; k < numArrays; ++k)
+    datums.push_back(unwrap(arrays[k]));
+
+  return wrap(callBatchDatum(unwrap(callee), datums.empty() ? 0 : &datums[0],
+                             numArrays));
+}
+
 class GlobalsDatum : public ImpDatum {
   typedef std::map<const char*, ImpDatum *> gmap;
   gmap base;
@@ -561,7 +814,7 @@ void imp_setErrorCallback(error_callback_typ callback)
 extern policy_typ imp_policy;
 policy_typ imp_policy =
 {
-  /* version = */ 101,
+  /* version = */ 104,
   imp_copyHandle,
   imp_releaseHandle,
   imp_handleFromInt,
@@ -585,6 +838,11 @@ policy_typ imp_policy =
   imp_getParam,
   imp_setReturnValue,
   imp_setErrorCallback,
+  imp_handleFromDoubles,
+  imp_arraySizeFromHandle,
+  imp_doublesFromHandle,
+  imp_callBatch,
+  imp_liveHandles,
 };
 
 // Defined in process.cc
@@ -34,7 +34,7 @@ typedef struct {
   int_typ version;
 
   handle_typ (*copyHandle)(handle_typ handle);
-  void (*releaseHandle)();
+  void (*releaseHandle)(handle_typ handle);
 
   handle_typ (*handleFromInt)(int_typ x);
   // For bool, O is false, 1 is true, and no other value is allowed.
@@ -47,8 +47,9 @@ typedef struct {
   int_typ (*IntFromHandle)(handle_typ handle);
   int_typ (*boolFromHandle)(handle_typ handle);
   double (*doubleFromHandle)(handle_typ handle);
-  // TODO: Note that a pointer and length are returned, but the pointer is
-  // valid for a limited time only.
+  // Note that a pointer and length are returned.  The string is not
+  // NUL-terminated, and the pointer is valid for as long as the handle is
+  // held.
   string_typ (*stringFromHandle)(handle_typ handle);
 
 #if 0
@@ -78,6 +79,24 @@ typedef struct {
 
   // Allows the user sets an error callback, which is called on any error.
   void (*setErrorCallback)(error_callback_typ callback);
+
+  // Added in version 102.
+  // Bulk conversion between n*dim doubles and real[] (dim 1), pair[] (dim 2)
+  // or triple[] (dim 3), so that large arrays cross in a single call.
+  handle_typ (*handleFromDoubles)(const double *buf, int_typ n, int_typ dim);
+  int_typ (*arraySizeFromHandle)(handle_typ handle);
+  void (*doublesFromHandle)(handle_typ handle, double *buf, int_typ n,
+                            int_typ dim);
+
+  // Added in version 103.
+  // Calls callee once per row of the numArrays arrays, which must have equal
+  // lengths, and returns the results as an array (or 0 for a void function).
+  handle_typ (*callBatch)(handle_typ callee, handle_typ *arrays,
+                          int_typ numArrays);
+
+  // Added in version 104.
+  // The number of distinct handles currently held, for leak accounting.
+  int_typ (*liveHandles)();
 } policy_typ;
 
 
@@ -989,6 +989,48 @@ public:
 
     em.clear();
   }
+
+  // Translate r once and run it n times, stopping at the first error.
+  // Returns the number of runs that completed.
+  size_t runRepeatedly(runnable *r, size_t n, repetition &rep)
+  {
+    assert(!em.errors());
+
+    size_t j=0;
+    bool scoped=false;
+    try {
+      withProcessData token(pe.pd());
+      e.e.beginScope();
+      scoped=true;
+      lambda *codelet=interactiveRunnable(r).transAsCodelet(e);
+      em.sync();
+      if(!em.errors()) {
+        if(getSetting<bool>("translate")) print(cout,codelet->code);
+        for(; j < n; ++j) {
+          rep.before(j);
+          s.run(codelet);
+          rep.after(j);
+        }
+      } else {
+        e.e.endScope(); // Remove any changes to the environment.
+        scoped=false;
+        em.statusError();
+      }
+    } catch(std::bad_alloc&) {
+      cerr << "out of memory" << endl;
+    } catch (quit) {
+      cerr << "quit exception" << endl;
+    } catch (handled_error) {
+      cerr << "handled error" << endl;
+    }
+
+    // Commits the changes made to the environment.
+    if(scoped)
+      e.e.collapseScope();
+
+    em.clear();
+    return j;
+  }
 };
 
 fullenv &getFullEnv()
@@ -1006,3 +1048,8 @@ void runInOngoingProcess(runnable *r)
 {
   getFullEnv().runRunnable(r);
 }
+
+size_t runRepeatedlyInOngoingProcess(runnable *r, size_t n, repetition &rep)
+{
+  return getFullEnv().runRepeatedly(r, n, rep);
+}
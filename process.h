@@ -41,6 +41,15 @@ void runCodeEmbedded(absyntax::block *code, trans::coenv &e, istack &s);
 void runStringEmbedded(const string& str, trans::coenv &e, istack &s);
 void runPromptEmbedded(trans::coenv &e, istack &s);
 
+// Hooks called around each run of a runnable that is translated once and
+// run several times.
+class repetition {
+public:
+  virtual ~repetition() {}
+  virtual void before(size_t j) {}
+  virtual void after(size_t j) {}
+};
+
 // Basic listing.
 void doUnrestrictedList();
 
@@ -1,36 +1,18 @@
 #!/usr/bin/env python3
 
+# Converts the asyprof.jsonl written by a profiling build of asy to the
+# kcachegrind format, aggregating the costs per function in a single pass
+# over the file.  Only the per-function totals are held in memory, never the
+# call tree.
+#
+# Usage: profile.py [asyprof.jsonl] > callgrind.out
+
 import sys
-from pprint import pprint
+import json
 
 # Unused line numbers required by kcachegrind.
 POS = '1'
 
-def nameFromNode(tree):
-    name = tree['name']
-    pos = tree['pos']
-    if pos.endswith(": "):
-        pos = pos[:-2]
-    return (name, pos)
-
-def addFuncNames(tree, s):
-    s.add(nameFromNode(tree))
-    for child in tree['children']:
-        addFuncNames(child, s)
-
-def funcNames(tree):
-    s = set()
-    addFuncNames(tree, s)
-    return s
-
-def computeTotals(tree):
-    for child in tree['children']:
-        computeTotals(child)
-    tree['instTotal'] = (tree['instructions']
-                     + sum(child['instTotal'] for child in tree['children']))
-    tree['nsecsTotal'] = (tree['nsecs']
-                     + sum(child['nsecsTotal'] for child in tree['children']))
-
 def printName(name, prefix=''):
     print (prefix+"fl=", name[1])
     print (prefix+"fn=", name[0])
@@ -41,58 +23,61 @@ class Arc:
         self.instTotal = 0
         self.nsecsTotal = 0
 
-    def add(self, tree):
-        self.calls += tree['calls']
-        self.instTotal += tree['instTotal']
-        self.nsecsTotal += tree['nsecsTotal']
+    def add(self, calls, instTotal, nsecsTotal):
+        self.calls += calls
+        self.instTotal += instTotal
+        self.nsecsTotal += nsecsTotal
 
 class Func:
-    def __init__(self):
+    def __init__(self, name, pos):
+        if pos.endswith(": "):
+            pos = pos[:-2]
+        self.name = (name, pos)
         self.instructions = 0
         self.nsecs = 0
         self.arcs = {}
 
-    def addChildTime(self, tree):
-        arc = self.arcs.setdefault(nameFromNode(tree), Arc())
-        arc.add(tree)
+    def addChildTime(self, child, calls, instTotal, nsecsTotal):
+        arc = self.arcs.setdefault(child, Arc())
+        arc.add(calls, instTotal, nsecsTotal)
 
-    def analyse(self, tree):
-        self.instructions += tree['instructions']
-        self.nsecs += tree['nsecs']
-        for child in tree['children']:
-            self.addChildTime(child)
-
-    def dump(self):
+    def dump(self, funcs):
         print (POS, self.instructions, self.nsecs)
-        for name in self.arcs:
-            printName(name, prefix='c')
-            arc = self.arcs[name]
+        for child in self.arcs:
+            printName(funcs[child].name, prefix='c')
+            arc = self.arcs[child]
             print ("calls="+str(arc.calls), POS)
             print (POS, arc.instTotal, arc.nsecsTotal)
         print ()
 
-def analyse(funcs, tree):
-    funcs[nameFromNode(tree)].analyse(tree)
-    for child in tree['children']:
-        analyse(funcs, child)
+def analyse(lines):
+    """Aggregate a stream of asyprof records into a dict of Funcs by id."""
+    funcs = {}
+    header = json.loads(next(lines))
+    if header.get('format') != 'asyprof':
+        raise ValueError("not an asyprof profile")
+
+    for line in lines:
+        record = json.loads(line)
+        if type(record) is dict:
+            funcs[record['fn']] = Func(record['name'], record['pos'])
+            continue
+
+        fn, caller, calls, instructions, nsecs, instTotal, nsecsTotal = record
+        func = funcs[fn]
+        func.instructions += instructions
+        func.nsecs += nsecs
+        if caller:
+            funcs[caller].addChildTime(fn, calls, instTotal, nsecsTotal)
+    return funcs
 
 def dump(funcs):
     print ("events: Instructions Nanoseconds")
-    for name in funcs:
-        printName(name)
-        funcs[name].dump()
-
-rawdata = __import__("asyprof")
-profile = rawdata.profile
-
-computeTotals(profile)
-names = funcNames(profile)
-
-funcs = {}
-for name in names:
-    funcs[name] = Func()
-
-analyse(funcs, profile)
-dump(funcs)
-
-#pprint(names)
+    for fn in funcs:
+        printName(funcs[fn].name)
+        funcs[fn].dump(funcs)
+
+if __name__ == "__main__":
+    filename = sys.argv[1] if len(sys.argv) > 1 else "asyprof.jsonl"
+    with open(filename) as f:
+        dump(analyse(iter(f)))
@@ -11,6 +11,7 @@
 #include <sys/time.h>
 
 #include <iostream>
+#include <sstream>
 
 #include "inst.h"
 
@@ -67,6 +68,22 @@ inline void printNameFromBltin(ostream& out, bltin b) {
   out << "(builtin at " << (void *)b << ")";
 }
 
+// Writes s as a JSON string literal.
+inline void printJSONString(ostream& out, const string& s) {
+  static const char hex[] = "0123456789abcdef";
+  out << '"';
+  for (size_t i = 0; i < s.size(); ++i) {
+    unsigned char c = s[i];
+    if (c == '"' || c == '\\')
+      out << '\\' << c;
+    else if (c < 0x20)
+      out << "\\u00" << hex[c >> 4] << hex[c & 0xf];
+    else
+      out << c;
+  }
+  out << '"';
+}
+
 class profiler : public gc {
   // To do call graph analysis, each call stack that occurs in practice is
   // represented by a node.  For instance, if f and g are functions, then
@@ -151,32 +168,6 @@ class profiler : public gc {
         nsecsTotal += children[i].nsecsTotal;
       }
     }
-
-
-
-    void pydump(ostream& out) {
-#ifdef DEBUG_FRAME
-      string name = func ? func->name : "<top level>";
-#else
-      string name = "";
-#endif
-
-      out << "dict(\n"
-           << "    name = '" << name << " " << func << "',\n"
-           << "    pos = '" << positionFromLambda(func) << "',\n"
-           << "    calls = " << calls << ",\n"
-           << "    instructions = " << instructions << ",\n"
-           << "    nsecs = " << nsecs << ",\n"
-           << "    children = [\n";
-
-      size_t n = children.size();
-      for (size_t i = 0; i < n; ++i) {
-        children[i].pydump(out);
-        out << ",\n";
-      }
-
-      out << "    ])\n";
-    }
   };
 
   // An empty call stack.
@@ -309,6 +300,58 @@ class profiler : public gc {
     return nsecs;
   }
 
+  // Ids of the functions written by jsondump, each of which is described
+  // once, the first time it occurs.  Zero means not yet written.
+  mem::map<lambda *, size_t> funcIds;
+  mem::map<bltin, size_t> cfuncIds;
+  size_t lastId;
+
+  size_t functionId(ostream& out, node& n) {
+    size_t& id = n.cfunc ? cfuncIds[n.cfunc] : funcIds[n.func];
+    if (id != 0)
+      return id;
+    id = ++lastId;
+
+    ostringstream name, pos;
+    if (n.cfunc) {
+      printNameFromBltin(name, n.cfunc);
+      pos << "C++ code";
+    }
+    else {
+#ifdef DEBUG_FRAME
+      string fname = n.func ? n.func->name : "<top level>";
+#else
+      string fname = n.func ? "" : "<top level>";
+#endif
+      // If unnamed, use the pointer address.
+      if (fname.empty())
+        name << n.func;
+      else
+        name << fname;
+      pos << positionFromLambda(n.func);
+    }
+
+    out << "{\"fn\":" << id << ",\"name\":";
+    printJSONString(out, name.str());
+    out << ",\"pos\":";
+    printJSONString(out, pos.str());
+    out << "}\n";
+    return id;
+  }
+
+  // Writes one line per call stack, before those of the call stacks it
+  // leads to, so that the output can be read in a single pass.
+  void jsondumpNode(ostream& out, node& n, size_t parent) {
+    size_t id = functionId(out, n);
+    out << "[" << id << "," << parent << "," << n.calls << ","
+        << n.instructions << "," << n.nsecs << ","
+        << n.instTotal << "," << n.nsecsTotal << "]\n";
+
+    size_t numChildren = n.children.size();
+    for (size_t i = 0; i < numChildren; ++i)
+      jsondumpNode(out, n.children[i], id);
+  }
+
   // Called whenever the stack is about to change, in order to record the time
   // duration for the current node.
   void recordTime() {
@@ -326,8 +369,15 @@ public:
 
   // TODO: Add position, type of instruction info to profiling.
 
-  // Dump all of the data out in a format that can be read into Python.
-  void pydump(ostream &out);
+  // Dump all of the data as a stream of JSON lines, read by profile.py.
+  //
+  // The first line is a header.  Each function is described by an object
+  //   {"fn": id, "name": name, "pos": position}
+  // before the first call stack in which it occurs, and each call stack is an
+  // array
+  //   [fn, caller fn, calls, instructions, nsecs, instTotal, nsecsTotal]
+  // where caller fn is 0 for the top level.
+  void jsondump(ostream &out);
 
   // Dump all of the data in a format for kcachegrind.
   void dump(ostream& out);
@@ -335,7 +385,7 @@ public:
 };
 
 inline profiler::profiler()
-  : emptynode()
+  : emptynode(), lastId(0)
 {
     callstack.push(&emptynode);
     startLap();
@@ -386,9 +436,16 @@ inline void profiler::recordInstruction() {
   ++topnode().instructions;
 }
 
-inline void profiler::pydump(ostream& out) {
-  out << "profile = ";
-  emptynode.pydump(out);
+inline void profiler::jsondump(ostream& out) {
+  emptynode.computeTotals();
+
+  out << "{\"format\":\"asyprof\",\"version\":1,"
+      << "\"events\":[\"Instructions\",\"Nanoseconds\"]}\n";
+
+  funcIds.clear();
+  cfuncIds.clear();
+  lastId = 0;
+  jsondumpNode(out, emptynode, 0);
 }
 
 inline void profiler::dump(ostream& out) {
@@ -1324,6 +1324,8 @@ void initSettings() {
                             "Input code over multiple lines at the prompt"));
   addOption(new boolSetting("xasy", 0,
                             "Special interactive mode for xasy"));
+  addOption(new boolSetting("xasyframes", 0,
+                            "Send deconstructed xasy fragments inline as binary frames"));
 
   addOption(new boolSetting("wait", 0,
                             "Wait for child processes to finish before exiting"));
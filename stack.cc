@@ -168,6 +168,10 @@ void dumpProfile() {
   std::ofstream out("asyprof");
   if (!out.fail())
     prof.dump(out);
+
+  std::ofstream jsonout("asyprof.jsonl");
+  if (!jsonout.fail())
+    prof.jsondump(jsonout);
 }
 #endif
 
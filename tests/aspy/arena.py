@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# Lookups that aspy's State caches must outlive the arena they are first made
+# in.  Needs asymptote.so on LD_LIBRARY_PATH (see aspy.py).
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import aspy
+
+with aspy.Arena():
+    assert int(aspy.Datum(1) + aspy.Datum(2)) == 3
+
+assert aspy.state.globals().handle != 0
+assert aspy.state.getOperator("+").handle != 0
+assert int(aspy.Datum(1) + aspy.Datum(2)) == 3
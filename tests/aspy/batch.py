@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# callBatch must call a function once per row, stop at the first row that
+# fails and name it.  Needs asymptote.so on LD_LIBRARY_PATH and numpy.
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import numpy as np
+import aspy
+
+g = aspy.state.globals()
+g.eval("real[] seen; real inv(real x) { seen.push(x); return 1/x; }", embedded=True)
+g.eval("int calls; void count(real x, real y) { ++calls; }", embedded=True)
+
+xs = np.array([1.0, 2.0, 4.0, 8.0])
+assert np.array_equal(g.inv.callBatch(xs).toArray(), 1 / xs)
+assert np.array_equal(g.seen.toArray(), xs)
+assert np.allclose(g.atan2.map(np.column_stack((xs, xs[::-1]))).toArray(), np.arctan2(xs, xs[::-1]))
+
+assert g.count.callBatch(xs, xs) is None
+assert int(g.calls) == len(xs)
+
+g.eval("seen.delete();", embedded=True)
+try:
+    g.inv.callBatch(np.array([1.0, 2.0, 0.0, 4.0, 5.0]))
+except aspy.AsyException as e:
+    assert 'row 2' in str(e), str(e)
+else:
+    raise AssertionError('the batch should have failed')
+# the rows after the failing one were not run.
+assert np.array_equal(g.seen.toArray(), [1.0, 2.0, 0.0])
+assert float(g.inv(aspy.Datum(4.0))) == 0.25
+
+for columns in ((xs, xs[:2]), ()):
+    try:
+        g.count.callBatch(*columns)
+    except aspy.AsyException:
+        pass
+    else:
+        raise AssertionError('%d columns should be rejected' % len(columns))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# A buffer of a string Datum must stay readable after the Datum is released,
+# directly or by its arena; the handle is released once the view is gone.
+# Needs asymptote.so on LD_LIBRARY_PATH (see aspy.py).
+
+import gc
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import aspy
+
+payload = b'fragment \x00 data' * 64
+
+aspy.loadPlain()
+handles = aspy.counters()['handles']
+
+with aspy.Arena():
+    d = aspy.Datum(payload)
+    view = d.buffer()
+    assert bytes(view) == payload
+del d
+
+# The arena has exited, but the view still holds the handle.
+gc.collect()
+assert aspy.counters()['handles'] == handles + 1
+assert bytes(view) == payload
+
+del view
+gc.collect()
+assert aspy.counters()['handles'] == handles
+
+d = aspy.Datum(payload)
+view = d.buffer()
+d.release()
+assert d.handle != 0
+assert bytes(view) == payload
+del view
+gc.collect()
+assert d.handle == 0
+assert aspy.counters()['handles'] == handles
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# NumPy arrays must convert to real[], pair[] and triple[] and back in bulk
+# without changing a value.  Needs asymptote.so on LD_LIBRARY_PATH and numpy.
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import numpy as np
+import aspy
+
+rng = np.random.default_rng(1)
+g = aspy.state.globals()
+g.eval("real sumx(pair[] z) { return sum(map(xpart, z)); }", embedded=True)
+g.eval("real sumz(triple[] v) { real s; for(triple t : v) s += t.z; return s; }", embedded=True)
+
+reals = np.concatenate((rng.normal(size=1000), [0.0, -0.0, 1e-308, 1e308, np.pi]))
+d = aspy.Datum(reals)
+back = d.toArray()
+assert back.dtype == np.float64 and back.shape == reals.shape
+assert np.array_equal(back, reals) and np.signbit(back[-4])
+assert int(d.length) == len(reals)
+assert float(g.sum(d)) == float(g.sum(aspy.Datum(back)))
+
+pairs = rng.normal(size=(500, 2))
+d = aspy.Datum(pairs)
+assert np.array_equal(d.toArray(2), pairs)
+assert np.array_equal(d.toComplexArray(), pairs[:, 0] + 1j * pairs[:, 1])
+assert abs(float(g.sumx(d)) - pairs[:, 0].sum()) < 1e-9
+
+complexes = rng.normal(size=300) + 1j * rng.normal(size=300)
+assert np.array_equal(aspy.Datum(complexes).toComplexArray(), complexes)
+
+triples = rng.normal(size=(200, 3))
+d = aspy.Datum(triples)
+assert np.array_equal(d.toArray(3), triples)
+assert abs(float(g.sumz(d)) - triples[:, 2].sum()) < 1e-9
+
+# strided, integer and empty inputs are converted first.
+assert np.array_equal(aspy.Datum(pairs[::3, ::-1]).toArray(2), pairs[::3, ::-1])
+assert np.array_equal(aspy.Datum(np.arange(10)).toArray(), np.arange(10, dtype=float))
+assert aspy.Datum(np.empty(0)).toArray().shape == (0,)
+assert aspy.Datum(np.empty((0, 3))).toArray(3).shape == (0, 3)
+
+for shape in ((2, 4), (2, 2, 2)):
+    try:
+        aspy.Datum(np.zeros(shape))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('shape %s should be rejected' % (shape,))
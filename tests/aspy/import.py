@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# Importing aspy must not load asymptote.so or numpy, and must stay within a
+# small time budget; the library is loaded on first use.  The budget, in
+# seconds, can be set with ASPY_IMPORT_BUDGET.  Needs asymptote.so on
+# LD_LIBRARY_PATH (see aspy.py).
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+
+def libraryMapped():
+    try:
+        with open('/proc/self/maps') as maps:
+            return 'asymptote.so' in maps.read()
+    except OSError:
+        return False
+
+
+budget = float(os.environ.get('ASPY_IMPORT_BUDGET', '0.2'))
+mappedBefore = libraryMapped()
+
+import aspy
+
+assert not aspy.policy.loaded()
+assert 'numpy' not in sys.modules
+assert libraryMapped() == mappedBefore
+assert 'init' not in aspy.timings and 'plain' not in aspy.timings
+assert aspy.timings['import'] < budget, \
+    'importing aspy took %.3fs, over the budget of %.3fs' % (aspy.timings['import'], budget)
+
+assert int(aspy.Datum(2) * aspy.Datum(3)) == 6
+assert aspy.policy.loaded()
+assert 'init' in aspy.timings
+assert sys.platform != 'linux' or libraryMapped()
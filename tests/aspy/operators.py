@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# Operators on Datums must raise AsyException when asy reports an error, and
+# leave nothing behind for the next operation.  Needs asymptote.so on
+# LD_LIBRARY_PATH (see aspy.py).
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import aspy
+
+
+def fails(f):
+    try:
+        f()
+    except aspy.AsyException:
+        return True
+    return False
+
+
+one, two = aspy.Datum(1), aspy.Datum(2)
+assert int(one + two) == 3 and int(two - one) == 1 and int(two * two) == 4
+assert float(one / two) == 0.5 and int(two ** two) == 4 and int(-two) == -2
+
+assert fails(lambda: one + aspy.Datum("text"))
+handles = aspy.counters()['handles']
+for i in range(10):
+    assert fails(lambda: one + aspy.Datum("text"))
+    assert fails(lambda: aspy.Datum("text") * two)
+    assert int(one + two) == 3
+assert aspy.counters()['handles'] == handles
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# asyDaemon must run jobs back to back without one seeing another's state,
+# report a job that fails midway and carry on, and ship out each job's
+# picture; asyPool and serve must do the same across interpreters.
+# Runs asy from the top of the tree; set ASY to use another command.
+
+import io
+import json
+import os
+import shlex
+import sys
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(root, 'base'))
+import asymptote
+
+asy = shlex.split(os.environ.get('ASY', '')) or [os.path.join(root, 'asy'), '-dir', os.path.join(root, 'base')]
+
+with asymptote.asyDaemon(asy[0], asy[1:]) as d:
+    r = d.run('int x=3; currentpen=red+linewidth(2); size(100); draw(unitcircle); write(x);')
+    assert r.ok and r.messages == '3\n', r
+
+    # pipelined: both are sent before either is received.
+    first = d.submit('write(currentpen);')
+    second = d.submit('write(currentpicture.nodes.length);')
+    r = d.receive()
+    assert r.id == first and r.ok and r.messages == '(default)\n', r
+    r = d.receive()
+    assert r.id == second and r.ok and r.messages == '0\n', r
+
+    r = d.run('write(x);')
+    assert not r.ok and 'x' in r.messages, r
+
+    r = d.run('write("before"); abort("midway"); write("after");')
+    assert not r.ok and 'before' in r.messages and 'midway' in r.messages and 'after' not in r.messages, r
+    r = d.run('write("next");')
+    assert r.ok and r.messages == 'next\n', r
+
+    r = d.run('draw(unitsquare);', output='square', format='eps', id='a/b')
+    assert r.ok and r.id == 'a/b' and len(r.outputs) == 1, r
+    assert r.outputs[0].endswith('square.eps') and os.path.getsize(r.outputs[0]) > 0
+    r = d.run('draw(unitcircle); write(undefinedVariable);', output='square', format='eps')
+    assert not r.ok and r.outputs == [], r
+    r = d.run('write(currentpicture.nodes.length);')
+    assert r.ok and r.messages == '0\n', r
+
+with asymptote.asyPool(2, asy[0], asy[1:]) as pool:
+    futures = [pool.submit('int n={0}; write(n);'.format(i), id=i) for i in range(8)]
+    futures.append(pool.submit('write(n);', id='unset'))
+    results = [f.result() for f in futures]
+    for i, r in enumerate(results[:-1]):
+        assert r.id == i and r.ok and r.messages == '{0}\n'.format(i), r
+    assert not results[-1].ok
+
+jobs = [{'id': 1, 'code': 'write(1);'}, {'id': 2, 'code': 'write(1/0);'},
+        {'id': 3, 'code': 'draw(unitcircle);', 'output': 'circle', 'format': 'eps'}]
+out = io.StringIO()
+asymptote.serve(2, io.StringIO(''.join(json.dumps(job) + '\n' for job in jobs)), out, asy[0], asy[1:])
+replies = {reply['id']: reply for reply in map(json.loads, out.getvalue().splitlines())}
+assert replies[1]['ok'] and replies[1]['messages'] == '1\n', replies
+assert not replies[2]['ok'], replies
+assert replies[3]['ok'] and replies[3]['outputs'][0].endswith('circle.eps'), replies
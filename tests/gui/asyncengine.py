@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# AsyncAsymptoteEngine must answer concurrent requests in order, report failed
+# ones, survive cancelled and stray replies, and fail pending requests when asy
+# exits. Runs asy from the top of the tree; set ASY to use another command.
+
+import asyncio
+import os
+import shlex
+import sys
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(root, 'GUI'))
+import xasyAsync as xa
+
+asy = shlex.split(os.environ.get('ASY', '')) or [os.path.join(root, 'asy'), '-dir', os.path.join(root, 'base')]
+
+
+async def fails(request, exception):
+    try:
+        await request
+    except exception:
+        return True
+    return False
+
+
+async def engine():
+    async with xa.AsyncAsymptoteEngine(asy[0], asy[1:], maxPending=4) as e:
+        assert await e.request('write(1+2);') == ['3\n']
+
+        # more requests than slots: they wait, and are answered in order.
+        replies = await asyncio.gather(*(e.request('write({0});'.format(i)) for i in range(20)))
+        assert replies == [['{0}\n'.format(i)] for i in range(20)]
+
+        try:
+            await e.request('write(undefinedVariable);')
+        except xa.AsyRequestError as error:
+            assert 'undefinedVariable' in str(error) or error.messages
+        else:
+            raise AssertionError('the request should have failed')
+        assert await e.request('write("after");') == ['after\n']
+
+        # a cancelled request's reply is dropped.
+        slow = asyncio.ensure_future(e.request('for(int i=0; i < 100000; ++i) {} write("slow");'))
+        await asyncio.sleep(0)
+        slow.cancel()
+        assert await e.request('write("next");') == ['next\n']
+
+        # a request that writes the frame marker itself gets its reply early;
+        # the genuine one, which no request waits for, is discarded.
+        assert await e.request("write(_outpipe,'\\004true',endl); flush(_outpipe);") == []
+        await asyncio.sleep(0.5)
+        assert await e.request('write("still framed");') == ['still framed\n']
+
+        # asy dies with requests in flight: they fail, and their slots return.
+        pending = [asyncio.ensure_future(e.request('for(int i=0; i < 100000000; ++i) {{}} write({0});'.format(i)))
+                   for i in range(3)]
+        await asyncio.sleep(0.5)
+        e.asyProcess.kill()
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        assert all(isinstance(r, EOFError) for r in results), results
+        assert e.slots._value == 4
+        assert await fails(e.request('write(1);'), EOFError)
+
+
+async def pool():
+    async with xa.AsyncAsymptoteEnginePool(size=2, path=asy[0], args=asy[1:]) as p:
+        replies = await asyncio.gather(*(p.request('write({0});'.format(i)) for i in range(8)))
+        assert replies == [['{0}\n'.format(i)] for i in range(8)]
+
+
+asyncio.run(engine())
+asyncio.run(pool())
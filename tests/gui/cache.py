@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# xasyCache must return stored deconstructions intact, evict the least
+# recently used files beyond its size limit, and key deconstructions on the
+# local files they import.
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GUI'))
+import xasyCache as xc
+
+directory = tempfile.mkdtemp(prefix='xasyCacheTest_')
+try:
+    cache = xc.FragmentCache(os.path.join(directory, 'cache'), 2 ** 20, 'test')
+    circle, square = b'<svg>circle</svg>' * 40, b'<svg>square</svg>' * 40
+    fragments = [(circle, 'svg', (0, -10, 10, 0), 'x1', 0, False, False),
+                 (square, 'svg', (1, -2, 3, 4), 'x2', 0, True, True),
+                 (circle, 'svg', (5, -5, 6, 6), 'x2', 1, False, True)]
+    transform = (0, 0, 1, 0, 0, -1)
+
+    # store and load round trip, each image stored once.
+    cache.store('round', fragments, transform).result()
+    manifest = cache.load('round')
+    assert manifest['asy2psmap'] == list(transform)
+    assert [(cache.loadFragment(f), f['format'], tuple(f['bbox']), f['key'], f['localCount'], f['clip'], f['userKey'])
+            for f in manifest['fragments']] == fragments
+    assert len(os.listdir(cache.blobDir)) == 2
+    assert cache.load('missing') is None
+
+    # a manifest whose images were evicted is not returned.
+    os.remove(cache.blobPath(manifest['fragments'][1]['blob'], 'svg'))
+    assert cache.load('round') is None
+
+    # eviction: the limit holds one deconstruction, and the older one goes.
+    cache.clear()
+    assert cache.load('round') is None
+    cache.maxSize = 1500
+    cache.store('old', [(circle, 'svg', (0, 0, 1, 1), 'x1', 0, False, False)], transform).result()
+    for name in os.listdir(cache.manifestDir) + os.listdir(cache.blobDir):
+        path = os.path.join(cache.manifestDir if name.endswith('.json') else cache.blobDir, name)
+        os.utime(path, (1, 1))
+    cache.store('new', [(square, 'svg', (0, 0, 1, 1), 'x1', 0, False, False)], transform).result()
+    assert cache.load('old') is None
+    assert cache.loadFragment(cache.load('new')['fragments'][0]) == square
+
+    # loading refreshes a deconstruction, so the other one is evicted next.
+    cache.maxSize = 3000
+    cache.store('old', [(circle, 'svg', (0, 0, 1, 1), 'x1', 0, False, False)], transform).result()
+    for name in os.listdir(cache.manifestDir) + os.listdir(cache.blobDir):
+        path = os.path.join(cache.manifestDir if name.endswith('.json') else cache.blobDir, name)
+        os.utime(path, (1, 1))
+    assert cache.load('new') is not None
+    cache.maxSize = 1500
+    cache.evict()
+    assert cache.load('old') is None and cache.load('new') is not None
+
+    # the key follows the local modules the code imports, directly or not.
+    modules = os.path.join(directory, 'modules')
+    os.mkdir(modules)
+    with open(os.path.join(modules, 'shapes.asy'), 'w') as f:
+        f.write('import "parts.asy";\npath shape=unitcircle;\n')
+    with open(os.path.join(modules, 'parts.asy'), 'w') as f:
+        f.write('real part=1;\n')
+    code = 'import shapes;\ndraw(shape);\n'
+
+    cwd = os.getcwd()
+    os.chdir(modules)
+    try:
+        key = cache.deconstructionKey(code, 'size(100);', 'svg')
+        assert key == cache.deconstructionKey(code, 'size(100);', 'svg')
+        assert key != cache.deconstructionKey(code, 'size(200);', 'svg')
+        assert key != xc.FragmentCache(os.path.join(directory, 'other'), 2 ** 20, 'other').deconstructionKey(
+            code, 'size(100);', 'svg')
+
+        stat = os.stat('parts.asy')
+        with open('parts.asy', 'w') as f:
+            f.write('real part=2;\n')
+        os.utime('parts.asy', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        changed = cache.deconstructionKey(code, 'size(100);', 'svg')
+        assert changed != key
+
+        with open('shapes.asy', 'a') as f:
+            f.write('path other=unitsquare;\n')
+        assert cache.deconstructionKey(code, 'size(100);', 'svg') != changed
+        # modules that are not local, like plain's, do not contribute.
+        assert xc.dependencyStamp('import graph;\nimport "missing.asy";\n', [modules]) == ''
+    finally:
+        os.chdir(cwd)
+    cache.writer.shutdown()
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# xasyColors must evaluate sums of pens in different colorspaces as asy does,
+# and ask the interpreter for the pens it cannot evaluate.
+# Runs asy from the top of the tree; set ASY to use another command.
+
+import os
+import shlex
+import sys
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(root, 'GUI'))
+import xasy2asy as x2a
+import xasyColors as xc
+
+asy = shlex.split(os.environ.get('ASY', '')) or [os.path.join(root, 'asy'), '-dir', os.path.join(root, 'base')]
+
+
+def close(c, d):
+    # the interpreter writes the components with six significant digits.
+    return all(abs(a - b) < 1e-6 for a, b in zip(c, d))
+
+
+mixed = ['red+Cyan', 'mediumgray+red', 'Cyan+mediumgray', 'gray+rgb(0.2,0.4,0.6)',
+         'Magenta+blue+0.5', 'dashed+heavygreen+Yellow', 'cmyk(0.5,0,0,0.5)+white',
+         'rgb(2,1,0)+gray(0.25)', 'orange+purple+linewidth(3)']
+
+engine = x2a.AsymptoteEngine(asy[0])
+engine.args += asy[1:]
+with engine:
+    expected = xc.PenColorResolver.queryEngine(mixed, engine)
+    for code, color in zip(mixed, expected):
+        local = xc.evaluatePenColor(code)
+        assert local is not None, code
+        assert close(local, color), (code, local, color)
+
+    # a colorless pen cannot be evaluated locally, so the engine is asked.
+    assert xc.evaluatePenColor('linewidth(2)') is None
+    assert xc.evaluatePenColor('fontsize(12)+dashed') is None
+    assert xc.evaluatePenColor('red+somePen') is None
+    resolver = xc.PenColorResolver()
+    colors = resolver.resolveAll(['linewidth(2)', 'red+Cyan'], engine)
+    assert close(colors[0], xc.PenColorResolver.queryEngine(['linewidth(2)'], engine)[0])
+    assert close(colors[1], expected[0])
+
+# both are memoized now, so no engine is needed.
+assert resolver.resolveAll(['linewidth(2)', 'red+Cyan'], None) == colors
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# GuideSolver must agree with the control points asy computes for the same
+# guide, and must refuse the guides it does not handle.
+# Runs asy from the top of the tree; set ASY to use another command.
+
+import os
+import shlex
+import subprocess
+import sys
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, os.path.join(root, 'GUI'))
+import GuideSolver as gs
+
+asy = shlex.split(os.environ.get('ASY', '')) or [os.path.join(root, 'asy'), '-dir', os.path.join(root, 'base')]
+
+
+def guideCode(nodes, joins):
+    code = ''
+    for i, node in enumerate(nodes):
+        if i > 0:
+            join = joins[i - 1]
+            if not isinstance(join, str):
+                join = '..controls ({0},{1}) and ({2},{3})..'.format(
+                    join[0].real, join[0].imag, join[1].real, join[1].imag)
+            code += join
+        code += node if node == 'cycle' else '({0},{1})'.format(node.real, node.imag)
+    return code
+
+
+def engineControls(nodes, joins):
+    code = ('path p={0};'
+            'for(int i=0; i < length(p); ++i) {{'
+            'pair z=point(p,i), a=postcontrol(p,i), b=precontrol(p,i+1);'
+            'write(z.x,z.y,a.x,a.y,b.x,b.y);}}').format(guideCode(nodes, joins))
+    out = subprocess.run(asy + ['-c', code], stdout=subprocess.PIPE, check=True,
+                         universal_newlines=True).stdout
+    points, controls = [], []
+    for line in out.splitlines():
+        x, y, ax, ay, bx, by = map(float, line.split())
+        points.append(complex(x, y))
+        controls.append((complex(ax, ay), complex(bx, by)))
+    return points, controls
+
+
+def close(z, w):
+    return abs(z - w) <= 1e-9 * max(1.0, abs(w))
+
+
+def check(nodes, joins):
+    points, controls, cyclic = gs.solveGuide(nodes, joins)
+    assert cyclic == (nodes[-1] == 'cycle')
+    enginePoints, engineControlPoints = engineControls(nodes, joins)
+    assert len(controls) == len(engineControlPoints), guideCode(nodes, joins)
+    for z, w in zip(points, enginePoints):
+        assert close(z, w), (guideCode(nodes, joins), z, w)
+    for pair, enginePair in zip(controls, engineControlPoints):
+        for c, e in zip(pair, enginePair):
+            assert close(c, e), (guideCode(nodes, joins), c, e)
+
+
+check([0, 1+2j, 3+1j], ['..', '..'])
+check([0, 1+2j, 3+1j, 2-1j], ['..', '..', '..'])
+check([0, 1+2j, 3+1j, 'cycle'], ['..', '..', '..'])
+check([0, 1+1j, 2, 'cycle'], ['--', '..', '..'])
+check([0, 1+1j, 3, 4+2j], ['..', '--', '..'])
+check([0, 1+2j, 3+1j], ['{up}..', '..{dir(30)}'])
+check([0, 1+2j, 3+1j, 'cycle'], ['..{(1,-1)}', '..', '{left}..'])
+check([0, 1+2j, 3+1j], ['{curl 0}..', '..{curl 2}'])
+check([0, 1+2j, 3+1j], ['.. tension 2 ..', '.. tension 1 and 3 ..'])
+check([0, 1+2j, 3+1j, 'cycle'], ['.. tension atleast 1.5 ..', '::', '..'])
+check([0, 1+2j, 3+1j], ['.. controls (0.5,1) and (1,1.5) ..', '..'])
+check([0, 1+2j, 3+1j], [(0.5+1j, 1+1.5j), '.. controls (2,3) ..'])
+
+for joins in (['---', '..'], ['^^', '..'], ['.. tension 0.5 ..', '..'], ['{foo}..', '..']):
+    try:
+        gs.solveGuide([0, 1+1j, 2], joins)
+    except gs.UnsupportedGuide:
+        pass
+    else:
+        raise AssertionError('{0} should be unsupported'.format(joins))
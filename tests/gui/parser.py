@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# xasyParser must read the replies asy writes, however they are spaced, and
+# reject truncated or non-numeric ones with ReplyParseError.
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GUI'))
+import xasyParser as xp
+
+
+def rejects(parse, *args):
+    try:
+        parse(*args)
+    except xp.ReplyParseError:
+        return True
+    return False
+
+
+assert xp.parseReal(' 2.5e-3\n') == 0.0025
+assert xp.parseInt(' -12 \n') == -12
+assert list(xp.parseReals('1 2.5\t-3\n')) == [1, 2.5, -3]
+assert xp.parsePair('(1,-2.5)') == (1, -2.5)
+assert xp.parsePair(' ( 1 , -2.5 )\n') == (1, -2.5)
+assert xp.parseTransform('(0,0,1,0,0,1)\n') == (0, 0, 1, 0, 0, 1)
+assert xp.parseTransform('(1.5, -2, 0.5,\n 1e-3, 0, 1)') == (1.5, -2, 0.5, 0.001, 0, 1)
+assert xp.parseColor('rgb', '1 0.5 0') == (1, 0.5, 0)
+assert xp.parseColor('gray', '0.5') == (0.5, 0.5, 0.5)
+assert xp.parseColor('cmyk', '1 0 0 0') == (0, 1, 1)
+
+# open and cyclic paths, written over several lines as asy does.
+nodes, controls, cyclic = xp.parsePath('(0,0).. controls (0,1) and (1,2)\n ..(2,2).. controls (3,2) and (4,1)\n ..(4,0)')
+assert not cyclic
+assert nodes.tolist() == [[0, 0], [2, 2], [4, 0]]
+assert controls.tolist() == [[[0, 1], [1, 2]], [[3, 2], [4, 1]]]
+
+nodes, controls, cyclic = xp.parsePath('(0,0).. controls (1,0) and (1,1)\n ..(1,1).. controls (0,1) and (0,0)\n ..cycle\n')
+assert cyclic
+assert nodes.tolist() == [[0, 0], [1, 1]]
+assert controls.tolist() == [[[1, 0], [1, 1]], [[0, 1], [0, 0]]]
+
+nodes, controls, cyclic = xp.parsePath('(3,4)')
+assert nodes.tolist() == [[3, 4]] and controls.shape == (0, 2, 2) and not cyclic
+
+for text in ('', '(1,', '(1,2', '1,2)', '(1,2,3)', '(1;2)', '(a,2)', '(1,nan)', '(inf,0)', '(1,2)(3,4)'):
+    assert rejects(xp.parsePair, text), text
+for text in ('(0,0,1,0,0)', '(0,0,1,0,0,1', '(0,0,1,0,nan,1)'):
+    assert rejects(xp.parseTransform, text), text
+for text in ('', '1.5.2', 'nan', '-inf'):
+    assert rejects(xp.parseReal, text), text
+for text in ('', '1.5', '1e3', '--1'):
+    assert rejects(xp.parseInt, text), text
+for text in ('(0,0).. controls (0,1) and (1,2)',
+             '(0,0).. controls (0,1) and (1,2)\n ..',
+             '(0,0).. controls (0,1) and (1,2)\n ..(2,',
+             '(0,0).. controls (0,nan) and (1,2)\n ..(2,2)',
+             '(0,0)--(1,1)'):
+    assert rejects(xp.parsePath, text), text
+assert rejects(xp.parseColor, 'hsv', '1 0 0')
+assert rejects(xp.parseColor, 'rgb', '1 nan 0')
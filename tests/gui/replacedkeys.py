@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# xasyScript.getReplacedKeysCode must insert keys exactly where inserting
+# them character by character did, and recompute its cached result only
+# when the script or its transforms move the keys.
+
+import io
+import os
+import random
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GUI'))
+import xasy2asy as x2a
+
+rng = random.Random(1)
+
+
+def characterwise(script, lineOffset, keylist, linenum2key, userKeys):
+    """getReplacedKeysCode as it was, writing each line one character at a time."""
+    raw_code_lines = script.splitlines()
+    with io.StringIO() as raw_str:
+        for i_0 in range(len(raw_code_lines)):
+            i = i_0 + lineOffset
+            curr_str = raw_code_lines[i_0]
+            if i + 1 in keylist.keys():
+                with io.StringIO() as raw_line:
+                    for j in range(len(curr_str)):
+                        raw_line.write(curr_str[j])
+                        if j + 1 in keylist[i + 1]:
+                            raw_line.write('KEY="{0:s}",'.format(linenum2key[(i + 1, j + 1)]))
+                            userKeys.add(linenum2key[(i + 1, j + 1)])
+                    curr_str = raw_line.getvalue()
+            raw_str.write(curr_str + '\n')
+        return raw_str.getvalue()
+
+
+def replaceKeys(item, keys, replaceAll=False):
+    item.unsetKeys = set(keys)
+    item.userKeys = set()
+    return item.getReplacedKeysCode(None if replaceAll else set(keys))
+
+
+class CountingScript(x2a.xasyScript):
+    insertions = 0
+
+    def insertKeys(self, keylist, linenum2key):
+        self.insertions += 1
+        return super().insertKeys(keylist, linenum2key)
+
+
+for trial in range(200):
+    lines = [''.join(rng.choice('draw(unitcircle); "é\t') for c in range(rng.randrange(0, 30)))
+             for l in range(rng.randrange(1, 12))]
+    script = '\n'.join(lines) + rng.choice(['', '\n'])
+    lineOffset = rng.randrange(0, 4)
+    keys = set()
+    for k in range(rng.randrange(0, 15)):
+        line = rng.randrange(1, len(lines) + lineOffset + 3)
+        col = rng.randrange(0, 32)
+        keys.add('{0}.{1}'.format(line, col) + rng.choice(['', ':0', ':1']))
+
+    keylist, linenum2key = {}, {}
+    for key in keys:
+        line, col = map(int, key.split(':')[0].split('.'))
+        keylist.setdefault(line, set()).add(col)
+        linenum2key[(line, col)] = key
+    # the same position twice keeps whichever key was seen last, as before.
+    keys = set(linenum2key.values())
+
+    item = x2a.xasyScript(None, None, script=script)
+    item.lineOffset = lineOffset
+    expectedKeys = set()
+    expected = characterwise(script, lineOffset, keylist, linenum2key, expectedKeys)
+    assert replaceKeys(item, keys, trial % 2 == 0) == expected, (script, lineOffset, keys)
+    assert item.userKeys == expectedKeys
+    assert item.unsetKeys == {key for key in keys if ':' in key}
+
+# the cached code is reused until the script or the line offset changes.
+item = CountingScript(None, None, script='draw(unitcircle);\ndraw(unitsquare);\n')
+item.lineOffset = len(item.getTransformCode().splitlines())
+code = replaceKeys(item, {'1.5', '2.5'})
+assert code == 'draw(KEY="1.5",unitcircle);\ndraw(KEY="2.5",unitsquare);\n'
+assert replaceKeys(item, {'1.5', '2.5'}) == code and item.insertions == 1
+assert item.userKeys == {'1.5', '2.5'}
+assert replaceKeys(item, {'1.5'}) == 'draw(KEY="1.5",unitcircle);\ndraw(unitsquare);\n'
+assert item.insertions == 2
+
+item.script = 'fill(unitcircle);\ndraw(unitsquare);\n'
+assert replaceKeys(item, {'1.5'}) == 'fill(KEY="1.5",unitcircle);\ndraw(unitsquare);\n'
+assert item.insertions == 3
+
+# a transform adds a line before the script, which shifts where its keys land.
+item.transfKeymap['x9'] = [x2a.asyTransform((1, 2, 1, 0, 0, 1))]
+item.lineOffset = len(item.getTransformCode().splitlines())
+assert item.lineOffset == 1
+assert replaceKeys(item, {'2.5'}) == 'fill(KEY="2.5",unitcircle);\ndraw(unitsquare);\n'
+assert item.insertions == 4
+assert replaceKeys(item, {'2.5'}) == 'fill(KEY="2.5",unitcircle);\ndraw(unitsquare);\n'
+assert item.insertions == 4
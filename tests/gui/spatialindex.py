@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# DrawObjectIndex must find the objects under a point after they are moved
+# or their bounding boxes change, and when objects are added.
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GUI'))
+import PyQt5.QtCore as Qc
+import PyQt5.QtGui as Qg
+import xasy2asy as x2a
+import SpatialIndex as si
+
+
+def newObject(bbox, key):
+    obj = x2a.DrawObject(Qg.QImage(10, 10, Qg.QImage.Format_ARGB32), key=key)
+    obj.setBoundingBoxPs(bbox)
+    return obj
+
+
+def centre(obj):
+    return obj.boundingBox.center()
+
+
+a = newObject((0, 0, 10, 10), 'x1')
+b = newObject((100, 0, 110, 10), 'x2')
+c = newObject((0, 100, 10, 110), 'x2')
+drawObjects = [[a, b], [c]]
+
+index = si.DrawObjectIndex()
+index.update(drawObjects)
+assert index.candidatesAt(Qc.QPointF(5, 5)) == [(0, 0)]
+assert index.candidatesAt(Qc.QPointF(105, 5)) == [(0, 1)]
+assert index.candidatesAt(Qc.QPointF(50, 50)) == []
+assert index.positionsWithKey('x2') == [(0, 1), (1, 0)]
+
+# moving an object re-indexes it on the next update.
+a.transform = x2a.asyTransform((300, 300, 1, 0, 0, 1))
+index.update(drawObjects)
+assert (0, 0) in index.candidatesAt(centre(a))
+assert index.candidatesAt(Qc.QPointF(5, 5)) == []
+
+# so does changing its bounding box without a transform.
+c.setBoundingBoxPs((200, 200, 210, 210))
+index.update(drawObjects)
+assert index.candidatesAt(Qc.QPointF(205, 205)) == [(1, 0)]
+assert index.candidatesAt(Qc.QPointF(5, 105)) == []
+
+# an object spanning many cells is a candidate everywhere.
+b.setBoundingBoxPs((-1000, -1000, 1000, 1000))
+index.update(drawObjects)
+assert (0, 1) in index.candidatesAt(Qc.QPointF(-500, 700))
+
+# adding an object rebuilds the index.
+d = newObject((50, 50, 60, 60), 'x3')
+drawObjects[1].append(d)
+index.update(drawObjects)
+assert index.candidatesAt(Qc.QPointF(55, 55)) == [(0, 1), (1, 1)]
+assert index.positionsWithKey('x3') == [(1, 1)]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# asyTransformArray must agree element by element with asyTransform, and
+# transforming a group in MainWindow1.transformObjKey must give each object
+# what transforming it alone would.
+
+import os
+import random
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GUI'))
+import numpy as np
+import PyQt5.QtGui as Qg
+import xasy2asy as x2a
+import Window1
+
+rng = random.Random(1)
+
+
+def randomTransform():
+    return x2a.asyTransform(tuple(rng.uniform(-10, 10) for i in range(6)))
+
+
+identity = x2a.identity()
+left = [randomTransform() for i in range(50)] + [identity, x2a.asyTransform((0, 0, 1, 2, 2, 4))]
+right = [randomTransform() for i in range(50)] + [randomTransform(), identity]
+leftArray = x2a.asyTransformArray.fromTransforms(left)
+rightArray = x2a.asyTransformArray.fromTransforms(right)
+
+assert len(leftArray) == len(left)
+assert leftArray.toTransforms() == left
+assert leftArray[3] == left[3] and leftArray[2:4].toTransforms() == left[2:4]
+
+assert (leftArray * rightArray).toTransforms() == [a * b for a, b in zip(left, right)]
+assert np.array_equal(x2a.composeTransforms(leftArray.t, rightArray.t), (leftArray * rightArray).t)
+# a single transform broadcasts on either side.
+assert (left[0] * rightArray).toTransforms() == [left[0] * b for b in right]
+assert (leftArray * right[0]).toTransforms() == [a * right[0] for a in left]
+assert (identity * rightArray).toTransforms() == right
+assert (leftArray * identity).toTransforms() == left
+
+assert leftArray.isIdentity().tolist() == [t == identity for t in left]
+# the singular transform inverts to the identity, as for asyTransform.
+for a, b in zip(leftArray.inverted().toTransforms(), [t.inverted() for t in left]):
+    assert np.allclose(a.t, b.t, rtol=1e-12, atol=1e-12), (a.t, b.t)
+
+points = [(rng.uniform(-5, 5), rng.uniform(-5, 5)) for t in left]
+assert np.allclose(leftArray.apply(points), [t * p for t, p in zip(left, points)], rtol=0, atol=1e-12)
+assert np.allclose(leftArray[:1].apply(points), [left[0] * p for p in points], rtol=0, atol=1e-12)
+
+
+class Item:
+    pass
+
+
+class Window:
+    """The state transformObjKey reads from the main window."""
+    def __init__(self, drawObjects, selected):
+        self.pendingAsyfyItems = set()
+        self.selectAsGroup = True
+        self.currentlySelectedObj = {'allSameKey': selected}
+        self.drawObjects = drawObjects
+        self.fileChanged = False
+
+    def quickUpdate(self):
+        pass
+
+
+for applyFirst in (False, True):
+    for transform in (randomTransform(), identity):
+        item = Item()
+        keyTransforms = [randomTransform() for i in range(5)]
+        item.transfKeymap = {'x1': list(keyTransforms)}
+        drawObjects = [[x2a.DrawObject(Qg.QPainterPath(), transform=randomTransform(), key='x1', keyIndex=i)
+                        for i in range(5)]]
+        objTransforms = [obj.transform for obj in drawObjects[0]]
+        window = Window(drawObjects, [(0, i) for i in range(5)])
+
+        Window1.MainWindow1.transformObjKey(window, item, 'x1', 2, transform, applyFirst, drawObjects[0][2])
+
+        assert window.fileChanged
+        for i, obj in enumerate(drawObjects[0]):
+            if applyFirst:
+                assert item.transfKeymap['x1'][i] == keyTransforms[i] * transform
+                assert obj.transform == objTransforms[i] * transform
+            else:
+                assert item.transfKeymap['x1'][i] == transform * keyTransforms[i]
+                assert obj.transform == transform * objTransforms[i]